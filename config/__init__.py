@@ -0,0 +1,4 @@
+# Приложение Celery загружается вместе с Django, чтобы задачи из веб-процесса отправлялись через настроенный брокер
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
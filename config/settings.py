@@ -2,6 +2,7 @@ from pathlib import Path
 import os
 from datetime import timedelta
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,6 +37,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "employees.middleware.QueryProfilingMiddleware",
+    "employees.middleware.ReplicaRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -58,17 +61,44 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
+# Подключения к БД переиспользуются между запросами (CONN_MAX_AGE, секунд) и проверяются перед использованием.
+# Если между приложением и PostgreSQL стоит PgBouncer в режиме transaction, серверные курсоры нужно отключить
+DATABASE_SETTINGS = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.getenv('POSTGRES_DB'),
+    'USER': os.getenv('POSTGRES_USER'),
+    'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
+    'HOST': os.getenv('POSTGRES_HOST'),
+    'PORT': os.getenv('POSTGRES_PORT'),
+    'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': os.getenv('POSTGRES_CONN_HEALTH_CHECKS', 'True') == 'True',
+    'DISABLE_SERVER_SIDE_CURSORS': os.getenv('POSTGRES_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+}
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB'),
-        'USER': os.getenv('POSTGRES_USER'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
-        'HOST': os.getenv('POSTGRES_HOST'),
-        'PORT': os.getenv('POSTGRES_PORT'),
-    }
+    'default': DATABASE_SETTINGS,
 }
 
+# Реплики для чтения: хосты через запятую в формате host или host:port, остальные параметры как у основной БД.
+# Запросы на чтение (GET) идут на реплики, запись и чтение после записи в той же сессии - на основную БД
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASE_SETTINGS,
+        'HOST': host,
+        'PORT': port or DATABASE_SETTINGS['PORT'],
+        # В тестах реплика - та же БД, что и основная
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['employees.routers.ReplicaRouter']
+
+# Сколько секунд после записи сессия читает из основной БД. Столько же живут ответы списков, прочитанные из реплики,
+# чтобы отставание реплики не закэшировалось надолго
+REPLICA_LAG_SECONDS = int(os.getenv('REPLICA_LAG_SECONDS', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -98,14 +128,101 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Настройки для фильтрации
 REST_FRAMEWORK = {
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_PAGINATION_CLASS': 'employees.paginators.ConfigurablePagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 100)),
 }
 
+# Режим пагинации списков: cursor (keyset по id), limit_offset или none (без пагинации)
+PAGINATION_MODE = os.getenv('PAGINATION_MODE', 'cursor')
+
+# Размер пачки задач при массовом импорте
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 1000))
+
+# Сколько задач можно изменить или выполнить одним запросом к /task_bulk_update/
+BULK_UPDATE_MAX_TASKS = int(os.getenv('BULK_UPDATE_MAX_TASKS', 10000))
+
+# Перенос выполненных задач в архив (/task_history/): как часто запускается и сколько задач переносится в одной
+# транзакции
+TASK_ARCHIVE_INTERVAL = timedelta(minutes=int(os.getenv('TASK_ARCHIVE_INTERVAL_MINUTES', 10)))
+TASK_ARCHIVE_BATCH_SIZE = int(os.getenv('TASK_ARCHIVE_BATCH_SIZE', 1000))
+
+# Секционирование таблицы задач по сроку (manage.py partition_tasks, только PostgreSQL): на сколько месяцев вперёд
+# создаются секции и через сколько месяцев старые секции архивируются и удаляются (0 - не удалять автоматически)
+TASK_PARTITION_MONTHS_AHEAD = int(os.getenv('TASK_PARTITION_MONTHS_AHEAD', 3))
+TASK_PARTITION_RETENTION_MONTHS = int(os.getenv('TASK_PARTITION_RETENTION_MONTHS', 0))
+
+# Кэш. В нём хранятся версия данных для кэша ответов, блокировка и общая нагрузка прогона распределения, поэтому он
+# должен быть общим для всех процессов: это Redis из CACHE_URL (например redis://redis:6379/1), а если он не задан -
+# Redis брокера Celery. Кэш в памяти процесса остаётся только без Redis (локальный запуск), и тогда кэш ответов
+# отключён, а распределению важных задач нужен общий кэш (SHARED_CACHE)
+CACHE_URL = os.getenv('CACHE_URL')
+if not CACHE_URL and os.getenv('CELERY_BROKER_URL', '').startswith(('redis://', 'rediss://')):
+    CACHE_URL = os.getenv('CELERY_BROKER_URL')
+SHARED_CACHE = bool(CACHE_URL)
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Кэширование ответов списков: включено ли и сколько секунд хранится ответ. В кэше в памяти процесса запись
+# увеличивала бы версию данных только в своём процессе, а остальные отдавали бы устаревшие ответы, поэтому без общего
+# кэша кэш ответов не включается
+RESPONSE_CACHE_ENABLED = SHARED_CACHE and os.getenv('RESPONSE_CACHE_ENABLED', 'True') == 'True'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Профилирование запросов к API (заголовок Server-Timing, гистограммы времени ответа в /metrics) и количество
+# повторяющихся запросов к БД за один запрос к API, после которого в лог пишется предупреждение
+QUERY_PROFILING_ENABLED = os.getenv('QUERY_PROFILING_ENABLED', 'False') == 'True'
+QUERY_PROFILING_DUPLICATE_THRESHOLD = int(os.getenv('QUERY_PROFILING_DUPLICATE_THRESHOLD', 5))
+
+# Журнал изменений (/changes/): сколько изменений отдаётся за запрос по умолчанию и сколько дней хранятся записи
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', 1000))
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 7))
+
+# События задач (/task_events/): публиковать ли их, Redis для рассылки событий между процессами (без него события
+# получают только подписчики процесса, в котором изменили задачу), через сколько секунд тишины отправлять keepalive и
+# сколько событий может ждать отправки медленному клиенту
+TASK_EVENTS_ENABLED = os.getenv('TASK_EVENTS_ENABLED', 'True') == 'True'
+TASK_EVENTS_REDIS_URL = os.getenv('TASK_EVENTS_REDIS_URL') or CACHE_URL
+TASK_EVENTS_KEEPALIVE_SECONDS = int(os.getenv('TASK_EVENTS_KEEPALIVE_SECONDS', 15))
+TASK_EVENTS_QUEUE_SIZE = int(os.getenv('TASK_EVENTS_QUEUE_SIZE', 100))
+
+# Асинхронные вьюхи для списков и просмотра сотрудников и задач. Имеет смысл при запуске под ASGI (uvicorn)
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
 # Настройки для Celery
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Распределение важных задач: сколько задач обрабатывает одна часть прогона на воркере и через сколько секунд
+# истекает блокировка прогона, если он завершился аварийно
+ASSIGNMENT_CHUNK_SIZE = int(os.getenv('ASSIGNMENT_CHUNK_SIZE', 1000))
+ASSIGNMENT_LOCK_TIMEOUT = CELERY_TASK_TIME_LIMIT
+
+# Стратегия распределения важных задач (employees/strategies.py): parent_affinity, due_date, post или balanced_batch.
+# Исполнитель родительской задачи получает задачу, если загружен не более чем на ASSIGNMENT_PARENT_THRESHOLD больше
+# наименее загруженного, а просроченная задача в стратегии due_date весит ASSIGNMENT_OVERDUE_WEIGHT обычных
+ASSIGNMENT_STRATEGY = os.getenv('ASSIGNMENT_STRATEGY', 'parent_affinity')
+ASSIGNMENT_PARENT_THRESHOLD = int(os.getenv('ASSIGNMENT_PARENT_THRESHOLD', 2))
+ASSIGNMENT_OVERDUE_WEIGHT = int(os.getenv('ASSIGNMENT_OVERDUE_WEIGHT', 3))
+
+# Инкрементальное распределение: задача, у которой появилась дочерняя задача или убрали исполнителя, ставится в очередь
+# и распределяется сразу, а полный просмотр всех задач по расписанию только подстраховывает
+INCREMENTAL_ASSIGNMENT = os.getenv('INCREMENTAL_ASSIGNMENT', 'True') == 'True'
+ASSIGNMENT_QUEUE_BATCH_SIZE = int(os.getenv('ASSIGNMENT_QUEUE_BATCH_SIZE', 100))
+ASSIGNMENT_FULL_SCAN_INTERVAL = timedelta(minutes=30 if INCREMENTAL_ASSIGNMENT else 1)
+
 # Настойки для подключения Redis к Celery
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
@@ -114,7 +231,23 @@ CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 CELERY_BEAT_SCHEDULE = {
     'assignment_tasks_to_employees': {
-        "task": 'staff.tasks.assignment_tasks_to_employees',
-        "schedule": timedelta(minutes=1),  # run at every 5th minute
+        "task": 'employees.tasks.assignment_tasks_to_employees',
+        "schedule": ASSIGNMENT_FULL_SCAN_INTERVAL,
+    },
+    'rebuild_employee_workload': {
+        "task": 'employees.tasks.rebuild_employee_workload',
+        "schedule": crontab(hour=0, minute=5),  # каждый день после полуночи, когда меняется список просроченных задач
+    },
+    'prune_change_log': {
+        "task": 'employees.tasks.prune_change_log',
+        "schedule": crontab(hour=3, minute=0),
+    },
+    'archive_tasks': {
+        "task": 'employees.tasks.archive_tasks',
+        "schedule": TASK_ARCHIVE_INTERVAL,
+    },
+    'maintain_task_partitions': {
+        "task": 'employees.tasks.maintain_task_partitions',
+        "schedule": crontab(hour=2, minute=0),
     },
 }
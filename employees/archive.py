@@ -0,0 +1,58 @@
+from django.db import transaction
+
+from employees.cache import invalidate_responses
+from employees.changes import record_changes
+from employees.events import UPDATE, publish_task_events
+from employees.models import ChangeLog, Task, TaskArchive
+from employees.signals import skip_task_delete_signals
+
+ARCHIVE_FIELDS = ('id', 'title', 'parent_task_id', 'employee_id', 'date')
+
+
+def delete_archived_tasks(task_ids):
+    """Удаляет из таблицы задач задачи, уже перенесённые в архив.
+
+    Задачи удаляются через QuerySet.delete(), поэтому связи с задачей обрабатываются по их on_delete, как при любом
+    удалении. Обработчики удаления задач при этом отключены: они делали бы запросы на каждую задачу, а журнал
+    изменений и события здесь записываются сгруппированно. Количество задач сотрудников и загруженность не меняются:
+    выполненные задачи в них уже учтены."""
+    if not task_ids:
+        return
+    orphans = list(Task.objects.filter(parent_task__in=task_ids).exclude(pk__in=task_ids).values_list('pk', flat=True))
+    with skip_task_delete_signals():
+        Task.objects.filter(pk__in=task_ids).delete()
+    record_changes(Task, orphans, ChangeLog.UPDATE)
+    record_changes(Task, task_ids, ChangeLog.DELETE)
+    publish_task_events(UPDATE, orphans)
+
+
+def archive_completed_tasks(batch_size=1000, tasks=None):
+    """Переносит выполненные задачи из таблицы задач (или из QuerySet tasks) в архив (TaskArchive) пачками по
+    batch_size.
+
+    Каждая пачка переносится в своей короткой транзакции, а задачи, которые сейчас меняет другой запрос, пропускаются
+    (SELECT ... FOR UPDATE SKIP LOCKED) до следующего запуска. Дочерние задачи перенесённой задачи остаются без
+    родительской, её pk сохраняется только в архиве. Возвращает количество перенесённых задач."""
+    if tasks is None:
+        tasks = Task.objects.all()
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                tasks.filter(status=True).order_by('pk').select_for_update(skip_locked=True)
+                .values_list(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            TaskArchive.objects.bulk_create(
+                [
+                    TaskArchive(id=pk, title=title, parent_task=parent_task_id, employee_id=employee_id, date=date)
+                    for pk, title, parent_task_id, employee_id, date in rows
+                ],
+                ignore_conflicts=True,
+            )
+            delete_archived_tasks([row[0] for row in rows])
+        archived += len(rows)
+    if archived:
+        invalidate_responses()
+    return archived
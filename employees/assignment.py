@@ -0,0 +1,250 @@
+import logging
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import OuterRef, Exists, QuerySet
+from kombu.exceptions import OperationalError
+
+from employees.cache import invalidate_responses
+from employees.changes import record_changes
+from employees.counters import change_task_counts
+from employees.events import ASSIGN, publish_task_events
+from employees.models import AssignmentQueue, ChangeLog, Task
+from employees.strategies import Candidate, EmployeeLoad, get_assignment_strategy
+from employees.workload import change_workload
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENT_LOCK_KEY = 'assignment:lock'
+# Номер advisory-блокировки прогона распределения в PostgreSQL, когда общего кэша нет
+ASSIGNMENT_LOCK_ID = 0x61737369676E
+# Флаг того, что обработка очереди распределения уже запланирована, но ещё не началась
+QUEUE_SCHEDULED_KEY = 'assignment:queue:scheduled'
+
+
+def get_important_tasks():
+    """Возвращает queryset важных задач: не взятых в работу, но от которых зависят другие невыполненные задачи."""
+    subqueries = Task.objects.filter(parent_task=OuterRef('pk'), status=False)
+    return Task.objects.annotate(has_children=Exists(subqueries)).filter(has_children=True, employee=None,
+                                                                         status=False)
+
+
+def claim_important_tasks(task_ids=None):
+    """Возвращает важные задачи в виде Candidate и блокирует их до конца транзакции.
+
+    Задачи, которые уже заблокировал другой воркер, пропускаются (SELECT ... FOR UPDATE SKIP LOCKED), поэтому два
+    параллельных прогона не назначат одну задачу дважды. Вызывать нужно внутри транзакции."""
+    tasks = get_important_tasks()
+    if task_ids is not None:
+        tasks = tasks.filter(pk__in=task_ids)
+    return [
+        Candidate(*row) for row in tasks.order_by('pk')
+        .select_for_update(skip_locked=True, of=('self',))
+        .values_list('pk', 'parent_task_id', 'parent_task__employee_id', 'date')
+    ]
+
+
+def save_assignments(assignments, dates, batch_size=1000):
+    """Записывает назначения {pk задачи: pk сотрудника} в БД через bulk_update и обновляет счётчики задач и
+    загруженность сотрудников. dates - сроки задач {pk задачи: срок}."""
+    if not assignments:
+        return
+    Task.objects.bulk_update(
+        [Task(pk=task_id, employee_id=employee_id) for task_id, employee_id in assignments.items()],
+        ['employee'],
+        batch_size=batch_size,
+    )
+    record_changes(Task, assignments, ChangeLog.UPDATE)
+    publish_task_events(ASSIGN, assignments)
+    change_task_counts(Counter(assignments.values()))
+    # Назначаются только задачи в работе без исполнителя
+    change_workload([(None, (employee_id, False, dates[task_id])) for task_id, employee_id in assignments.items()])
+    invalidate_responses()
+
+
+def assign_important_tasks(task_ids=None, shared_load=None, run=None, batch_size=1000, strategy=None):
+    """Назначает исполнителей важным задачам (всем или только из task_ids).
+
+    Кандидаты и таблица загруженности читаются двумя запросами, решения принимает стратегия распределения (по
+    умолчанию из настройки ASSIGNMENT_STRATEGY) в памяти, а результат записывается через bulk_update в одной
+    транзакции. Если передан shared_load, нагрузка берётся из общего снимка прогона, а не из БД, и назначения сразу
+    учитываются в снимке для остальных частей прогона; если снимка в кэше нет, нагрузка читается из БД. В run
+    (AssignmentRun) добавляются количество проверенных и назначенных задач и время ожидания блокировки задач.
+    Возвращает словарь {pk задачи: pk сотрудника}."""
+    strategy = get_assignment_strategy() if strategy is None else strategy
+    with transaction.atomic():
+        started = time.perf_counter()
+        candidates = claim_important_tasks(task_ids)
+        lock_wait = time.perf_counter() - started
+        load = None if shared_load is None else shared_load.load()
+        if load:
+            load = strategy.prepare(load)
+        else:
+            if shared_load is not None:
+                # Снимок истёк или не виден этому воркеру: с пустой нагрузкой стратегия не назначила бы ни одной задачи
+                logger.warning('Снимок нагрузки прогона распределения %s не найден, нагрузка читается из БД',
+                               shared_load.run_id)
+                shared_load = None
+            load = strategy.load_from_db()
+        assignments = strategy.plan(candidates, load)
+        if shared_load is not None:
+            shared_load.add(strategy.get_deltas(candidates, assignments))
+        save_assignments(assignments, {candidate.task_id: candidate.date for candidate in candidates},
+                         batch_size=batch_size)
+    if run is not None:
+        run.scanned += len(candidates)
+        run.assigned += len(assignments)
+        run.lock_wait += lock_wait
+    return assignments
+
+
+class SharedEmployeeLoad:
+    """Снимок загруженности сотрудников в кэше (Redis), общий для всех частей одного прогона распределения.
+
+    Части прогона выполняются параллельно на разных воркерах. Каждая часть читает актуальные значения снимка перед
+    распределением и атомарно прибавляет к ним свои назначения (INCR), поэтому следующие части видят нагрузку,
+    которую уже взяли предыдущие, ещё до фиксации их транзакций."""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.ids_key = f'assignment:{run_id}:employees'
+
+    def _key(self, pk):
+        return f'assignment:{self.run_id}:load:{pk}'
+
+    def save(self, task_counts, timeout):
+        task_counts = dict(task_counts)
+        cache.set_many({self._key(pk): count for pk, count in task_counts.items()}, timeout=timeout)
+        cache.set(self.ids_key, list(task_counts), timeout=timeout)
+
+    def load(self):
+        employee_ids = cache.get(self.ids_key, [])
+        counts = cache.get_many([self._key(pk) for pk in employee_ids])
+        return EmployeeLoad((pk, counts[self._key(pk)]) for pk in employee_ids if self._key(pk) in counts)
+
+    def add(self, deltas):
+        for pk, delta in deltas.items():
+            cache.incr(self._key(pk), delta)
+
+    def delete(self):
+        cache.delete_many([self._key(pk) for pk in cache.get(self.ids_key, [])] + [self.ids_key])
+
+
+def _uses_db_lock():
+    return not settings.SHARED_CACHE and connection.vendor == 'postgresql'
+
+
+def acquire_assignment_lock():
+    """Берёт блокировку прогона распределения. Возвращает токен блокировки или None, если прогон уже выполняется.
+
+    С общим кэшем (Redis) это SET NX с истечением: блокировку видят все воркеры, и её снимает та часть прогона, которая
+    закончилась последней. Без общего кэша прогон выполняется одной частью в этом же процессе, поэтому в PostgreSQL
+    хватает сессионной advisory-блокировки на подключении воркера, а в остальных БД (SQLite при разработке) - кэша в
+    памяти процесса."""
+    token = uuid.uuid4().hex
+    if _uses_db_lock():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [ASSIGNMENT_LOCK_ID])
+            return token if cursor.fetchone()[0] else None
+    if cache.add(ASSIGNMENT_LOCK_KEY, token, timeout=settings.ASSIGNMENT_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def release_assignment_lock(token):
+    """Снимает блокировку, если она всё ещё принадлежит этому прогону, а не истекла и не взята другим."""
+    if _uses_db_lock():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [ASSIGNMENT_LOCK_ID])
+    elif cache.get(ASSIGNMENT_LOCK_KEY) == token:
+        cache.delete(ASSIGNMENT_LOCK_KEY)
+
+
+def enqueue_for_assignment(task_ids):
+    """Ставит задачи в очередь распределения и после фиксации транзакции запускает её обработку.
+
+    Пока обработка запланирована, но не началась, повторно она не запускается, поэтому всплеск изменений задач
+    разбирается одним прогоном."""
+    if not settings.INCREMENTAL_ASSIGNMENT:
+        return
+    task_ids = {pk for pk in task_ids if pk is not None}
+    if not task_ids:
+        return
+    AssignmentQueue.objects.bulk_create([AssignmentQueue(task_id=pk) for pk in task_ids], ignore_conflicts=True)
+    transaction.on_commit(schedule_queue_processing)
+
+
+def schedule_queue_processing():
+    """Запускает обработку очереди распределения на воркере, если она ещё не запланирована."""
+    from employees.tasks import assign_queued_tasks
+
+    if cache.add(QUEUE_SCHEDULED_KEY, True, timeout=settings.ASSIGNMENT_LOCK_TIMEOUT):
+        try:
+            assign_queued_tasks.delay()
+        except OperationalError:
+            # Изменение задачи уже зафиксировано, поэтому недоступный брокер не должен ломать запрос: задачи останутся в
+            # очереди и будут распределены при следующем изменении или полным просмотром по расписанию
+            cache.delete(QUEUE_SCHEDULED_KEY)
+            logger.warning('Не удалось запустить обработку очереди распределения: брокер Celery недоступен')
+
+
+def process_assignment_queue(batch_size=100, run=None):
+    """Разбирает очередь распределения пачками по batch_size задач.
+
+    Задачи из очереди, которые уже не важные (у них есть исполнитель или нет дочерних задач), просто удаляются из неё.
+    Статистика пачек добавляется в run, как в assign_important_tasks. Возвращает словарь {pk задачи: pk сотрудника}."""
+    # Флаг снимается до чтения очереди: задачи, добавленные во время обработки, запустят её ещё раз
+    cache.delete(QUEUE_SCHEDULED_KEY)
+    assignments = {}
+    while True:
+        with transaction.atomic():
+            task_ids = list(
+                AssignmentQueue.objects.order_by('created_at', 'task')
+                .select_for_update(skip_locked=True)
+                .values_list('task_id', flat=True)[:batch_size]
+            )
+            if not task_ids:
+                break
+            assignments.update(assign_important_tasks(task_ids, run=run))
+            AssignmentQueue.objects.filter(task__in=task_ids).delete()
+    return assignments
+
+
+class ImportantTasksAssignmentContext:
+    """Исполнители, которых стратегия распределения подобрала бы важным задачам списка, общие для всего ответа.
+
+    Собираются двумя запросами на весь список (родительские задачи и нужные стратегии сотрудники), поэтому подбор
+    сотрудника для каждой строки списка не делает запросов в БД. Каждой задаче сотрудник подбирается независимо от
+    остальных задач списка, по текущей нагрузке."""
+
+    def __init__(self, suggestions, full_names):
+        # {pk задачи: pk сотрудника}
+        self.suggestions = suggestions
+        # {pk сотрудника: ФИО}
+        self.full_names = full_names
+
+    @classmethod
+    def build(cls, tasks, strategy=None):
+        """Собирает контекст для важных задач (queryset или страница списка)."""
+        strategy = get_assignment_strategy() if strategy is None else strategy
+        if not isinstance(tasks, QuerySet):
+            tasks = Task.objects.filter(pk__in=[task.pk for task in tasks])
+        candidates = [
+            Candidate(*row) for row in tasks.values_list('pk', 'parent_task_id', 'parent_task__employee_id', 'date')
+        ]
+        load, full_names = strategy.load_for_preview(
+            {candidate.parent_employee_id for candidate in candidates} - {None}
+        )
+        suggestions = {}
+        if load:
+            for candidate in candidates:
+                suggestions[candidate.task_id] = strategy.choose(load, candidate, candidate.parent_employee_id)
+        return cls(suggestions, full_names)
+
+    def employee_for(self, task):
+        """Возвращает ФИО сотрудника, которому стоит отдать задачу."""
+        return self.full_names.get(self.suggestions.get(task.pk))
@@ -0,0 +1,260 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from employees.assignment import ImportantTasksAssignmentContext
+from employees.cache import CachedListMixin, cache_response, get_cached_response, get_not_modified, \
+    get_response_cache_key, get_response_cache_timeout
+from employees.changes import get_last_seq
+from employees.events import KEEPALIVE, format_event, hub
+from employees.serializers import get_values_serializer
+from employees.views import EmployeeListAPIView, EmployeeRetrieveAPIView, TaskListAPIView, TaskRetrieveAPIView, \
+    ImportantTasksListAPIView, ValuesListMixin
+
+# Сколько строк читать из БД за раз при выдаче списка без пагинации
+STREAM_CHUNK_SIZE = 2000
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncDRFView(View):
+    """Основа асинхронных вьюх для запуска под ASGI.
+
+    Queryset, фильтры, пагинация и сериализатор берутся у обычной DRF-вьюхи drf_view, поэтому ответ совпадает с её
+    ответом в формате JSON. Аутентификация, права, ограничение частоты запросов и согласование формата тоже берутся
+    у drf_view. Запросы к БД выполняются через асинхронный ORM, и пока запрос ждёт БД, процесс обслуживает другие
+    запросы."""
+    drf_view = None
+
+    def get_drf_view(self, request):
+        view = self.drf_view()
+        # Асинхронные вьюхи отдают только JSON, поэтому клиент, который не принимает JSON, получит 406
+        view.renderer_classes = [JSONRenderer]
+        view.args = self.args
+        view.kwargs = self.kwargs
+        view.request = view.initialize_request(request, *self.args, **self.kwargs)
+        view.headers = view.default_response_headers
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        view = self.get_drf_view(request)
+        try:
+            # Проверки те же, что в APIView.dispatch: аутентификация, права, частота запросов и формат ответа
+            await sync_to_async(view.initial)(view.request)
+            return await self.aget(view)
+        except APIException as exc:
+            # Ошибку оформляет обработчик DRF, он же добавляет заголовки WWW-Authenticate и Retry-After
+            response = await sync_to_async(view.handle_exception)(exc)
+            return view.finalize_response(view.request, response).render()
+
+
+class AsyncListView(AsyncDRFView):
+    """Асинхронный список. Элементы сериализуются и отправляются по одному, а без пагинации строки ещё и читаются
+    из БД частями через aiterator, поэтому весь список не собирается в памяти.
+
+    Если drf_view кэширует ответы (CachedListMixin), используется тот же кэш ответов: попадание отдаётся из кэша
+    (или 304 по If-None-Match), а при промахе отправленный ответ собирается и сохраняется в кэш после последнего
+    элемента. ETag у такого ответа появляется со следующего запроса, когда он уже будет в кэше."""
+    replica_reads = True
+
+    async def get_serializer_context(self, view, rows):
+        return view.get_serializer_context()
+
+    async def aget(self, view):
+        cache_key = timeout = None
+        if settings.RESPONSE_CACHE_ENABLED and isinstance(view, CachedListMixin):
+            cache_key = await sync_to_async(get_response_cache_key)(view.request)
+            cached = await sync_to_async(get_cached_response)(cache_key)
+            if cached is not None:
+                return get_not_modified(view.request, cached)
+            # Срок хранения зависит от чтения из реплики, а поток дочитывается уже после выхода из middleware
+            timeout = get_response_cache_timeout()
+        # Фильтры могут проверять параметры запросами к БД, поэтому выполняются синхронно в отдельном потоке
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+        values_serializer = None
+        if isinstance(view, ValuesListMixin):
+            values_serializer = get_values_serializer(view.get_serializer_class())
+            queryset = values_serializer.get_queryset(queryset)
+        paginator = view.paginator
+        page = None if paginator is None else await paginator.apaginate_queryset(queryset, view.request, view)
+        if page is None:
+            # Строки читаются уже после выхода из middleware, поэтому БД для чтения выбирается заранее
+            queryset = queryset.using(queryset.db)
+            context = await self.get_serializer_context(view, queryset)
+            rows = queryset.aiterator(chunk_size=STREAM_CHUNK_SIZE)
+            head, tail = b'[', b']'
+        else:
+            context = await self.get_serializer_context(view, page)
+            rows = page
+            # Поле results в ответе страницы последнее, поэтому элементы вставляются перед закрывающими скобками
+            empty_page = JSONRenderer().render(paginator.get_paginated_response([]).data)
+            head, tail = empty_page[:-2], empty_page[-2:]
+        if values_serializer is not None:
+            serialize = values_serializer.serialize_row
+        else:
+            serializer_class = view.get_serializer_class()
+            serialize = lambda row: serializer_class(row, context=context).data
+        response = StreamingHttpResponse(
+            self.stream(head, tail, rows, serialize, cache_key, timeout),
+            content_type='application/json',
+        )
+        if cache_key is not None:
+            response['X-Cache'] = 'MISS'
+        return response
+
+    async def stream(self, head, tail, rows, serialize, cache_key=None, timeout=None):
+        renderer = JSONRenderer()
+        chunks = []
+        yield head
+        separator = b''
+        if hasattr(rows, '__aiter__'):
+            async for row in rows:
+                chunk = separator + renderer.render(serialize(row))
+                if cache_key is not None:
+                    chunks.append(chunk)
+                yield chunk
+                separator = b','
+        else:
+            for row in rows:
+                chunk = separator + renderer.render(serialize(row))
+                if cache_key is not None:
+                    chunks.append(chunk)
+                yield chunk
+                separator = b','
+        yield tail
+        if cache_key is not None:
+            content = b''.join([head, *chunks, tail])
+            await sync_to_async(cache_response)(cache_key, content, 'application/json', timeout)
+
+
+class AsyncRetrieveView(AsyncDRFView):
+    """Асинхронный просмотр одного объекта."""
+    replica_reads = True
+
+    async def aget(self, view):
+        queryset = view.get_queryset()
+        try:
+            instance = await queryset.aget(pk=view.kwargs['pk'])
+        except queryset.model.DoesNotExist:
+            return json_response({'detail': f'No {queryset.model._meta.object_name} matches the given query.'},
+                                 status=404)
+        return json_response(view.get_serializer(instance).data)
+
+
+class AsyncEmployeeListView(AsyncListView):
+    """Асинхронный вариант EmployeeListAPIView."""
+    drf_view = EmployeeListAPIView
+
+
+class AsyncEmployeeRetrieveView(AsyncRetrieveView):
+    """Асинхронный вариант EmployeeRetrieveAPIView."""
+    drf_view = EmployeeRetrieveAPIView
+
+
+class AsyncTaskListView(AsyncListView):
+    """Асинхронный вариант TaskListAPIView."""
+    drf_view = TaskListAPIView
+
+
+class AsyncTaskRetrieveView(AsyncRetrieveView):
+    """Асинхронный вариант TaskRetrieveAPIView."""
+    drf_view = TaskRetrieveAPIView
+
+
+class AsyncImportantTasksListView(AsyncListView):
+    """Асинхронный вариант ImportantTasksListAPIView."""
+    drf_view = ImportantTasksListAPIView
+
+    async def get_serializer_context(self, view, rows):
+        context = view.get_serializer_context()
+        context['assignment'] = await sync_to_async(ImportantTasksAssignmentContext.build)(rows)
+        return context
+
+
+def get_stream_position():
+    """Возвращает номер последнего изменения в журнале и закрывает подключения к БД этого потока, чтобы открытый
+    поток событий не держал подключение. Подключения внутри транзакции не закрываются."""
+    try:
+        return get_last_seq()
+    finally:
+        for connection in connections.all(initialized_only=True):
+            if not connection.in_atomic_block:
+                connection.close()
+
+
+class TaskEventsView(View):
+    """Поток событий задач (server-sent events) для клиентов, которые иначе опрашивали бы списки.
+
+    Параметры employee и task - списки pk через запятую: события задач этих сотрудников (в том числе снятых с них) и
+    задач из поддеревьев этих задач. Первое событие ready содержит номер since журнала изменений: всё, что изменилось
+    после него, придёт в потоке, а после reset или переподключения пропущенное догружается через /changes/?since=.
+    Поток держит подключение к БД только на время чтения since, поэтому под ASGI один процесс обслуживает тысячи
+    подписчиков."""
+    max_keys = 100
+
+    def check_access(self, request):
+        """Аутентификация, права и частота запросов по настройкам DRF по умолчанию, как у обычной APIView. Возвращает
+        ответ с ошибкой или None."""
+        view = APIView()
+        view.args, view.kwargs = self.args, self.kwargs
+        view.request = view.initialize_request(request, *self.args, **self.kwargs)
+        view.headers = view.default_response_headers
+        try:
+            view.perform_authentication(view.request)
+            view.check_permissions(view.request)
+            view.check_throttles(view.request)
+        except APIException as exc:
+            return view.finalize_response(view.request, view.handle_exception(exc)).render()
+        return None
+
+    def get_keys(self, request):
+        keys = []
+        for name in ('employee', 'task'):
+            for value in request.GET.get(name, '').split(','):
+                if value:
+                    if not value.isdigit():
+                        raise ValueError
+                    keys.append(f'{name}:{int(value)}')
+        if not keys or len(keys) > self.max_keys:
+            raise ValueError
+        return keys
+
+    async def get(self, request, *args, **kwargs):
+        error = await sync_to_async(self.check_access)(request)
+        if error is not None:
+            return error
+        try:
+            keys = self.get_keys(request)
+        except ValueError:
+            return json_response(
+                {'detail': f'Нужно передать от 1 до {self.max_keys} pk в параметрах employee и task через запятую.'},
+                status=400,
+            )
+        response = StreamingHttpResponse(self.stream(keys), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Отключает буферизацию ответа в nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, keys):
+        # Подписка оформляется до чтения since, поэтому изменения между ними не теряются
+        subscription = hub.subscribe(keys)
+        try:
+            since = await sync_to_async(get_stream_position)()
+            yield b'retry: 5000\n' + format_event('ready', {'since': since})
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), settings.TASK_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            hub.unsubscribe(subscription)
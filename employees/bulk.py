@@ -0,0 +1,291 @@
+import csv
+import datetime
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from employees.assignment import enqueue_for_assignment
+from employees.cache import invalidate_responses
+from employees.changes import record_changes
+from employees.counters import change_task_counts
+from employees.events import ASSIGN, COMPLETE, CREATE, UPDATE, publish_task_events
+from employees.graph import get_ancestor_ids
+from employees.models import ChangeLog, Employee, Task
+from employees.workload import change_workload
+
+# Поля задачи в файлах импорта и экспорта
+EXPORT_FIELDS = ('id', 'title', 'parent_task', 'employee', 'date', 'status')
+
+TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+
+
+def read_json_lines(lines):
+    """Читает строки в формате JSON Lines (один объект задачи на строку)."""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValidationError({'detail': f'Строка {line_number}: неверный JSON.'})
+        if not isinstance(row, dict):
+            raise ValidationError({'detail': f'Строка {line_number}: ожидается объект задачи.'})
+        yield line_number, row
+
+
+def read_csv(lines):
+    """Читает строки CSV с заголовком. Пустые значения считаются отсутствующими."""
+    for line_number, row in enumerate(csv.DictReader(lines), start=2):
+        yield line_number, {key: value for key, value in row.items() if value not in ('', None)}
+
+
+def read_rows(lines, file_format):
+    """Возвращает генератор (номер строки, задача) для файла в формате jsonl или csv."""
+    if file_format == 'csv':
+        return read_csv(lines)
+    if file_format == 'jsonl':
+        return read_json_lines(lines)
+    raise ValidationError({'detail': f'Неизвестный формат файла: {file_format}.'})
+
+
+def _parse_id(value, field, line_number):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({'detail': f'Строка {line_number}: поле {field} должно быть числом.'})
+
+
+def build_task(line_number, row):
+    """Проверяет строку файла и возвращает (задача, ref, parent_ref).
+
+    ref - идентификатор задачи внутри файла, parent_ref - ref родительской задачи из этого же файла. Ссылку на уже
+    существующую задачу можно передать через parent_task."""
+    title = row.get('title')
+    if not title or len(str(title)) > TITLE_MAX_LENGTH:
+        raise ValidationError({'detail': f'Строка {line_number}: поле title обязательно и не длиннее '
+                                         f'{TITLE_MAX_LENGTH} символов.'})
+    try:
+        date = datetime.date.fromisoformat(str(row.get('date')))
+    except ValueError:
+        raise ValidationError({'detail': f'Строка {line_number}: поле date должно быть датой в формате ГГГГ-ММ-ДД.'})
+    if str(row.get('status', False)).lower() not in ('false', '0'):
+        raise ValidationError({'detail': f"Строка {line_number}: поле 'status' не может быть True при создании "
+                                         f"задачи."})
+
+    task = Task(
+        title=str(title),
+        date=date,
+        employee_id=_parse_id(row.get('employee'), 'employee', line_number),
+        parent_task_id=_parse_id(row.get('parent_task'), 'parent_task', line_number),
+    )
+    ref = row.get('ref')
+    parent_ref = row.get('parent_ref')
+    return task, None if ref is None else str(ref), None if parent_ref is None else str(parent_ref)
+
+
+def _check_exists(model, ids, field):
+    """Проверяет одним запросом, что все объекты, на которые ссылается пачка, существуют."""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return
+    missing = ids - set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    if missing:
+        raise ValidationError({'detail': f'Несуществующие значения поля {field}: {sorted(missing)}.'})
+
+
+def import_tasks(rows, chunk_size=1000):
+    """Создаёт задачи из потока строк пачками по chunk_size через bulk_create.
+
+    Каждая пачка создаётся в своей транзакции вместе с количеством задач и загруженностью сотрудников, поэтому импорт
+    большого файла не держит одну длинную транзакцию. При ошибке не создаётся только пачка с ошибкой, а задачи из
+    предыдущих пачек остаются: сколько их, сказано в тексте ошибки.
+
+    Ссылки parent_ref на задачи из этого же файла порядок строк не ограничивают: задача со ссылкой на ещё не созданную
+    задачу получает родительскую задачу, как только та будет создана. В памяти остаются только pk задач с ref (на них
+    может сослаться любая следующая строка) и pk задач, ждущих свою родительскую задачу. Возвращает количество
+    созданных задач."""
+    refs = {}
+    # ref родительской задачи -> pk задач, которые ждут её создания
+    deferred_parents = defaultdict(list)
+    created = 0
+    rows = iter(rows)
+    while True:
+        try:
+            chunk = [build_task(line_number, row) for line_number, row in islice(rows, chunk_size)]
+            if not chunk:
+                break
+            with transaction.atomic():
+                _import_chunk(chunk, refs, deferred_parents)
+        except ValidationError as error:
+            if created:
+                error.detail['detail'] = f"{error.detail['detail']} Задачи из предыдущих пачек созданы: {created}."
+            raise
+        created += len(chunk)
+    if deferred_parents:
+        missing = next(iter(deferred_parents))
+        raise ValidationError({'detail': f'Не найдена задача с ref {missing}. Задачи созданы без родительской '
+                                         f'задачи: {sum(len(pks) for pks in deferred_parents.values())}.'})
+    return created
+
+
+def _import_chunk(chunk, refs, deferred_parents):
+    """Создаёт одну пачку задач импорта и привязывает к её задачам дочерние задачи, которые их ждали."""
+    tasks = [task for task, _, _ in chunk]
+    _check_exists(Employee, (task.employee_id for task in tasks), 'employee')
+    _check_exists(Task, (task.parent_task_id for task in tasks), 'parent_task')
+    ref_counts = Counter(ref for _, ref, _ in chunk if ref is not None)
+    duplicates = [ref for ref, count in ref_counts.items() if count > 1 or ref in refs]
+    if duplicates:
+        raise ValidationError({'detail': f'Повторяющийся ref: {duplicates[0]}.'})
+
+    for task, _, parent_ref in chunk:
+        # Родительская задача из предыдущих пачек уже создана, её pk известен
+        if parent_ref is not None and parent_ref in refs:
+            task.parent_task_id = refs[parent_ref]
+    Task.objects.bulk_create(tasks)
+    record_changes(Task, (task.pk for task in tasks), ChangeLog.CREATE)
+    publish_task_events(CREATE, [task.pk for task in tasks])
+
+    chunk_refs = {}
+    for task, ref, parent_ref in chunk:
+        if ref is not None:
+            chunk_refs[ref] = task.pk
+        if parent_ref is not None and task.parent_task_id is None:
+            deferred_parents[parent_ref].append(task.pk)
+    refs.update(chunk_refs)
+    # Задачи, которые ждали задач этой пачки (в том числе из этой же пачки), получают родительскую задачу
+    resolved = [
+        Task(pk=pk, parent_task_id=refs[parent_ref])
+        for parent_ref in [ref for ref in chunk_refs if ref in deferred_parents]
+        for pk in deferred_parents.pop(parent_ref)
+    ]
+    Task.objects.bulk_update(resolved, ['parent_task'])
+    record_changes(Task, (task.pk for task in resolved), ChangeLog.UPDATE)
+    publish_task_events(UPDATE, [task.pk for task in resolved])
+
+    change_task_counts(Counter(task.employee_id for task in tasks))
+    change_workload([(None, (task.employee_id, task.status, task.date)) for task in tasks])
+    # bulk_create не отправляет сигналы, поэтому задачи, у которых появились дочерние, ставлю в очередь сам
+    enqueue_for_assignment([task.parent_task_id for task in tasks] + [task.parent_task_id for task in resolved])
+    invalidate_responses()
+
+
+# Результаты массового изменения для отдельных задач
+UPDATED = 'updated'
+COMPLETED = 'completed'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def update_tasks(task_ids, patch):
+    """Применяет к задачам task_ids одни и те же изменения patch (status, employee, date, parent_task - как в
+    validated_data TaskSerializer) в одной транзакции. Возвращает {pk задачи: результат}.
+
+    Задачи меняются одним UPDATE, количество задач сотрудников - сгруппированным запросом, поэтому запросов столько же,
+    сколько для одной задачи. Задача, которая стала бы зависеть сама от себя, не меняется (результат invalid)."""
+    task_ids = list(dict.fromkeys(task_ids))
+    with transaction.atomic():
+        previous = {
+            pk: (employee_id, status, date)
+            for pk, employee_id, status, date in Task.objects.filter(pk__in=task_ids).select_for_update()
+            .values_list('pk', 'employee_id', 'status', 'date')
+        }
+        results = {pk: UPDATED if pk in previous else NOT_FOUND for pk in task_ids}
+        employee_id = None if patch.get('employee') is None else patch['employee'].pk
+        if 'parent_task' in patch and patch['parent_task'] is not None:
+            # Задача не может зависеть от новой родительской задачи, если та сама зависит от неё
+            for pk in get_ancestor_ids([patch['parent_task'].pk]).get(patch['parent_task'].pk, ()):
+                if pk in previous:
+                    results[pk] = INVALID
+        updated = [pk for pk, result in results.items() if result == UPDATED]
+        if not updated:
+            return results
+        Task.objects.filter(pk__in=updated).update(**patch)
+        record_changes(Task, updated, ChangeLog.UPDATE)
+
+        if 'employee' in patch:
+            deltas = Counter()
+            for pk in updated:
+                # Выполненные задачи уже вычеркнуты из количества задач сотрудника
+                if previous[pk][0] != employee_id and not previous[pk][1]:
+                    deltas[previous[pk][0]] -= 1
+                    deltas[employee_id] += 1
+            change_task_counts(deltas)
+        # События назначения отправляются с прежним исполнителем, поэтому задачи группируются по нему
+        events = defaultdict(list)
+        for pk in updated:
+            previous_employee_id = previous[pk][0]
+            assigned = 'employee' in patch and employee_id is not None and employee_id != previous_employee_id
+            events[ASSIGN if assigned else UPDATE, previous_employee_id].append(pk)
+        for (event_type, previous_employee_id), pks in events.items():
+            publish_task_events(event_type, pks, previous_employee_id)
+
+        # Как и сигналы одиночного изменения, ставлю в очередь распределения новую родительскую задачу и задачи,
+        # у которых убрали исполнителя
+        queued = []
+        if patch.get('parent_task') is not None:
+            queued.append(patch['parent_task'].pk)
+        if 'employee' in patch and employee_id is None:
+            queued.extend(pk for pk in updated if previous[pk][0] is not None)
+        enqueue_for_assignment(queued)
+        change_workload([
+            (previous[pk], (employee_id if 'employee' in patch else previous[pk][0],
+                            patch.get('status', previous[pk][1]), patch.get('date', previous[pk][2])))
+            for pk in updated
+        ])
+        invalidate_responses()
+    return results
+
+
+def complete_tasks(task_ids):
+    """Выполняет задачи task_ids в одной транзакции: как и при выполнении одной задачи, задачи получают status=True и
+    вычёркиваются из количества задач сотрудников, а в архив их потом переносит archive_completed_tasks. Уже
+    выполненные задачи не меняются. Возвращает {pk задачи: результат}."""
+    task_ids = list(dict.fromkeys(task_ids))
+    with transaction.atomic():
+        rows = list(
+            Task.objects.filter(pk__in=task_ids).select_for_update().values_list('pk', 'employee_id', 'status', 'date')
+        )
+        results = {pk: NOT_FOUND for pk in task_ids}
+        results.update(dict.fromkeys((row[0] for row in rows), COMPLETED))
+        completed = [pk for pk, _, status, _ in rows if not status]
+        if not completed:
+            return results
+        Task.objects.filter(pk__in=completed).update(status=True)
+        record_changes(Task, completed, ChangeLog.UPDATE)
+        publish_task_events(COMPLETE, completed)
+        employee_counts = Counter(employee_id for _, employee_id, status, _ in rows if not status)
+        change_task_counts({employee_id: -count for employee_id, count in employee_counts.items()})
+        change_workload([((employee_id, False, date), (employee_id, True, date))
+                         for _, employee_id, status, date in rows if not status])
+        invalidate_responses()
+    return results
+
+
+class Echo:
+    """Объект с интерфейсом файла, который возвращает записанную строку, а не хранит её."""
+    def write(self, value):
+        return value
+
+
+def export_tasks(queryset, file_format, chunk_size=2000):
+    """Построчно выгружает задачи в формате jsonl или csv.
+
+    Задачи читаются через .iterator(), поэтому в памяти одновременно находится не больше chunk_size строк."""
+    rows = queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            task = dict(zip(EXPORT_FIELDS, row))
+            task['date'] = task['date'].isoformat()
+            yield json.dumps(task, ensure_ascii=False) + '\n'
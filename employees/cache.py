@@ -0,0 +1,142 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import quote_etag, parse_etags
+from rest_framework.response import Response
+
+from employees.routers import is_replica_allowed
+
+# Версия данных сотрудников и задач. Она входит в ключ каждого закэшированного ответа, поэтому после записи в БД
+# достаточно увеличить версию - старые ответы перестают находиться и истекают сами
+DATA_VERSION_KEY = 'employees:data_version'
+RESPONSE_KEY_PREFIX = 'employees:response'
+HITS_KEY = 'employees:response_cache:hits'
+MISSES_KEY = 'employees:response_cache:misses'
+
+
+def get_data_version():
+    """Возвращает текущую версию данных."""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        # Если ключ вытеснен из кэша, начинаю с текущего времени, чтобы не совпасть ни с одной из прежних версий
+        cache.add(DATA_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def _bump_data_version():
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.add(DATA_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_responses():
+    """Делает недействительными все закэшированные ответы.
+
+    Версия увеличивается сразу и ещё раз после фиксации транзакции: иначе запрос, прочитавший данные до фиксации,
+    мог бы сохранить устаревший ответ под уже новой версией."""
+    _bump_data_version()
+    transaction.on_commit(_bump_data_version)
+
+
+def require_shared_cache(feature):
+    """Проверяет, что кэш общий для всех процессов (Redis), а не кэш в памяти процесса, в котором feature молча
+    работала бы только внутри одного процесса."""
+    if not settings.SHARED_CACHE:
+        raise ImproperlyConfigured(
+            f'{feature} нужен общий для всех процессов кэш: задайте CACHE_URL или Redis в CELERY_BROKER_URL'
+        )
+
+
+def increment_counter(key, delta=1):
+    """Атомарно увеличивает счётчик в кэше, общий для всех процессов."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, delta)
+
+
+def get_response_cache_stats():
+    """Возвращает количество попаданий и промахов кэша ответов."""
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': stats.get(HITS_KEY, 0), 'misses': stats.get(MISSES_KEY, 0)}
+
+
+def get_response_cache_key(request):
+    """Ключ ответа: версия данных, путь, отсортированные параметры запроса (включая ordering и курсор) и формат."""
+    query = urlencode(sorted((key, value) for key, values in request.query_params.lists() for value in values))
+    accepted = request.accepted_media_type or ''
+    digest = hashlib.md5(f'{request.path}?{query}|{accepted}'.encode('utf-8')).hexdigest()
+    return f'{RESPONSE_KEY_PREFIX}:{get_data_version()}:{digest}'
+
+
+def get_response_cache_timeout():
+    """Время хранения ответа. Ответ, прочитанный из отстающей реплики, может быть старее текущей версии данных, поэтому
+    хранится недолго."""
+    return settings.REPLICA_LAG_SECONDS if is_replica_allowed() else settings.RESPONSE_CACHE_TIMEOUT
+
+
+def get_cached_response(key):
+    """Возвращает закэшированный ответ или None и считает попадания и промахи кэша."""
+    cached = cache.get(key)
+    if cached is None:
+        increment_counter(MISSES_KEY)
+        return None
+
+    increment_counter(HITS_KEY)
+    content, content_type, etag = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def cache_response(key, content, content_type, timeout):
+    """Сохраняет ответ в кэш и возвращает его ETag."""
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    cache.set(key, (content, content_type, etag), timeout)
+    return etag
+
+
+def get_not_modified(request, response):
+    """Возвращает ответ 304, если ETag ответа совпадает с If-None-Match запроса, иначе сам ответ."""
+    etag = response.get('ETag')
+    if etag and response.status_code == 200 and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        not_modified = HttpResponseNotModified()
+        not_modified['ETag'] = etag
+        return not_modified
+    return response
+
+
+class CachedListMixin:
+    """Кэширует ответы списков и отвечает 304, если ответ не изменился с прошлого запроса клиента (If-None-Match)."""
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return super().list(request, *args, **kwargs)
+
+        self.response_cache_key = get_response_cache_key(request)
+        response = get_cached_response(self.response_cache_key)
+        if response is None:
+            return super().list(request, *args, **kwargs)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key is not None and isinstance(response, Response) and response.status_code == 200:
+            # Ответ рендерится здесь, а не после view, поэтому начало рендеринга отмечаю для QueryProfilingMiddleware
+            request._request.render_started = time.perf_counter()
+            response.render()
+            response['ETag'] = cache_response(key, response.content, response['Content-Type'],
+                                              get_response_cache_timeout())
+            response['X-Cache'] = 'MISS'
+        return get_not_modified(request, response)
@@ -0,0 +1,117 @@
+import datetime
+
+from django.db import connections, router, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from employees.models import ChangeLog
+from employees.routers import allow_replica
+
+
+def record_changes(model, object_ids, action):
+    """Записывает в журнал изменений создание, изменение или удаление объектов model с pk из object_ids.
+
+    Вызывается в той же транзакции, что и само изменение, поэтому откаченные изменения в журнал не попадают. Номер
+    изменения присваивается позже, в sequence_changes."""
+    object_ids = {pk for pk in object_ids if pk is not None}
+    if not object_ids:
+        return
+    model_name = model._meta.model_name
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(model=model_name, object_id=pk, action=action) for pk in sorted(object_ids)],
+        batch_size=1000,
+    )
+
+
+# Ключ рекомендательной блокировки PostgreSQL, под которой нумеруются записи журнала
+SEQUENCE_LOCK_ID = 0x6368616E6765
+
+
+def lock_sequence():
+    """Берёт до конца транзакции блокировку нумерации журнала. Блокировки строк журнала мало: два вызова могут
+    заблокировать разные непронумерованные записи, прочитать одинаковый максимум и выдать одинаковые номера. В SQLite
+    записи и так выполняются по одной."""
+    connection = connections[router.db_for_write(ChangeLog)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK_ID])
+
+
+def sequence_changes(limit=1000):
+    """Присваивает номера (seq) записям журнала, у которых их ещё нет, в порядке добавления. Возвращает количество
+    пронумерованных записей.
+
+    Номера присваиваются только уже зафиксированным записям, поэтому запись транзакции, которая зафиксируется позже,
+    получит номер больше всех выданных клиентам, и клиент, читающий журнал по возрастанию seq, её не пропустит.
+    Параллельные вызовы ждут друг друга на блокировке нумерации (lock_sequence). Все запросы идут в основную БД, даже
+    если вызов пришёл из запроса на чтение."""
+    with allow_replica(False), transaction.atomic():
+        lock_sequence()
+        ids = list(
+            ChangeLog.objects.filter(seq__isnull=True).order_by('id').select_for_update()
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return 0
+        # Максимум читается под блокировкой нумерации, поэтому учитывает номера, выданные параллельным вызовом
+        last = ChangeLog.objects.aggregate(last=Max('seq'))['last'] or 0
+        ChangeLog.objects.bulk_update(
+            [ChangeLog(id=pk, seq=last + number) for number, pk in enumerate(ids, start=1)],
+            ['seq'],
+            batch_size=limit,
+        )
+    return len(ids)
+
+
+def get_last_seq():
+    """Возвращает номер последнего изменения в журнале (0, если журнал пуст)."""
+    sequence_changes()
+    return ChangeLog.objects.aggregate(last=Max('seq'))['last'] or 0
+
+
+def is_since_available(since):
+    """Проверяет, что изменения после since ещё есть в журнале и не удалены prune_changes."""
+    first = ChangeLog.objects.aggregate(first=Min('seq'))['first']
+    return first is None or since >= first - 1
+
+
+def get_changes(since, limit):
+    """Возвращает (изменения, есть ли ещё изменения) после номера since, не больше limit записей журнала.
+
+    Изменения - список (seq, model, pk, action) по возрастанию seq. Несколько изменений одного объекта в пачке
+    схлопываются в одно с номером последнего: создание и следующие изменения - в создание, любое изменение перед
+    удалением - в удаление."""
+    sequence_changes(limit)
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=since).order_by('seq')
+        .values_list('seq', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit or ChangeLog.objects.filter(seq__isnull=True).exists()
+    changes = {}
+    for seq, model, object_id, action in entries[:limit]:
+        previous = changes.pop((model, object_id), None)
+        if previous is not None and previous[3] == ChangeLog.CREATE and action == ChangeLog.UPDATE:
+            action = ChangeLog.CREATE
+        changes[(model, object_id)] = (seq, model, object_id, action)
+    return sorted(changes.values()), has_more
+
+
+def prune_changes(retention_days, chunk_size=10000):
+    """Удаляет из журнала пронумерованные записи старше retention_days дней пачками по chunk_size. Клиентам, которые
+    не забирали изменения дольше, нужна полная синхронизация. Возвращает количество удалённых записей.
+
+    Последняя пронумерованная запись не удаляется никогда: от неё sequence_changes отсчитывает следующие номера, и
+    без неё номера начались бы заново."""
+    border = timezone.now() - datetime.timedelta(days=retention_days)
+    last = ChangeLog.objects.aggregate(last=Max('seq'))['last']
+    deleted = 0
+    if last is None:
+        return deleted
+    while True:
+        ids = list(
+            ChangeLog.objects.filter(seq__lt=last, created_at__lt=border).order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
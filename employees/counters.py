@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db.models import F, OuterRef, Subquery, Count, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from employees.cache import invalidate_responses
+from employees.changes import record_changes
+from employees.models import ChangeLog, Employee, Task
+
+
+def change_task_count(employee_id, delta):
+    """Атомарно меняет количество задач сотрудника на delta.
+
+    Выполняет UPDATE ... SET task_count = task_count + delta в БД, поэтому параллельные изменения не теряются и
+    остальные поля сотрудника не перезаписываются. Количество задач не опускается ниже нуля."""
+    if employee_id is None or not delta:
+        return
+    Employee.objects.filter(pk=employee_id).update(task_count=Greatest(F('task_count') + delta, Value(0)))
+    record_changes(Employee, [employee_id], ChangeLog.UPDATE)
+    invalidate_responses()
+
+
+def change_task_counts(deltas):
+    """Атомарно меняет количество задач нескольких сотрудников.
+
+    deltas - словарь {pk сотрудника: изменение}. Сотрудники с одинаковым изменением обновляются одним запросом,
+    поэтому при массовом назначении задач запросов столько, сколько разных изменений, а не сотрудников."""
+    employees_by_delta = defaultdict(list)
+    for employee_id, delta in deltas.items():
+        if employee_id is not None and delta:
+            employees_by_delta[delta].append(employee_id)
+    for delta, employee_ids in employees_by_delta.items():
+        Employee.objects.filter(pk__in=employee_ids).update(task_count=Greatest(F('task_count') + delta, Value(0)))
+    if employees_by_delta:
+        record_changes(Employee, [pk for employee_ids in employees_by_delta.values() for pk in employee_ids],
+                       ChangeLog.UPDATE)
+        invalidate_responses()
+
+
+def reconcile_task_counts():
+    """Пересчитывает количество задач всех сотрудников по таблице задач.
+
+    Сотрудники, у которых счётчик разошёлся с реальным количеством задач, находятся одним запросом с коррелированным
+    агрегатом по невыполненным задачам и исправляются одним UPDATE. Возвращает количество исправленных сотрудников."""
+    actual_task_count = Coalesce(
+        Subquery(
+            Task.objects.filter(employee=OuterRef('pk'), status=False)
+            .order_by()
+            .values('employee')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+    # Исправленных сотрудников нужно записать в журнал изменений, поэтому сначала выбираю их pk
+    employee_ids = list(
+        Employee.objects.annotate(actual_task_count=actual_task_count)
+        .exclude(task_count=F('actual_task_count'))
+        .values_list('pk', flat=True)
+    )
+    if not employee_ids:
+        return 0
+    updated = Employee.objects.filter(pk__in=employee_ids).update(task_count=actual_task_count)
+    record_changes(Employee, employee_ids, ChangeLog.UPDATE)
+    invalidate_responses()
+    return updated
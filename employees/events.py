@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from functools import lru_cache
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+
+from employees.graph import get_ancestor_ids
+from employees.models import Task
+from employees.routers import allow_replica
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, через который события задач расходятся по всем процессам приложения
+EVENTS_CHANNEL = 'task_events'
+
+# Типы событий задач
+CREATE = 'create'
+UPDATE = 'update'
+ASSIGN = 'assign'
+COMPLETE = 'complete'
+DELETE = 'delete'
+
+TASK_FIELDS = ('id', 'title', 'date', 'status', 'parent_task_id', 'employee_id')
+
+
+def format_event(name, data):
+    """Возвращает событие в формате server-sent events."""
+    return f'event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode()
+
+
+# Комментарий, который отправляется неактивным подписчикам, чтобы прокси не закрывали соединение
+KEEPALIVE = b': keepalive\n\n'
+# Событие для подписчика, который мог пропустить события: ему нужно догрузить изменения через /changes/
+RESET = format_event('reset', {})
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """Синхронный клиент Redis для публикации событий."""
+    return redis.Redis.from_url(settings.TASK_EVENTS_REDIS_URL)
+
+
+class Subscription:
+    """Подписка одного клиента: ключи, по которым он получает события, и очередь готовых к отправке событий.
+
+    Очередь ограничена, поэтому медленный клиент не копит события в памяти: при переполнении очередь очищается и
+    клиент получает reset."""
+
+    def __init__(self, keys, size):
+        self.keys = keys
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class EventHub:
+    """Рассылка событий задач подписчикам одного процесса.
+
+    Процесс держит одно подключение к Redis (канал EVENTS_CHANNEL), а каждое пришедшее событие раскладывает по
+    очередям подписчиков через словарь {ключ: подписки}, поэтому тысячи неактивных подписчиков стоят только своих
+    очередей. Событие форматируется один раз для всех получателей. Без Redis (TASK_EVENTS_REDIS_URL не задан) события
+    доходят только до подписчиков того процесса, где изменили задачу."""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, keys):
+        """Создаёт подписку на события по ключам вида employee:<pk> и task:<pk>. Вызывать из цикла событий."""
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(keys, settings.TASK_EVENTS_QUEUE_SIZE)
+        for key in keys:
+            self.subscriptions[key].add(subscription)
+        if settings.TASK_EVENTS_REDIS_URL and (self.listener is None or self.listener.done()):
+            self.listener = self.loop.create_task(self.listen())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for key in subscription.keys:
+            subscribers = self.subscriptions.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[key]
+
+    def dispatch(self, message):
+        """Раскладывает сообщение (JSON-список {'keys': [...], 'event': {...}}) по очередям подписчиков."""
+        for item in json.loads(message):
+            receivers = set()
+            for key in item['keys']:
+                receivers.update(self.subscriptions.get(key, ()))
+            if receivers:
+                data = format_event('task', item['event'])
+                for subscription in receivers:
+                    subscription.put(data)
+
+    def reset_all(self):
+        for subscription in set().union(*self.subscriptions.values()):
+            subscription.put(RESET)
+
+    def publish_local(self, message):
+        """Передаёт сообщение подписчикам этого процесса из любого потока."""
+        if self.loop is not None and self.subscriptions:
+            self.loop.call_soon_threadsafe(self.dispatch, message)
+
+    async def listen(self):
+        """Читает канал Redis и раздаёт события, пока в процессе есть подписчики. После потери соединения
+        переподключается, а подписчики получают reset, потому что события за это время потеряны."""
+        client = redis.asyncio.Redis.from_url(settings.TASK_EVENTS_REDIS_URL)
+        while self.subscriptions:
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(EVENTS_CHANNEL)
+                    while self.subscriptions:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+                        if message is not None:
+                            self.dispatch(message['data'])
+            except (redis.RedisError, OSError):
+                logger.exception('Потеряно подключение к Redis для событий задач')
+                self.reset_all()
+                await asyncio.sleep(1)
+        await client.aclose()
+
+
+hub = EventHub()
+
+
+def has_subscribers():
+    """Проверяет, что события кто-то слушает, чтобы без подписчиков не читать задачи из БД."""
+    if settings.TASK_EVENTS_REDIS_URL:
+        return get_redis().pubsub_numsub(EVENTS_CHANNEL)[0][1] > 0
+    return bool(hub.subscriptions)
+
+
+def get_task_data(row):
+    """Задача в том же виде, что в ответах API (TaskSerializer)."""
+    pk, title, date, status, parent_task_id, employee_id = row
+    return {'id': pk, 'title': title, 'date': None if date is None else str(date), 'status': status,
+            'parent_task': parent_task_id, 'employee': employee_id}
+
+
+def publish(event_type, task_ids=(), previous_employee_id=None, rows=()):
+    """Публикует события по задачам task_ids (читаются из БД) или по уже известным строкам rows (удалённые задачи).
+
+    Событие получают подписчики исполнителя задачи и прежнего исполнителя (previous_employee_id), самой задачи и
+    всех задач, от которых она зависит."""
+    if not has_subscribers():
+        return
+    # Изменения только что зафиксированы, реплика могла их ещё не получить
+    with allow_replica(False):
+        rows = list(rows) + list(Task.objects.filter(pk__in=task_ids).values_list(*TASK_FIELDS))
+        ancestors = get_ancestor_ids({row[4] for row in rows if row[4] is not None})
+    items = []
+    for row in rows:
+        task = get_task_data(row)
+        employee_ids = sorted({task['employee'], previous_employee_id} - {None})
+        chain = [task['id'], *ancestors.get(task['parent_task'], ())]
+        items.append({
+            'keys': [f'employee:{pk}' for pk in employee_ids] + [f'task:{pk}' for pk in chain],
+            'event': {'type': event_type, 'task': task, 'previous_employee': previous_employee_id},
+        })
+    if not items:
+        return
+    message = json.dumps(items)
+    if settings.TASK_EVENTS_REDIS_URL:
+        get_redis().publish(EVENTS_CHANNEL, message)
+    else:
+        hub.publish_local(message)
+
+
+def publish_task_events(event_type, task_ids, previous_employee_id=None):
+    """После фиксации транзакции публикует событие event_type по задачам task_ids. Если транзакция откатится,
+    события не будет, а ошибка публикации только пишется в лог и не ломает уже выполненный запрос."""
+    task_ids = [pk for pk in task_ids if pk is not None]
+    if settings.TASK_EVENTS_ENABLED and task_ids:
+        transaction.on_commit(lambda: publish(event_type, task_ids, previous_employee_id), robust=True)
+
+
+def publish_deleted_tasks(rows, event_type=DELETE):
+    """После фиксации транзакции публикует удаление (или выполнение) задач по их строкам со столбцами TASK_FIELDS,
+    прочитанным до удаления."""
+    rows = list(rows)
+    if settings.TASK_EVENTS_ENABLED and rows:
+        transaction.on_commit(lambda: publish(event_type, rows=rows), robust=True)
+
+
+def publish_deleted_task(instance, event_type=DELETE):
+    """После фиксации транзакции публикует удаление (или выполнение) задачи по данным удалённого объекта."""
+    publish_deleted_tasks([tuple(getattr(instance, field) for field in TASK_FIELDS)], event_type)
@@ -0,0 +1,57 @@
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django_filters import rest_framework as filters
+
+from employees.models import Employee, Task, TaskArchive
+
+
+class TaskFilter(filters.FilterSet):
+    """Фильтры списка задач.
+
+    Каждый фильтр опирается на индекс: исполнитель и родительская задача - индексы внешних ключей, статус, срок и
+    просроченность - task_status_date_idx, поиск по названию - триграммный индекс task_title_trgm_idx (PostgreSQL)."""
+    # Фильтр по id без проверки существования объекта, чтобы не делать лишний запрос к БД
+    employee = filters.NumberFilter(field_name='employee')
+    parent_task = filters.NumberFilter(field_name='parent_task')
+    has_children = filters.BooleanFilter(method='filter_has_children', label='Есть дочерние задачи')
+    overdue = filters.BooleanFilter(method='filter_overdue', label='Просрочена')
+    search = filters.CharFilter(field_name='title', lookup_expr='icontains', label='Поиск по названию')
+
+    class Meta:
+        model = Task
+        fields = {
+            'status': ['exact'],
+            'employee': ['isnull'],
+            'parent_task': ['isnull'],
+            'date': ['gte', 'lte'],
+        }
+
+    def filter_has_children(self, queryset, name, value):
+        has_children = Exists(Task.objects.filter(parent_task=OuterRef('pk')))
+        return queryset.filter(has_children if value else ~has_children)
+
+    def filter_overdue(self, queryset, name, value):
+        overdue = Q(status=False, date__lt=timezone.localdate())
+        return queryset.filter(overdue) if value else queryset.exclude(overdue)
+
+
+class EmployeeFilter(filters.FilterSet):
+    """Фильтры списка сотрудников: должность (employee_post_idx), количество задач (employee_task_count_idx) и поиск
+    по ФИО (триграммный индекс employee_full_name_trgm_idx в PostgreSQL)."""
+    search = filters.CharFilter(field_name='full_name', lookup_expr='icontains', label='Поиск по ФИО')
+
+    class Meta:
+        model = Employee
+        fields = {
+            'post': ['exact'],
+            'task_count': ['gte', 'lte'],
+        }
+
+
+class TaskArchiveFilter(filters.FilterSet):
+    """Фильтры архива задач: исполнитель (индекс task_archive_employee_idx вместе с сортировкой по pk)."""
+    employee = filters.NumberFilter(field_name='employee')
+
+    class Meta:
+        model = TaskArchive
+        fields = ['employee']
@@ -0,0 +1,167 @@
+from django.db import connections, router
+
+from employees.models import Task
+
+# Рекурсивные CTE ниже хранят путь обхода строкой вида ',1,5,8,', чтобы обнаруживать циклы в parent_task и не уходить
+# в бесконечную рекурсию. Строки и LIKE работают одинаково в PostgreSQL и SQLite, поэтому запросы переносимы.
+TASK_TABLE = Task._meta.db_table
+
+ANCESTORS_SQL = f'''
+WITH RECURSIVE chain(id, parent_task_id, depth, path, is_cycle) AS (
+    SELECT id, parent_task_id, 0, ',' || CAST(id AS TEXT) || ',', 0
+    FROM {TASK_TABLE}
+    WHERE id = %s
+    UNION ALL
+    SELECT parent.id, parent.parent_task_id, chain.depth + 1,
+           chain.path || CAST(parent.id AS TEXT) || ',',
+           CASE WHEN chain.path LIKE '%%,' || CAST(parent.id AS TEXT) || ',%%' THEN 1 ELSE 0 END
+    FROM {TASK_TABLE} parent
+    JOIN chain ON parent.id = chain.parent_task_id
+    WHERE chain.is_cycle = 0
+)
+'''
+
+DESCENDANTS_SQL = f'''
+WITH RECURSIVE subtree(id, depth, path, is_cycle) AS (
+    SELECT id, 0, ',' || CAST(id AS TEXT) || ',', 0
+    FROM {TASK_TABLE}
+    WHERE id = %s
+    UNION ALL
+    SELECT child.id, subtree.depth + 1,
+           subtree.path || CAST(child.id AS TEXT) || ',',
+           CASE WHEN subtree.path LIKE '%%,' || CAST(child.id AS TEXT) || ',%%' THEN 1 ELSE 0 END
+    FROM {TASK_TABLE} child
+    JOIN subtree ON child.parent_task_id = subtree.id
+    WHERE subtree.is_cycle = 0 AND (%s IS NULL OR subtree.depth < %s)
+)
+'''
+
+# Задачи, до которых нельзя дойти от корневых задач (без родителя), лежат в цикле или под ним
+UNREACHABLE_SQL = f'''
+WITH RECURSIVE reachable(id) AS (
+    SELECT id FROM {TASK_TABLE} WHERE parent_task_id IS NULL
+    UNION
+    SELECT child.id
+    FROM {TASK_TABLE} child
+    JOIN reachable ON child.parent_task_id = reachable.id
+)
+SELECT id FROM {TASK_TABLE} WHERE id NOT IN (SELECT id FROM reachable) ORDER BY id
+'''
+
+
+def _fetch(sql, params):
+    with connections[router.db_for_read(Task)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _parse_path(path):
+    return [int(pk) for pk in path.strip(',').split(',')]
+
+
+def get_ancestors(task_id, include_self=False):
+    """Возвращает цепочку родительских задач от ближайшей до корневой.
+
+    Выполняется одним запросом. У каждой задачи есть атрибут depth - расстояние до task_id. Если задачи нет, список
+    пустой; include_self добавляет саму задачу в начало списка, чтобы это можно было отличить."""
+    minimum_depth = 0 if include_self else 1
+    return list(Task.objects.raw(
+        ANCESTORS_SQL + f'''
+        SELECT task.*, chain.depth
+        FROM chain
+        JOIN {TASK_TABLE} task ON task.id = chain.id
+        WHERE chain.is_cycle = 0 AND chain.depth >= %s
+        ORDER BY chain.depth
+        ''',
+        [task_id, minimum_depth],
+    ))
+
+
+def get_ancestor_ids(task_ids, chunk_size=500):
+    """Возвращает {pk задачи: [pk задачи, pk родительской задачи, ..., pk корневой задачи]} для задач task_ids.
+
+    Выполняется одним запросом на chunk_size задач. Задач, которых нет, в результате нет."""
+    task_ids = sorted(set(task_ids))
+    result = {}
+    for start in range(0, len(task_ids), chunk_size):
+        chunk = task_ids[start:start + chunk_size]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        rows = _fetch(f'''
+        WITH RECURSIVE chain(origin, id, parent_task_id, depth, path, is_cycle) AS (
+            SELECT id, id, parent_task_id, 0, ',' || CAST(id AS TEXT) || ',', 0
+            FROM {TASK_TABLE}
+            WHERE id IN ({placeholders})
+            UNION ALL
+            SELECT chain.origin, parent.id, parent.parent_task_id, chain.depth + 1,
+                   chain.path || CAST(parent.id AS TEXT) || ',',
+                   CASE WHEN chain.path LIKE '%%,' || CAST(parent.id AS TEXT) || ',%%' THEN 1 ELSE 0 END
+            FROM {TASK_TABLE} parent
+            JOIN chain ON parent.id = chain.parent_task_id
+            WHERE chain.is_cycle = 0
+        )
+        SELECT origin, id FROM chain WHERE is_cycle = 0 ORDER BY origin, depth
+        ''', chunk)
+        for origin, pk in rows:
+            result.setdefault(origin, []).append(pk)
+    return result
+
+
+def get_descendants(task_id, max_depth=None):
+    """Возвращает задачу и все зависящие от неё задачи (поддерево) в порядке обхода в ширину.
+
+    Выполняется одним запросом. У каждой задачи есть атрибут depth - расстояние от task_id, max_depth ограничивает
+    глубину поддерева."""
+    return list(Task.objects.raw(
+        DESCENDANTS_SQL + f'''
+        SELECT task.*, subtree.depth
+        FROM subtree
+        JOIN {TASK_TABLE} task ON task.id = subtree.id
+        WHERE subtree.is_cycle = 0
+        ORDER BY subtree.depth, subtree.id
+        ''',
+        [task_id, max_depth, max_depth],
+    ))
+
+
+def get_depth(task_id):
+    """Возвращает глубину задачи: 0 для корневой задачи, None если задачи нет."""
+    rows = _fetch(ANCESTORS_SQL + 'SELECT MAX(depth) FROM chain WHERE is_cycle = 0', [task_id])
+    return rows[0][0]
+
+
+def get_critical_path(task_id):
+    """Возвращает самую длинную цепочку зависимых задач, начиная с task_id, в виде списка pk.
+
+    Это последовательность задач, которые нельзя выполнять параллельно: каждая следующая зависит от предыдущей."""
+    rows = _fetch(
+        DESCENDANTS_SQL + 'SELECT path FROM subtree WHERE is_cycle = 0 ORDER BY depth DESC, id LIMIT 1',
+        [task_id, None, None],
+    )
+    return _parse_path(rows[0][0]) if rows else []
+
+
+def get_critical_path_from_subtree(tasks):
+    """То же, что get_critical_path, но по уже загруженному поддереву из get_descendants, без запросов в БД."""
+    if not tasks:
+        return []
+    parents = {task.pk: task.parent_task_id for task in tasks}
+    deepest = min(tasks, key=lambda task: (-task.depth, task.pk))
+    path = [deepest.pk]
+    for _ in range(deepest.depth):
+        path.append(parents[path[-1]])
+    return path[::-1]
+
+
+def find_cycle(task_id):
+    """Возвращает pk задач цикла, в который попадает цепочка родителей task_id, или пустой список."""
+    rows = _fetch(ANCESTORS_SQL + 'SELECT path FROM chain WHERE is_cycle = 1', [task_id])
+    if not rows:
+        return []
+    path = _parse_path(rows[0][0])
+    # Последний элемент пути повторяет задачу, с которой начинается цикл
+    return path[path.index(path[-1]):-1]
+
+
+def find_tasks_in_cycles():
+    """Возвращает pk всех задач, цепочка родителей которых зацикливается и не доходит до корневой задачи."""
+    return [pk for pk, in _fetch(UNREACHABLE_SQL, [])]
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from employees.archive import archive_completed_tasks
+
+
+class Command(BaseCommand):
+    help = 'Переносит выполненные задачи из таблицы задач в архив.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help='Сколько задач переносить в одной транзакции.')
+
+    def handle(self, *args, **options):
+        archived = archive_completed_tasks(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено задач в архив: {archived}'))
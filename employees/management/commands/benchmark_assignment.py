@@ -0,0 +1,79 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from employees.assignment import get_important_tasks, SharedEmployeeLoad
+from employees.counters import reconcile_task_counts
+from employees.models import Employee, Task
+from employees.strategies import get_assignment_strategy
+from employees.synthetic import create_synthetic_tasks
+from employees.tasks import assign_task_chunk
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность распределения важных задач частями при разном количестве параллельных '
+            'воркеров. Воркеры Celery имитируются потоками, у каждого своё подключение к БД, поэтому замер имеет '
+            'смысл только на PostgreSQL. Созданные задачи и сотрудники после замера удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=20_000, help='Количество синтетических задач.')
+        parser.add_argument('--fan-out', type=int, default=2,
+                            help='Количество дочерних задач у каждой задачи (важных задач примерно tasks / fan-out).')
+        parser.add_argument('--employees', type=int, default=100, help='Количество синтетических сотрудников.')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                            help='Количество параллельных воркеров в каждом замере.')
+        parser.add_argument('--chunk-size', type=int, default=settings.ASSIGNMENT_CHUNK_SIZE,
+                            help='Количество задач в одной части.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Замер параллельного распределения поддерживается только для PostgreSQL.')
+
+        employees = Employee.objects.bulk_create(
+            Employee(full_name=f'benchmark {number}', post='benchmark') for number in range(options['employees'])
+        )
+        root = create_synthetic_tasks(options['tasks'], fan_out=options['fan_out'])
+        created_tasks = Task.objects.filter(pk__gte=root)
+        try:
+            for workers in options['workers']:
+                # Перед каждым замером задачи снова становятся свободными, а счётчики сотрудников - верными
+                created_tasks.update(employee=None)
+                reconcile_task_counts()
+                task_ids = list(
+                    get_important_tasks().filter(pk__gte=root).order_by('pk').values_list('pk', flat=True)
+                )
+                self.stdout.write(self.run(task_ids, workers, options['chunk_size']))
+        finally:
+            # Без исполнителей удаление задач не пересчитывает загруженность по одной задаче
+            created_tasks.update(employee=None)
+            created_tasks.delete()
+            Employee.objects.filter(pk__in=[employee.pk for employee in employees]).delete()
+            reconcile_task_counts()
+
+    def run(self, task_ids, workers, chunk_size):
+        """Распределяет задачи частями в workers потоках и возвращает строку с результатом замера."""
+        run_id = uuid.uuid4().hex
+        shared_load = SharedEmployeeLoad(run_id)
+        shared_load.save(get_assignment_strategy().load_from_db().task_counts, timeout=settings.ASSIGNMENT_LOCK_TIMEOUT)
+        chunks = [task_ids[start:start + chunk_size] for start in range(0, len(task_ids), chunk_size)]
+
+        def run_chunk(index):
+            try:
+                return assign_task_chunk(index, chunks[index], run_id)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_chunk, range(len(chunks))))
+        duration = time.perf_counter() - started
+        shared_load.delete()
+
+        assigned = sum(result['assigned'] for result in results)
+        slowest = max((result['duration'] for result in results), default=0)
+        return (f'Воркеров: {workers}, частей: {len(chunks)}, назначено задач: {assigned} за {duration:.2f} с '
+                f'({assigned / duration:.0f} задач/с), самая долгая часть {slowest:.2f} с')
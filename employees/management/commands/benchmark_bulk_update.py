@@ -0,0 +1,58 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from employees.metrics import count_queries
+from employees.models import Employee, Task
+from employees.views import TaskBulkUpdateAPIView, TaskUpdateAPIView
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает изменение и выполнение задач по одной (PATCH /<pk>/task_update/) и одним запросом к '
+            '/task_bulk_update/: время, количество запросов к БД и задач в секунду. Вьюхи вызываются напрямую, без '
+            'HTTP и middleware. Созданные данные удаляются откатом транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1000, help='Количество изменяемых задач.')
+
+    def handle(self, *args, **options):
+        size = options['tasks']
+        factory = APIRequestFactory()
+        update_view = TaskUpdateAPIView.as_view()
+        bulk_view = TaskBulkUpdateAPIView.as_view()
+
+        def update_one_by_one(ids, data):
+            for pk in ids:
+                update_view(factory.patch(f'/{pk}/task_update/', data, format='json'), pk=pk).render()
+
+        def update_in_bulk(ids, data):
+            bulk_view(factory.post('/task_bulk_update/', {'ids': ids, **data}, format='json')).render()
+
+        with transaction.atomic():
+            first, second = Employee.objects.bulk_create(
+                [Employee(full_name='benchmark', post='benchmark', task_count=size) for _ in range(2)]
+            )
+            cases = [
+                ('изменение по одной', update_one_by_one, {'employee': second.pk}),
+                ('изменение пачкой', update_in_bulk, {'patch': {'employee': second.pk}}),
+                ('выполнение по одной', update_one_by_one, {'status': True}),
+                ('выполнение пачкой', update_in_bulk, {'action': 'complete'}),
+            ]
+            for name, function, data in cases:
+                with transaction.atomic():
+                    tasks = Task.objects.bulk_create(
+                        [Task(title=f'benchmark {number}', employee=first, date='2030-01-01') for number in range(size)]
+                    )
+                    ids = [task.pk for task in tasks]
+                    with count_queries() as queries:
+                        started = time.perf_counter()
+                        function(ids, data)
+                        duration = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                self.stdout.write(
+                    f'{name}: {duration * 1000:.0f} мс, запросов к БД {queries.count}, '
+                    f'{size / duration:.0f} задач/с'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,199 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from employees import urls as employees_urls
+from employees.assignment import assign_important_tasks
+from employees.models import Employee, Task
+from employees.synthetic import seed_synthetic
+
+# Разница во времени меньше этой (мс) считается шумом и не считается ухудшением
+NOISE_MS = 1
+
+
+def get_endpoint_options(employee_id, task_id, leaf_id):
+    """Возвращает параметры вызова эндпоинтов, которым не подходит GET без параметров, по имени урла.
+
+    setup создаёт объект, с которым работает эндпоинт, и возвращает его pk, skip исключает эндпоинт из замеров."""
+    import_body = ''.join(
+        json.dumps({'title': f'benchmark {number}', 'parent_task': task_id, 'date': '2030-01-01'}) + '\n'
+        for number in range(100)
+    )
+    return {
+        'employee-create': {'method': 'post', 'data': {'full_name': 'benchmark', 'post': 'benchmark'}},
+        'employee-update': {'method': 'patch', 'data': {'post': 'benchmark'}},
+        'employee-destroy': {
+            'method': 'delete',
+            'setup': lambda: Employee.objects.create(full_name='benchmark', post='benchmark').pk,
+        },
+        'task-create': {
+            'method': 'post',
+            'data': {'title': 'benchmark', 'parent_task': task_id, 'employee': employee_id, 'date': '2030-01-01'},
+        },
+        'task-update': {'method': 'patch', 'data': {'title': 'benchmark'}},
+        'task-destroy': {
+            'method': 'delete',
+            'setup': lambda: Task.objects.create(title='benchmark', employee_id=employee_id, date='2030-01-01').pk,
+        },
+        'task-import': {'method': 'post', 'body': import_body, 'content_type': 'application/x-ndjson'},
+        'task-bulk-update': {'method': 'post', 'data': {'ids': [leaf_id], 'patch': {'date': '2030-01-02'}}},
+        'task-subtree': {'query': '?max_depth=3'},
+        'task-ancestors': {'pk': leaf_id},
+        # Поток событий не заканчивается, время ответа у него не замерить
+        'task-events': {'skip': True},
+    }
+
+
+def get_endpoint_cases(employee_id, task_id, leaf_id):
+    """Возвращает {имя урла: параметры вызова} для каждого урла приложения employees."""
+    options = get_endpoint_options(employee_id, task_id, leaf_id)
+    cases = {}
+    for pattern in employees_urls.urlpatterns:
+        case = {'method': 'get', **options.get(pattern.name, {})}
+        if case.get('skip'):
+            continue
+        if 'pk' in pattern.pattern.converters:
+            case.setdefault('pk', employee_id if pattern.name.startswith('employee') else task_id)
+        cases[f'{employees_urls.app_name}:{pattern.name}'] = case
+    return cases
+
+
+def call_endpoint(factory, name, case):
+    """Выполняет запрос к эндпоинту в обход middleware и возвращает код ответа."""
+    pk = case['setup']() if 'setup' in case else case.get('pk')
+    path = reverse(name, kwargs={'pk': pk} if pk is not None else None) + case.get('query', '')
+    if 'body' in case:
+        body, content_type = case['body'], case['content_type']
+    else:
+        body, content_type = json.dumps(case.get('data', {})), 'application/json'
+    request = factory.generic(case['method'].upper(), path, body, content_type=content_type)
+    match = resolve(path.split('?')[0])
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def measure(function, repeat):
+    """Выполняет function repeat раз, каждый раз в откатываемой транзакции, и возвращает статистику.
+
+    Пиковая память замеряется отдельным запуском под tracemalloc, чтобы его накладные расходы не попали во время."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                result = function()
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+
+    with transaction.atomic():
+        tracemalloc.start()
+        try:
+            function()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    return {
+        'result': result,
+        'queries': len(queries.captured_queries),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0], 3),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """Сравнивает результаты с базовыми и возвращает список ухудшений: больше запросов или p95 выше допустимого."""
+    regressions = []
+    for scale, cases in results['scales'].items():
+        for name, current in cases.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            if current['queries'] > previous['queries']:
+                regressions.append(f'{scale} / {name}: запросов {previous["queries"]} -> {current["queries"]}')
+            limit = previous['p95_ms'] * (1 + tolerance)
+            if current['p95_ms'] > limit and current['p95_ms'] - previous['p95_ms'] > NOISE_MS:
+                regressions.append(f'{scale} / {name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} мс')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = ('Замеряет каждый эндпоинт приложения и распределение задач на синтетических данных разного размера: '
+            'количество запросов, p50/p95 времени и пиковую память. Результат сохраняется в JSON и может '
+            'сравниваться с базовым. Созданные данные удаляются откатом транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1000, 100_000, 1_000_000],
+                            help='Количество задач в каждом замере.')
+        parser.add_argument('--employees-per-task', type=float, default=0.01,
+                            help='Сколько сотрудников создавать на одну задачу.')
+        parser.add_argument('--fan-out', type=int, default=3, help='Количество дочерних задач у каждой задачи.')
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз вызывать каждый эндпоинт.')
+        parser.add_argument('--output', help='Файл, в который сохранить результат в формате JSON.')
+        parser.add_argument('--baseline', help='Файл с базовым результатом. При ухудшении команда завершится ошибкой.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимый рост p95 относительно базового результата (0.25 - на 25%%).')
+
+    def handle(self, *args, **options):
+        results = {'vendor': connection.vendor, 'repeat': options['repeat'], 'scales': {}}
+        factory = RequestFactory()
+        # Кэш ответов выключен, иначе после первого вызова замерялось бы чтение из кэша
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            for scale in options['scales']:
+                results['scales'][str(scale)] = self.run_scale(factory, scale, options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                regressions = find_regressions(results, json.load(file), options['tolerance'])
+            if regressions:
+                raise CommandError('Ухудшение производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Ухудшений относительно базового результата нет.'))
+
+    def run_scale(self, factory, scale, options):
+        """Создаёт данные размера scale, замеряет все случаи и откатывает данные."""
+        scale_results = {}
+        with transaction.atomic():
+            started = time.perf_counter()
+            employee_ids, root = seed_synthetic(max(int(scale * options['employees_per_task']), 1), scale,
+                                                fan_out=options['fan_out'], unassigned_every=10)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Задач: {scale}, сотрудников: {len(employee_ids)}, создано за {time.perf_counter() - started:.1f} с'
+            ))
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            cases = {
+                name: (lambda name=name, case=case: call_endpoint(factory, name, case))
+                for name, case in get_endpoint_cases(employee_ids[0], root, root + scale - 1).items()
+            }
+            cases['assignment:assign_important_tasks'] = lambda: len(assign_important_tasks())
+
+            for name, function in cases.items():
+                result = measure(function, options['repeat'])
+                scale_results[name] = result
+                self.stdout.write(
+                    f'{name}: результат {result["result"]}, запросов {result["queries"]}, '
+                    f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, память {result["peak_memory_kb"]} КБ'
+                )
+            transaction.set_rollback(True)
+        return scale_results
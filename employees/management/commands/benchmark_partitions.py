@@ -0,0 +1,134 @@
+import datetime
+import json
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from employees.partitions import add_months, month_start
+
+SCHEMA = 'benchmark_partitions'
+COLUMNS = '''
+    id bigint NOT NULL,
+    title varchar(50) NOT NULL,
+    date date NOT NULL,
+    status boolean NOT NULL,
+    employee_id bigint,
+    parent_task_id bigint
+'''
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает обычную и секционированную по сроку (помесячно) таблицу задач в PostgreSQL: время запроса '
+            '"задачи со сроком на этой неделе", VACUUM после изменения задач текущего месяца и удаление задач '
+            'старейшего месяца (DELETE против DETACH + DROP секции). Таблицы создаются в отдельной схеме и '
+            'заполняются generate_series, рабочие таблицы не затрагиваются. Для замера на 10 млн задач: '
+            '--rows 10000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Количество задач в каждой таблице.')
+        parser.add_argument('--months', type=int, default=24,
+                            help='За сколько месяцев распределены сроки задач (задачи до текущего месяца).')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторять каждый запрос.')
+        parser.add_argument('--keep', action='store_true', help=f'Не удалять схему {SCHEMA} с таблицами.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Сравнение секционирования поддерживается только в PostgreSQL.')
+        current = month_start(timezone.localdate())
+        first = add_months(current, 1 - options['months'])
+        end = add_months(current, 1)
+        # VACUUM нельзя выполнять в транзакции, поэтому каждый запрос фиксируется сам (autocommit)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+            try:
+                self.create_tables(cursor, first, end, options['rows'])
+                self.compare_queries(cursor, options['repeat'])
+                self.compare_vacuum(cursor, current)
+                self.compare_retention(cursor, first)
+            finally:
+                if not options['keep']:
+                    cursor.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+
+    def timed(self, cursor, sql, params=None):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        return (time.perf_counter() - started) * 1000
+
+    def create_tables(self, cursor, first, end, rows):
+        cursor.execute(f'CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))')
+        cursor.execute(f'CREATE TABLE {SCHEMA}.partitioned ({COLUMNS}, PRIMARY KEY (id, date)) '
+                       f'PARTITION BY RANGE (date)')
+        month = first
+        while month < end:
+            cursor.execute(
+                f'CREATE TABLE {SCHEMA}.partitioned_{month:%Y_%m} PARTITION OF {SCHEMA}.partitioned '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+            month = add_months(month, 1)
+        for table in ('plain', 'partitioned'):
+            # Сроки равномерно распределены по месяцам, выполнена каждая вторая задача
+            duration = self.timed(
+                cursor,
+                f'''
+                INSERT INTO {SCHEMA}.{table}
+                SELECT g, 'task ' || g, %s::date + (g %% (%s::date - %s::date)), g %% 2 = 0, g %% 1000 + 1,
+                       NULLIF(g / 3, 0)
+                FROM generate_series(1, %s) g
+                ''',
+                [first, end, first, rows],
+            )
+            # Те же индексы, что у таблицы задач: task_status_date_idx и индекс внешнего ключа на сотрудника
+            cursor.execute(f'CREATE INDEX ON {SCHEMA}.{table} (status, date)')
+            cursor.execute(f'CREATE INDEX ON {SCHEMA}.{table} (employee_id)')
+            cursor.execute(f'VACUUM ANALYZE {SCHEMA}.{table}')
+            self.stdout.write(f'{table}: заполнено {rows} задач за {duration / 1000:.1f} с')
+
+    def compare_queries(self, cursor, repeat):
+        today = timezone.localdate()
+        week = [today, today + datetime.timedelta(days=7)]
+        queries = {
+            'задачи в работе со сроком на этой неделе':
+                'SELECT * FROM {table} WHERE status = false AND date >= %s AND date < %s ORDER BY date',
+            'все задачи со сроком на этой неделе': 'SELECT * FROM {table} WHERE date >= %s AND date < %s',
+            'количество задач на этой неделе у сотрудника':
+                'SELECT COUNT(*) FROM {table} WHERE employee_id = 1 AND date >= %s AND date < %s',
+        }
+        for name, sql in queries.items():
+            for table in ('plain', 'partitioned'):
+                timings, buffers = [], 0
+                for _ in range(repeat):
+                    cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql.format(table=f"{SCHEMA}.{table}")}',
+                                   week)
+                    plan = cursor.fetchone()[0]
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    timings.append(plan[0]['Execution Time'])
+                    buffers = plan[0]['Plan']['Shared Hit Blocks'] + plan[0]['Plan']['Shared Read Blocks']
+                self.stdout.write(f'{name}, {table}: мин. {min(timings):.2f} мс, макс. {max(timings):.2f} мс, '
+                                  f'страниц {buffers}')
+
+    def compare_vacuum(self, cursor, current):
+        month = [current, add_months(current, 1)]
+        for table in ('plain', 'partitioned'):
+            # Задачи текущего месяца меняются чаще всего: выполняем все задачи в работе и чистим мёртвые версии строк
+            cursor.execute(
+                f'UPDATE {SCHEMA}.{table} SET status = true WHERE status = false AND date >= %s AND date < %s', month
+            )
+            updated = cursor.rowcount
+            vacuumed = f'{SCHEMA}.partitioned_{current:%Y_%m}' if table == 'partitioned' else f'{SCHEMA}.plain'
+            duration = self.timed(cursor, f'VACUUM {vacuumed}')
+            self.stdout.write(f'VACUUM после выполнения {updated} задач текущего месяца, {table} ({vacuumed}): '
+                              f'{duration:.0f} мс')
+
+    def compare_retention(self, cursor, first):
+        duration = self.timed(cursor, f'DELETE FROM {SCHEMA}.plain WHERE date < %s', [add_months(first, 1)])
+        deleted = cursor.rowcount
+        duration += self.timed(cursor, f'VACUUM {SCHEMA}.plain')
+        self.stdout.write(f'Удаление {deleted} задач старейшего месяца, plain (DELETE + VACUUM): {duration:.0f} мс')
+        name = f'{SCHEMA}.partitioned_{first:%Y_%m}'
+        duration = self.timed(cursor, f'ALTER TABLE {SCHEMA}.partitioned DETACH PARTITION {name}')
+        duration += self.timed(cursor, f'DROP TABLE {name}')
+        self.stdout.write(f'Удаление задач старейшего месяца, partitioned (DETACH + DROP): {duration:.0f} мс')
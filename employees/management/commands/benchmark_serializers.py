@@ -0,0 +1,63 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from employees.models import Employee, Task
+from employees.serializers import EmployeeSerializer, TaskSerializer, get_values_serializer
+from employees.synthetic import seed_synthetic
+
+
+def measure(function, repeat):
+    """Возвращает лучшее из repeat время выполнения function, мс."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость сериализации строки списка сотрудников и задач обычным ModelSerializer и '
+            'ValuesSerializer: отдельно чтение строк из БД, сериализацию и рендеринг в JSON. Созданные данные '
+            'удаляются откатом транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000, help='Количество задач в списке.')
+        parser.add_argument('--repeat', type=int, default=3, help='Сколько раз повторять каждый замер.')
+
+    def handle(self, *args, **options):
+        size, repeat = options['rows'], options['repeat']
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            seed_synthetic(max(size // 100, 1), size)
+            for model, serializer_class in ((Employee, EmployeeSerializer), (Task, TaskSerializer)):
+                queryset = model.objects.order_by('pk')
+                values_serializer = get_values_serializer(serializer_class)
+                count = queryset.count()
+
+                instances = list(queryset)
+                rows = list(values_serializer.get_queryset(queryset))
+
+                def drf():
+                    return serializer_class(instances, many=True).data
+
+                def values():
+                    return values_serializer.to_representation(rows)
+
+                data = values()
+                if renderer.render(drf()) != renderer.render(data):
+                    self.stderr.write(f'{model.__name__}: ответы сериализаторов различаются')
+                timings = {
+                    'чтение объектов': measure(lambda: list(queryset.all()), repeat),
+                    'чтение кортежей': measure(lambda: list(values_serializer.get_queryset(queryset.all())), repeat),
+                    'ModelSerializer': measure(drf, repeat),
+                    'ValuesSerializer': measure(values, repeat),
+                    'рендеринг JSON': measure(lambda: renderer.render(data), repeat),
+                }
+                self.stdout.write(f'{model.__name__} ({count} строк), мкс/строка: ' + ', '.join(
+                    f'{name} {ms / count * 1000:.2f}' for name, ms in timings.items()
+                ) + f'. Сериализация быстрее в {timings["ModelSerializer"] / timings["ValuesSerializer"]:.1f} раз')
+            transaction.set_rollback(True)
@@ -0,0 +1,61 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from employees.strategies import STRATEGIES, Candidate, EmployeeLoad, get_assignment_strategy
+
+
+def create_synthetic_load(employees, tasks, posts, seed):
+    """Возвращает ({pk: нагрузка}, {pk: должность}, кандидаты) со случайной нагрузкой и родительскими задачами."""
+    generator = random.Random(seed)
+    task_counts = {pk: generator.randint(0, 20) for pk in range(1, employees + 1)}
+    groups = {pk: f'post {generator.randrange(posts)}' for pk in task_counts}
+    today = timezone.localdate()
+    candidates = []
+    for task_id in range(1, tasks + 1):
+        # Треть задач без исполнителя родительской задачи, часть задач просрочена
+        parent_employee_id = generator.randint(1, employees) if generator.random() > 1 / 3 else None
+        date = today + datetime.timedelta(days=generator.randint(-10, 30))
+        candidates.append(Candidate(task_id, None, parent_employee_id, date))
+    return task_counts, groups, candidates
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стратегии распределения задач на синтетической нагрузке в памяти: время распределения и '
+            'равномерность итоговой нагрузки (разброс, стандартное отклонение), долю задач, доставшихся исполнителю '
+            'родительской задачи или сотруднику его должности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Количество сотрудников.')
+        parser.add_argument('--tasks', type=int, default=100_000, help='Количество распределяемых задач.')
+        parser.add_argument('--posts', type=int, default=10, help='Количество должностей.')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        task_counts, groups, candidates = create_synthetic_load(options['employees'], options['tasks'],
+                                                                options['posts'], options['seed'])
+        for name in STRATEGIES:
+            strategy = get_assignment_strategy(name)
+            load = EmployeeLoad(task_counts, groups=groups)
+            started = time.perf_counter()
+            assignments = strategy.plan(candidates, load)
+            duration = time.perf_counter() - started
+
+            final = dict(task_counts)
+            for employee_id in assignments.values():
+                final[employee_id] += 1
+            with_parent = [candidate for candidate in candidates if candidate.parent_employee_id is not None]
+            to_parent = sum(assignments[candidate.task_id] == candidate.parent_employee_id for candidate in with_parent)
+            same_post = sum(groups[assignments[candidate.task_id]] == groups[candidate.parent_employee_id]
+                            for candidate in with_parent)
+            self.stdout.write(
+                f'{name}: {duration * 1000:.0f} мс ({duration / len(candidates) * 1_000_000:.2f} мкс/задача), '
+                f'задач у сотрудника от {min(final.values())} до {max(final.values())}, '
+                f'ст. отклонение {statistics.pstdev(final.values()):.2f}, '
+                f'исполнителю родительской задачи {to_parent / len(with_parent):.0%}, '
+                f'той же должности {same_post / len(with_parent):.0%}'
+            )
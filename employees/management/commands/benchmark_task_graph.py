@@ -0,0 +1,58 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from employees.graph import get_ancestors, get_descendants, get_depth, get_critical_path, find_cycle
+from employees.synthetic import create_synthetic_tasks, get_tree_size
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетическое дерево задач и замеряет время и количество запросов функций дерева зависимостей. '
+            'По умолчанию созданные задачи удаляются откатом транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=1_000_000, help='Количество задач в дереве.')
+        parser.add_argument('--fan-out', type=int, default=3, help='Количество дочерних задач у каждой задачи.')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторять каждый замер.')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные задачи.')
+
+    def handle(self, *args, **options):
+        nodes, fan_out = options['nodes'], options['fan_out']
+        with transaction.atomic():
+            started = time.perf_counter()
+            root = create_synthetic_tasks(nodes, fan_out=fan_out)
+            self.stdout.write(f'Создано задач: {nodes} за {time.perf_counter() - started:.1f} с')
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE employees_task')
+
+            # Последняя задача - самый глубокий лист, задача второго уровня - корень поддерева размером ~nodes/fan_out
+            leaf = root + nodes - 1
+            second_level = root + 1
+            subtree_depth = 3
+            cases = {
+                'get_ancestors(лист)': lambda: get_ancestors(leaf),
+                'get_depth(лист)': lambda: get_depth(leaf),
+                'find_cycle(лист)': lambda: find_cycle(leaf),
+                f'get_descendants(2-й уровень, max_depth={subtree_depth})':
+                    lambda: get_descendants(second_level, max_depth=subtree_depth),
+                'get_critical_path(корень)': lambda: get_critical_path(root),
+            }
+            self.stdout.write(f'Ожидаемый размер поддерева: {get_tree_size(fan_out, subtree_depth + 1)}')
+
+            for name, case in cases.items():
+                timings = []
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        case()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'{name}: запросов {len(queries.captured_queries)}, '
+                    f'мин. {min(timings) * 1000:.1f} мс, макс. {max(timings) * 1000:.1f} мс'
+                )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
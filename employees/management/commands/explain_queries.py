@@ -0,0 +1,97 @@
+import re
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from employees.assignment import get_important_tasks
+from employees.filters import EmployeeFilter, TaskFilter
+from employees.models import Employee, Task
+from employees.views import EmployeeListAPIView, TaskListAPIView, EmployeeWithTaskListAPIView, \
+    ImportantTasksListAPIView
+
+# Строка плана PostgreSQL, которая означает полное чтение таблицы
+SEQUENTIAL_SCAN_PATTERN = re.compile(r'Seq Scan on (\w+)')
+
+
+def get_filtered_querysets(page_size=100):
+    """Возвращает {название: queryset} для типичных запросов списков задач и сотрудников с фильтрами."""
+    task_filters = [
+        {'employee': 1},
+        {'parent_task': 1},
+        {'status': False, 'date__gte': '2024-01-01', 'date__lte': '2024-12-31'},
+        {'overdue': True},
+        {'has_children': True},
+        {'search': 'задача'},
+    ]
+    employee_filters = [
+        {'post': 'Разработчик'},
+        {'task_count__gte': 5},
+        {'search': 'иван'},
+    ]
+    querysets = {}
+    for data in task_filters:
+        name = 'employees:task-list?' + '&'.join(f'{key}={value}' for key, value in data.items())
+        querysets[name] = TaskFilter(data, TaskListAPIView.queryset).qs.order_by('id')[:page_size]
+    for data in employee_filters:
+        name = 'employees:employee-list?' + '&'.join(f'{key}={value}' for key, value in data.items())
+        querysets[name] = EmployeeFilter(data, EmployeeListAPIView.queryset).qs.order_by('id')[:page_size]
+    return querysets
+
+
+def get_endpoint_querysets(page_size=100):
+    """Возвращает {название: queryset} для запросов, которые выполняют эндпоинты и распределение задач."""
+    return {
+        'employees:employee-list': EmployeeListAPIView.queryset.order_by('id')[:page_size],
+        'employees:task-list': TaskListAPIView.queryset.order_by('id')[:page_size],
+        'employees:employee_with_task-list': EmployeeWithTaskListAPIView.queryset.order_by('task_count',
+                                                                                          'id')[:page_size],
+        'employees:employee_with_task-list (задачи сотрудников)': Task.objects.filter(employee__in=[1, 2, 3]),
+        'employees:important_tasks-list': ImportantTasksListAPIView.queryset.order_by('id')[:page_size],
+        'assignment: наименее загруженный сотрудник': Employee.objects.order_by('task_count', 'pk')[:1],
+        'assignment: важные задачи': get_important_tasks().order_by('pk'),
+        'задачи со сроком до сегодняшнего дня': Task.objects.filter(status=False, date__lte=timezone.localdate()),
+        **get_filtered_querysets(page_size),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Выводит план выполнения (EXPLAIN) запросов каждого эндпоинта и проверяет, что они используют индексы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Завершиться с ошибкой, если какой-то запрос читает таблицу целиком.')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Выполнить EXPLAIN ANALYZE (только PostgreSQL).')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if options['check'] and vendor != 'postgresql':
+            raise CommandError('Проверка использования индексов поддерживается только для PostgreSQL.')
+        explain_options = {'analyze': True} if options['analyze'] and vendor == 'postgresql' else {}
+        failures = []
+
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # На маленьких таблицах планировщик выбирает Seq Scan даже при наличии индекса, поэтому для проверки
+                # запрещаю его: если план всё равно содержит Seq Scan, значит подходящего индекса нет
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in get_endpoint_querysets().items():
+                plan = queryset.explain(**explain_options)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(plan)
+                self.stdout.write('')
+                if vendor == 'postgresql' and SEQUENTIAL_SCAN_PATTERN.search(plan):
+                    failures.append(name)
+
+            transaction.set_rollback(True)
+
+        if failures:
+            message = 'Запросы без индексов: ' + ', '.join(failures)
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        elif vendor == 'postgresql':
+            self.stdout.write(self.style.SUCCESS('Все запросы используют индексы.'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from employees.bulk import import_tasks, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Массово создаёт задачи из файла JSON Lines или CSV. Каждая пачка создаётся в своей транзакции: при ошибке '
+            'задачи из предыдущих пачек остаются, их количество выводится в тексте ошибки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с задачами.')
+        parser.add_argument('--format', dest='file_format', choices=('jsonl', 'csv'),
+                            help='Формат файла. По умолчанию определяется по расширению.')
+        parser.add_argument('--chunk-size', type=int, default=settings.BULK_IMPORT_CHUNK_SIZE,
+                            help='Количество задач в одной пачке bulk_create и транзакции.')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        with open(options['path'], encoding='utf-8', newline='') as file:
+            try:
+                created = import_tasks(read_rows(file, file_format), chunk_size=options['chunk_size'])
+            except ValidationError as error:
+                raise CommandError(error.detail)
+        self.stdout.write(self.style.SUCCESS(f'Создано задач: {created}'))
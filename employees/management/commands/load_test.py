@@ -0,0 +1,80 @@
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    '/employees/employee_list/',
+    '/employees/task_list/',
+    '/employees/important_tasks_list/',
+]
+
+
+def fetch(url, timeout):
+    """Выполняет GET и возвращает (код ответа, время в мс). Тело читается целиком, как его читал бы клиент."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        status = None
+    return status, (time.perf_counter() - started) * 1000
+
+
+def run_load(url, concurrency, duration, timeout):
+    """В течение duration секунд concurrency потоков непрерывно запрашивают url. Возвращает статистику."""
+    deadline = time.perf_counter() + duration
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            result = fetch(url, timeout)
+            with lock:
+                results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    timings = [timing for status, timing in results if status is not None and status < 400]
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings), 1) if timings else None,
+        'p95_ms': round(statistics.quantiles(timings, n=20)[-1], 1) if len(timings) > 1 else None,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест эндпоинтов чтения запущенного сервера: несколько потоков параллельно запрашивают каждый '
+            'урл, выводятся запросы в секунду, p50/p95 времени ответа и количество ошибок. Позволяет сравнить запуск '
+            'под gunicorn/runserver и под uvicorn с ASYNC_READ_VIEWS=True.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='http://127.0.0.1:8000', help='Адрес запущенного сервера.')
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS, help='Урлы, которые нужно нагрузить.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Количество одновременных клиентов.')
+        parser.add_argument('--duration', type=float, default=10, help='Сколько секунд нагружать каждый урл.')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут одного запроса, с.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency должен быть больше 0')
+        for path in options['paths']:
+            url = options['host'].rstrip('/') + path
+            result = run_load(url, options['concurrency'], options['duration'], options['timeout'])
+            self.stdout.write(
+                f'{path}: запросов {result["requests"]}, ошибок {result["errors"]}, {result["rps"]} запросов/с, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс'
+            )
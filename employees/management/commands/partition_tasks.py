@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from employees.partitions import (archive_old_partitions, convert_to_partitioned, create_future_partitions,
+                                  get_conversion_sql, get_partitions, is_partitioned)
+
+
+class Command(BaseCommand):
+    help = ('Секционирование таблицы задач по сроку (date) помесячно, только PostgreSQL. convert - однократное '
+            'преобразование таблицы (блокирует её на время копирования строк), create - создание секций на будущие '
+            'месяцы, archive - перенос выполненных задач старых секций в архив и удаление опустевших секций, list - '
+            'список секций.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'create', 'archive', 'list'])
+        parser.add_argument('--months-ahead', type=int, default=settings.TASK_PARTITION_MONTHS_AHEAD,
+                            help='На сколько месяцев вперёд создавать секции.')
+        parser.add_argument('--months-back', type=int, default=12,
+                            help='convert: за сколько прошлых месяцев создать секции, более старые задачи попадут '
+                                 'в секцию по умолчанию.')
+        parser.add_argument('--retention-months', type=int, default=settings.TASK_PARTITION_RETENTION_MONTHS,
+                            help='archive: секции месяцев старше этого количества месяцев архивируются.')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help='archive: сколько задач переносить в архив в одной транзакции.')
+        parser.add_argument('--sql', action='store_true',
+                            help='convert: только вывести SQL преобразования, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование таблицы задач поддерживается только в PostgreSQL.')
+        action = options['action']
+        partitioned = is_partitioned()
+        if action == 'convert':
+            if partitioned:
+                raise CommandError('Таблица задач уже секционирована.')
+            if options['sql']:
+                for sql, params in get_conversion_sql(options['months_back'], options['months_ahead']):
+                    with connection.cursor() as cursor:
+                        self.stdout.write(f'{cursor.mogrify(sql, params).decode()};')
+                return
+            convert_to_partitioned(options['months_back'], options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f'Таблица задач секционирована, секций: {len(get_partitions())}'))
+            return
+        if not partitioned:
+            raise CommandError('Таблица задач не секционирована, сначала выполните partition_tasks convert.')
+        if action == 'create':
+            created = create_future_partitions(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f'Создано секций: {len(created)} {created}'))
+        elif action == 'archive':
+            if options['retention_months'] < 1:
+                raise CommandError('Укажите --retention-months больше 0.')
+            dropped, kept = archive_old_partitions(options['retention_months'], options['batch_size'])
+            for name in kept:
+                self.stdout.write(self.style.WARNING(f'В секции {name} остались задачи в работе, она не удалена'))
+            self.stdout.write(self.style.SUCCESS(f'Удалено секций: {len(dropped)} {dropped}'))
+        else:
+            for name, bound in get_partitions():
+                self.stdout.write(f'{name}: {bound}')
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from employees.workload import rebuild_workload
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает таблицу загруженности сотрудников.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Сколько сотрудников пересчитывать за раз.')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_workload(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитана загруженность сотрудников: {rebuilt}'))
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from employees.counters import reconcile_task_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает количество задач сотрудников по таблице задач.'
+
+    def handle(self, *args, **kwargs):
+        updated = reconcile_task_counts()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено счётчиков задач: {updated}'))
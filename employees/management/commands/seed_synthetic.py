@@ -0,0 +1,37 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from employees.synthetic import seed_synthetic
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетических сотрудников и задачи, связанные в деревья зависимостей, для замеров '
+            'производительности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Количество сотрудников.')
+        parser.add_argument('--tasks', type=int, default=100_000, help='Количество задач.')
+        parser.add_argument('--fan-out', type=int, default=3, help='Количество дочерних задач у каждой задачи.')
+        parser.add_argument('--depth', type=int, default=None,
+                            help='Глубина одного дерева задач. По умолчанию все задачи образуют одно дерево.')
+        parser.add_argument('--unassigned-every', type=int, default=10,
+                            help='Каждая N-я задача остаётся без исполнителя (0 - у всех задач есть исполнитель).')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Размер пачки bulk_create.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            employee_ids, root = seed_synthetic(
+                options['employees'],
+                options['tasks'],
+                fan_out=options['fan_out'],
+                depth=options['depth'],
+                unassigned_every=options['unassigned_every'] or None,
+                chunk_size=options['chunk_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано сотрудников: {len(employee_ids)}, задач: {options["tasks"]} (с pk {root}) '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
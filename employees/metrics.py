@@ -0,0 +1,173 @@
+import datetime
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+
+from employees.cache import increment_counter, get_response_cache_stats
+from employees.models import AssignmentQueue, AssignmentRun
+
+METRICS_KEY_PREFIX = 'employees:metrics'
+
+# Счётчики прогонов распределения: поле прогона -> (имя метрики, описание). Время хранится в кэше в микросекундах,
+# потому что атомарно увеличивать можно только целые числа
+ASSIGNMENT_COUNTERS = {
+    'runs': ('assignment_runs_total', 'Количество прогонов распределения задач'),
+    'duration': ('assignment_run_duration_seconds_total', 'Суммарная длительность прогонов распределения'),
+    'scanned': ('assignment_tasks_scanned_total', 'Количество проверенных важных задач'),
+    'assigned': ('assignment_tasks_assigned_total', 'Количество назначенных задач'),
+    'queries': ('assignment_queries_total', 'Количество запросов к БД при распределении'),
+    'lock_wait': ('assignment_lock_wait_seconds_total',
+                  'Суммарное время получения блокировок задач (SELECT ... FOR UPDATE SKIP LOCKED)'),
+}
+SECONDS_FIELDS = ('duration', 'lock_wait')
+
+# Границы корзин гистограммы времени ответа, с
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class QueryCounter:
+    """Обёртка выполнения запросов, которая считает их количество. В отличие от connection.queries работает и без
+    DEBUG."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """Считает запросы к БД, выполненные внутри блока, в атрибуте count."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def _counter_key(kind, field):
+    return f'{METRICS_KEY_PREFIX}:assignment:{kind}:{field}'
+
+
+def record_assignment_run(kind, started_at, **values):
+    """Сохраняет прогон распределения в историю и увеличивает счётчики для /metrics.
+
+    started_at - время начала прогона (timestamp), values - поля AssignmentRun: duration, chunks, scanned, assigned,
+    queries, lock_wait."""
+    run = AssignmentRun.objects.create(
+        kind=kind,
+        started_at=datetime.datetime.fromtimestamp(started_at, tz=datetime.timezone.utc),
+        **values,
+    )
+    increment_counter(_counter_key(kind, 'runs'))
+    for field in ASSIGNMENT_COUNTERS:
+        if field == 'runs':
+            continue
+        value = getattr(run, field)
+        increment_counter(_counter_key(kind, field), round(value * 1_000_000) if field in SECONDS_FIELDS else value)
+    return run
+
+
+def _request_key(url_name, field):
+    return f'{METRICS_KEY_PREFIX}:http:{url_name}:{field}'
+
+
+def observe_request(url_name, duration, queries):
+    """Добавляет запрос к эндпоинту url_name в гистограмму времени ответа и счётчик запросов к БД.
+
+    В кэше хранится количество запросов, попавших в каждую корзину, накопительные значения считаются при выводе.
+    Список эндпоинтов в кэше не ведётся: при выводе они берутся из урлов проекта (get_url_names), поэтому
+    параллельные запросы не затирают друг другу общий список."""
+    bucket = next((str(bound) for bound in REQUEST_DURATION_BUCKETS if duration <= bound), '+Inf')
+    increment_counter(_request_key(url_name, f'bucket:{bucket}'))
+    increment_counter(_request_key(url_name, 'sum'), round(duration * 1_000_000))
+    increment_counter(_request_key(url_name, 'queries'), queries)
+
+
+def get_url_names(resolver=None, namespace=None):
+    """Возвращает имена всех именованных урлов проекта в том же виде, что resolver_match.view_name."""
+    resolver = resolver or get_resolver()
+    url_names = []
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            child_namespace = ':'.join(filter(None, [namespace, pattern.namespace])) or None
+            url_names += get_url_names(pattern, child_namespace)
+        elif pattern.name:
+            url_names.append(':'.join(filter(None, [namespace, pattern.name])))
+    return url_names
+
+
+def get_request_histograms():
+    """Возвращает {url_name: {'buckets': [(граница, накопленное количество)], 'count', 'sum', 'queries'}} для
+    эндпоинтов, к которым уже были запросы."""
+    url_names = sorted(set(get_url_names()))
+    bounds = [str(bound) for bound in REQUEST_DURATION_BUCKETS] + ['+Inf']
+    fields = [f'bucket:{bound}' for bound in bounds] + ['sum', 'queries']
+    values = cache.get_many([_request_key(url_name, field) for url_name in url_names for field in fields])
+    histograms = {}
+    for url_name in url_names:
+        cumulative = 0
+        buckets = []
+        for bound in bounds:
+            cumulative += values.get(_request_key(url_name, f'bucket:{bound}'), 0)
+            buckets.append((bound, cumulative))
+        if not cumulative:
+            continue
+        histograms[url_name] = {
+            'buckets': buckets,
+            'count': cumulative,
+            'sum': values.get(_request_key(url_name, 'sum'), 0) / 1_000_000,
+            'queries': values.get(_request_key(url_name, 'queries'), 0),
+        }
+    return histograms
+
+
+def _format_metric(name, help_text, metric_type, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return lines
+
+
+def render_metrics():
+    """Возвращает метрики распределения задач, эндпоинтов и кэша ответов в текстовом формате Prometheus."""
+    kinds = [kind for kind, _ in AssignmentRun.KIND_CHOICES]
+    counters = cache.get_many([_counter_key(kind, field) for kind in kinds for field in ASSIGNMENT_COUNTERS])
+    lines = []
+    for field, (name, help_text) in ASSIGNMENT_COUNTERS.items():
+        samples = []
+        for kind in kinds:
+            value = counters.get(_counter_key(kind, field), 0)
+            samples.append(({'kind': kind}, value / 1_000_000 if field in SECONDS_FIELDS else value))
+        lines += _format_metric(name, help_text, 'counter', samples)
+
+    last_runs = [AssignmentRun.objects.filter(kind=kind).order_by('-started_at').first() for kind in kinds]
+    last_runs = [run for run in last_runs if run is not None]
+    lines += _format_metric('assignment_last_run_duration_seconds', 'Длительность последнего прогона распределения',
+                            'gauge', [({'kind': run.kind}, run.duration) for run in last_runs])
+    lines += _format_metric('assignment_last_run_timestamp_seconds', 'Время начала последнего прогона распределения',
+                            'gauge', [({'kind': run.kind}, run.started_at.timestamp()) for run in last_runs])
+    lines += _format_metric('assignment_queue_length', 'Количество задач в очереди распределения', 'gauge',
+                            [({}, AssignmentQueue.objects.count())])
+
+    histograms = get_request_histograms()
+    lines += ['# HELP http_request_duration_seconds Время ответа эндпоинта',
+              '# TYPE http_request_duration_seconds histogram']
+    for url_name, histogram in histograms.items():
+        for bound, cumulative in histogram['buckets']:
+            lines.append(f'http_request_duration_seconds_bucket{{url_name="{url_name}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{url_name="{url_name}"}} {histogram["sum"]}')
+        lines.append(f'http_request_duration_seconds_count{{url_name="{url_name}"}} {histogram["count"]}')
+    lines += _format_metric('http_request_queries_total', 'Количество запросов к БД при обработке запросов к эндпоинту',
+                            'counter', [({'url_name': url_name}, histogram['queries'])
+                                        for url_name, histogram in histograms.items()])
+
+    stats = get_response_cache_stats()
+    lines += _format_metric('response_cache_hits_total', 'Попадания в кэш ответов списков', 'counter',
+                            [({}, stats['hits'])])
+    lines += _format_metric('response_cache_misses_total', 'Промахи кэша ответов списков', 'counter',
+                            [({}, stats['misses'])])
+    return '\n'.join(lines) + '\n'
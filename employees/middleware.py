@@ -0,0 +1,173 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+from employees.metrics import observe_request
+from employees.routers import allow_replica
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров IN (%s, %s, ...) разной длины считаются одним и тем же запросом
+IN_PARAMS_RE = re.compile(r'IN \((?:%s, )*%s\)')
+SPACES_RE = re.compile(r'\s+')
+
+# Cookie, с которой запросы клиента читают из основной БД сразу после его записи
+PRIMARY_COOKIE = 'use_primary_db'
+
+
+def get_query_fingerprint(sql):
+    """Возвращает отпечаток запроса: текст без значений параметров. Запросы из цикла N+1 дают один отпечаток."""
+    return SPACES_RE.sub(' ', IN_PARAMS_RE.sub('IN (...)', sql)).strip()
+
+
+class QueryProfile:
+    """Обёртка выполнения запросов, которая считает их количество, время и отпечатки."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.serialize = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[get_query_fingerprint(sql)] += 1
+
+    def get_duplicates(self):
+        """Возвращает {отпечаток: количество} для запросов, выполненных больше одного раза."""
+        return {fingerprint: count for fingerprint, count in self.fingerprints.items() if count > 1}
+
+
+@contextmanager
+def profile_serialization(request):
+    """Засекает время сериализации ответа для фазы serialize заголовка Server-Timing. Запросы к БД внутри блока
+    (ленивые queryset'ы связанных объектов) остаются в фазе db. Без профилирования ничего не делает."""
+    profile = getattr(request, 'query_profile', None)
+    if profile is None:
+        yield
+        return
+    started, db_duration = time.perf_counter(), profile.duration
+    try:
+        yield
+    finally:
+        profile.serialize += time.perf_counter() - started - (profile.duration - db_duration)
+
+
+class QueryProfilingMiddleware:
+    """Профилирование запросов к API: количество и время запросов к БД, повторяющиеся запросы, время ответа.
+
+    Время сериализации засекают сами вьюхи (profile_serialization). Результат добавляется в заголовок Server-Timing
+    (db, app, serialize, render, total) и в гистограммы времени ответа по имени урла (/metrics). Если повторяющихся
+    запросов больше QUERY_PROFILING_DUPLICATE_THRESHOLD, в лог пишется предупреждение. Включается настройкой
+    QUERY_PROFILING_ENABLED, выключенный middleware Django убирает из цепочки при запуске."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request.query_profile = profile = QueryProfile()
+        # Запросы считаются по всем подключениям, в том числе к репликам
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+        total = finished - started
+
+        # Ответы DRF рендерятся в JSON уже после view, начало рендеринга засекается в process_template_response
+        render_started = getattr(request, 'render_started', None)
+        render = 0 if render_started is None else finished - render_started
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries"',
+            f'app;dur={max(total - profile.duration - profile.serialize - render, 0) * 1000:.1f}',
+            f'serialize;dur={profile.serialize * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        duplicates = profile.get_duplicates()
+        duplicate_count = sum(count - 1 for count in duplicates.values())
+        if duplicate_count > settings.QUERY_PROFILING_DUPLICATE_THRESHOLD:
+            top = sorted(duplicates.items(), key=lambda item: -item[1])[:3]
+            logger.warning(
+                '%s %s: %s повторяющихся запросов к БД из %s. Чаще всего: %s',
+                request.method, request.path, duplicate_count, profile.count,
+                '; '.join(f'{count} x {fingerprint}' for fingerprint, count in top),
+            )
+
+        resolver_match = request.resolver_match
+        if resolver_match is not None:
+            observe_request(resolver_match.view_name, total, profile.count)
+        return response
+
+    def process_template_response(self, request, response):
+        # Кэшируемые списки рендерят ответ раньше и отмечают начало рендеринга сами
+        if not hasattr(request, 'render_started'):
+            request.render_started = time.perf_counter()
+        return response
+
+
+def reads_from_replica(request):
+    """Проверяет, что вьюха запроса согласилась читать из реплики (атрибут replica_reads). По умолчанию вьюхи читают
+    из основной БД: например, ленте изменений отставание реплики недопустимо."""
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    return getattr(getattr(match.func, 'view_class', None), 'replica_reads', False)
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтение в запросах GET, HEAD и OPTIONS к спискам и просмотру объектов на реплики (ReplicaRouter).
+    Вьюха включает чтение из реплики атрибутом replica_reads = True.
+
+    После успешного запроса на запись клиент получает cookie, и следующие REPLICA_LAG_SECONDS секунд его запросы читают
+    из основной БД, чтобы он сразу видел свои изменения, даже если реплика отстаёт. Без настроенных реплик middleware
+    отключается. Работает и под ASGI, не заставляя Django выполнять асинхронные вьюхи в отдельном потоке."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        is_read = request.method in SAFE_METHODS and PRIMARY_COOKIE not in request.COOKIES
+        with allow_replica(is_read and reads_from_replica(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        # Значение allow_replica хранится в ContextVar и передаётся в потоки, где sync_to_async выполняет запросы
+        is_read = request.method in SAFE_METHODS and PRIMARY_COOKIE not in request.COOKIES
+        with allow_replica(is_read and reads_from_replica(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PRIMARY_COOKIE, '1', max_age=settings.REPLICA_LAG_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,109 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+
+def fill_employee_workload(apps, schema_editor):
+    """Заполняет загруженность для уже существующих сотрудников."""
+    Employee = apps.get_model("employees", "Employee")
+    EmployeeWorkload = apps.get_model("employees", "EmployeeWorkload")
+    today = timezone.localdate()
+    employees = Employee.objects.annotate(
+        active_count=Count("employee_task", filter=Q(employee_task__status=False)),
+        overdue_count=Count(
+            "employee_task",
+            filter=Q(employee_task__status=False, employee_task__date__lt=today),
+        ),
+        completed_count=Count("employee_task", filter=Q(employee_task__status=True)),
+        next_due_date=Min("employee_task__date", filter=Q(employee_task__status=False)),
+    )
+    EmployeeWorkload.objects.bulk_create(
+        [
+            EmployeeWorkload(
+                employee_id=employee.pk,
+                active_count=employee.active_count,
+                overdue_count=employee.overdue_count,
+                completed_count=employee.completed_count,
+                next_due_date=employee.next_due_date,
+            )
+            for employee in employees.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0002_task_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeWorkload",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="workload",
+                        serialize=False,
+                        to="employees.employee",
+                        verbose_name="Сотрудник",
+                    ),
+                ),
+                (
+                    "active_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество задач в работе"
+                    ),
+                ),
+                (
+                    "overdue_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество просроченных задач"
+                    ),
+                ),
+                (
+                    "completed_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество выполненных задач"
+                    ),
+                ),
+                (
+                    "next_due_date",
+                    models.DateField(
+                        blank=True, null=True, verbose_name="Ближайший срок выполнения"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Когда пересчитано"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Загруженность сотрудника",
+                "verbose_name_plural": "Загруженность сотрудников",
+                "indexes": [
+                    models.Index(
+                        fields=["active_count", "employee"], name="workload_active_idx"
+                    ),
+                    models.Index(
+                        fields=["overdue_count", "employee"],
+                        name="workload_overdue_idx",
+                    ),
+                    models.Index(
+                        fields=["next_due_date", "employee"],
+                        name="workload_next_due_date_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_employee_workload, migrations.RunPython.noop),
+    ]
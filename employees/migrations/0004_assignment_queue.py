@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0003_employee_workload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentQueue",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="employees.task",
+                        verbose_name="Задача",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Когда добавлена в очередь"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задача в очереди распределения",
+                "verbose_name_plural": "Очередь распределения задач",
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "task"],
+                        name="assignment_queue_created_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0004_assignment_queue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("full", "Полный просмотр важных задач"),
+                            ("queue", "Очередь распределения"),
+                        ],
+                        max_length=10,
+                        verbose_name="Вид прогона",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(verbose_name="Начало прогона")),
+                ("duration", models.FloatField(verbose_name="Длительность, с")),
+                (
+                    "chunks",
+                    models.PositiveIntegerField(
+                        default=1, verbose_name="Количество частей"
+                    ),
+                ),
+                (
+                    "scanned",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Проверено задач"
+                    ),
+                ),
+                (
+                    "assigned",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Назначено задач"
+                    ),
+                ),
+                (
+                    "queries",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество запросов к БД"
+                    ),
+                ),
+                (
+                    "lock_wait",
+                    models.FloatField(
+                        default=0, verbose_name="Ожидание блокировки задач, с"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Прогон распределения задач",
+                "verbose_name_plural": "Прогоны распределения задач",
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "started_at"], name="assignment_run_kind_idx"
+                    )
+                ],
+            },
+        ),
+    ]
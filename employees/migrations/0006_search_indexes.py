@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+# Триграммные индексы для поиска по подстроке (icontains). Django строит для icontains условие
+# UPPER(поле::text) LIKE UPPER(%s), поэтому индекс строится по тому же выражению
+TRIGRAM_INDEXES = [
+    ("task_title_trgm_idx", "employees_task", "title"),
+    ("employee_full_name_trgm_idx", "employees_employee", "full_name"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Создаёт триграммные индексы. Расширение pg_trgm есть только в PostgreSQL, в других СУБД поиск работает без
+    индекса."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+            f"USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0005_assignment_run"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["post", "id"], name="employee_post_idx"),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
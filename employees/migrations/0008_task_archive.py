@@ -0,0 +1,60 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0007_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=50, verbose_name="Название")),
+                (
+                    "parent_task",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="pk родительской задачи"
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateField(
+                        verbose_name="До какого числа нужно было выполнить"
+                    ),
+                ),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Когда перенесена в архив"
+                    ),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_tasks",
+                        to="employees.employee",
+                        verbose_name="Исполнитель",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задача в архиве",
+                "verbose_name_plural": "Архив задач",
+                "indexes": [
+                    models.Index(
+                        fields=["employee", "id"], name="task_archive_employee_idx"
+                    )
+                ],
+            },
+        ),
+    ]
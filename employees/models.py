@@ -9,6 +9,12 @@ class Employee(models.Model):
     class Meta:
         verbose_name = 'Сотрудник'
         verbose_name_plural = 'Сотрудники'
+        indexes = [
+            # Поиск наименее загруженного сотрудника и сортировка списка сотрудников по загруженности
+            models.Index(fields=['task_count', 'id'], name='employee_task_count_idx'),
+            # Фильтр списка сотрудников по должности, последним полем идёт pk для курсорной пагинации
+            models.Index(fields=['post', 'id'], name='employee_post_idx'),
+        ]
 
     def __str__(self):
         return f'{self.full_name}'
@@ -36,6 +42,170 @@ class Task(models.Model):
     class Meta:
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
+        indexes = [
+            # Частичный индекс по задачам без исполнителя - из них выбираются важные задачи
+            models.Index(fields=['id'], condition=models.Q(employee__isnull=True), name='task_unassigned_idx'),
+            # Выборки задач по статусу и сроку выполнения
+            models.Index(fields=['status', 'date'], name='task_status_date_idx'),
+        ]
+
+    # Поля, прежние значения которых нужны сигналам при сохранении задачи
+    TRACKED_FIELDS = ('employee_id', 'parent_task_id', 'status', 'date')
+
+    def __str__(self):
+        return f'{self.title}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаю значения полей при чтении из БД, чтобы при сохранении сравнивать с ними без ещё одного запроса."""
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.TRACKED_FIELDS):
+            instance._loaded_values = {field: loaded[field] for field in cls.TRACKED_FIELDS}
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        """После перечитывания из БД запомненные значения могут не совпадать с БД, сигналы прочитают их сами."""
+        self.__dict__.pop('_loaded_values', None)
+        super().refresh_from_db(*args, **kwargs)
+
+
+class EmployeeWorkload(models.Model):
+    """Загруженность сотрудника: таблица для чтения, которая обновляется при изменении его задач."""
+    employee = models.OneToOneField(Employee,
+                                    on_delete=models.CASCADE,
+                                    primary_key=True,
+                                    related_name='workload',
+                                    verbose_name='Сотрудник')
+    active_count = models.PositiveIntegerField(default=0, verbose_name='Количество задач в работе')
+    overdue_count = models.PositiveIntegerField(default=0, verbose_name='Количество просроченных задач')
+    completed_count = models.PositiveIntegerField(default=0, verbose_name='Количество выполненных задач')
+    next_due_date = models.DateField(null=True, blank=True, verbose_name='Ближайший срок выполнения')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Когда пересчитано')
+
+    class Meta:
+        verbose_name = 'Загруженность сотрудника'
+        verbose_name_plural = 'Загруженность сотрудников'
+        indexes = [
+            # Сортировка и фильтрация списка загруженности, последним полем идёт pk для курсорной пагинации
+            models.Index(fields=['active_count', 'employee'], name='workload_active_idx'),
+            models.Index(fields=['overdue_count', 'employee'], name='workload_overdue_idx'),
+            models.Index(fields=['next_due_date', 'employee'], name='workload_next_due_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.employee_id}: {self.active_count}'
+
+
+class AssignmentQueue(models.Model):
+    """Очередь задач, которым, возможно, нужно назначить исполнителя: у задачи появилась дочерняя задача или у неё
+    убрали исполнителя. Записи добавляются в той же транзакции, что и изменение задачи (outbox)."""
+    task = models.OneToOneField(Task,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='+',
+                                verbose_name='Задача')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Когда добавлена в очередь')
+
+    class Meta:
+        verbose_name = 'Задача в очереди распределения'
+        verbose_name_plural = 'Очередь распределения задач'
+        indexes = [
+            # Очередь разбирается в порядке добавления
+            models.Index(fields=['created_at', 'task'], name='assignment_queue_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task_id}'
+
+
+class AssignmentRun(models.Model):
+    """История прогонов распределения важных задач, чтобы видеть, как меняется их время и объём работы."""
+    FULL = 'full'
+    QUEUE = 'queue'
+    KIND_CHOICES = [
+        (FULL, 'Полный просмотр важных задач'),
+        (QUEUE, 'Очередь распределения'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Вид прогона')
+    started_at = models.DateTimeField(verbose_name='Начало прогона')
+    duration = models.FloatField(verbose_name='Длительность, с')
+    chunks = models.PositiveIntegerField(default=1, verbose_name='Количество частей')
+    scanned = models.PositiveIntegerField(default=0, verbose_name='Проверено задач')
+    assigned = models.PositiveIntegerField(default=0, verbose_name='Назначено задач')
+    queries = models.PositiveIntegerField(default=0, verbose_name='Количество запросов к БД')
+    lock_wait = models.FloatField(default=0, verbose_name='Ожидание блокировки задач, с')
+
+    class Meta:
+        verbose_name = 'Прогон распределения задач'
+        verbose_name_plural = 'Прогоны распределения задач'
+        indexes = [
+            models.Index(fields=['kind', 'started_at'], name='assignment_run_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.started_at}: {self.assigned}'
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений задач и сотрудников для выдачи изменений клиентам (/changes/).
+
+    Запись добавляется в той же транзакции, что и изменение, а номер seq присваивается уже после её фиксации, поэтому
+    номера растут в порядке, в котором изменения становятся видны."""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    ]
+
+    seq = models.BigIntegerField(null=True, blank=True, unique=True, verbose_name='Номер изменения')
+    model = models.CharField(max_length=20, verbose_name='Модель')
+    object_id = models.BigIntegerField(verbose_name='pk объекта')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='Действие')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Когда изменено')
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            # Записи, которым ещё не присвоен номер
+            models.Index(fields=['id'], condition=models.Q(seq__isnull=True), name='change_log_unsequenced_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.seq}: {self.action} {self.model} {self.object_id}'
+
+
+class TaskArchive(models.Model):
+    """Выполненная задача, перенесённая фоновым архивированием из таблицы задач. pk совпадает с pk задачи, поэтому
+    в таблице задач остаются только задачи в работе и ещё не перенесённые выполненные."""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=50,
+                             verbose_name='Название')
+    parent_task = models.BigIntegerField(null=True,
+                                         blank=True,
+                                         verbose_name='pk родительской задачи')
+    employee = models.ForeignKey(Employee,
+                                 on_delete=models.SET_NULL,
+                                 verbose_name='Исполнитель',
+                                 related_name='archived_tasks',
+                                 null=True,
+                                 blank=True,
+                                 db_index=False)
+    date = models.DateField(verbose_name='До какого числа нужно было выполнить')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Когда перенесена в архив')
+
+    class Meta:
+        verbose_name = 'Задача в архиве'
+        verbose_name_plural = 'Архив задач'
+        indexes = [
+            # Задачи сотрудника в архиве, последним полем идёт pk для курсорной пагинации
+            models.Index(fields=['employee', 'id'], name='task_archive_employee_idx'),
+        ]
 
     def __str__(self):
         return f'{self.title}'
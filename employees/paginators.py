@@ -0,0 +1,235 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q, F
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная (keyset) пагинация.
+
+    Курсор хранит значения полей сортировки последней строки страницы, а следующая страница выбирается условием
+    "строго после этих значений" вместо OFFSET. Поэтому любая страница стоит столько же, сколько первая, если под
+    сортировку есть индекс. Последним полем сортировки всегда идёт pk, чтобы порядок был однозначным."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering=('pk',)):
+        self.default_ordering = ordering
+        self.page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же, что paginate_queryset, но строки страницы читаются через асинхронный ORM."""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request, view)])
+
+    def get_page_queryset(self, queryset, request, view):
+        """Возвращает queryset строк страницы, не выполняя запрос."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.nullable = {field for field, _ in self.ordering if self.is_nullable(queryset.model, field)}
+        # Строками страницы могут быть и кортежи из values_list(named=True), у которых нет атрибута pk
+        self.pk_attname = queryset.model._meta.pk.attname
+
+        queryset = queryset.order_by(*[self.get_order_expression(field, descending)
+                                       for field, descending in self.ordering])
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Беру на одну строку больше, чтобы узнать, есть ли следующая страница, не делая COUNT(*)
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        """Размер страницы из page_size, не больше max_page_size. Без page_size или с неверным значением - размер
+        страницы по умолчанию, как в пагинации DRF."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """Возвращает поля сортировки в виде [(поле, по убыванию), ...] с pk в конце.
+
+        Если у вьюхи есть OrderingFilter и клиент передал ordering, сортировка берётся из него."""
+        ordering = self.default_ordering
+        if view is not None and OrderingFilter in getattr(view, 'filter_backends', ()):
+            ordering = OrderingFilter().get_ordering(request, queryset, view) or ordering
+
+        keys = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        if not {'id', 'pk'} & {field for field, _ in keys}:
+            # Направление pk совпадает с направлением первого поля, чтобы по составному индексу можно было идти в
+            # одну сторону
+            keys.append(('pk', keys[0][1] if keys else False))
+        return keys
+
+    @staticmethod
+    def is_nullable(model, field):
+        if field == 'pk':
+            return False
+        return model._meta.get_field(field).null
+
+    def get_order_expression(self, field, descending):
+        """Для полей, допускающих NULL, пустые значения всегда идут в конце, чтобы условие курсора было однозначным
+        и не зависело от СУБД. Для остальных полей сортировка остаётся обычной, чтобы не мешать индексам."""
+        if field not in self.nullable:
+            return f'-{field}' if descending else field
+        return F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+
+    def get_after_filter(self, field, descending, value):
+        """Условие "значение поля идёт строго после value" с учётом направления и NULL в конце."""
+        if value is None:
+            # После NULL ничего нет: все следующие строки тоже NULL и отличаются только следующими полями
+            return Q(pk__in=[])
+        after = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+        if field in self.nullable:
+            after |= Q(**{f'{field}__isnull': True})
+        return after
+
+    def get_position_filter(self, position):
+        """Строит условие (a, b, c) > (x, y, z) с учётом направления каждого поля."""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            step = self.get_after_filter(field, descending, position[index])
+            for previous_index in range(index):
+                previous_field = self.ordering[previous_index][0]
+                previous_value = position[previous_index]
+                if previous_value is None:
+                    step &= Q(**{f'{previous_field}__isnull': True})
+                else:
+                    step &= Q(**{previous_field: previous_value})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, row):
+        position = [getattr(row, self.pk_attname if field == 'pk' else field) for field, _ in self.ordering]
+        data = json.dumps(position, default=str, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ConfigurablePagination(BasePagination):
+    """Пагинация, режим которой задаётся настройкой PAGINATION_MODE.
+
+    cursor - keyset-пагинация по полям ordering, limit_offset - стандартная LimitOffsetPagination,
+    none - без пагинации (весь список одним ответом)."""
+    ordering = ('pk',)
+
+    def __init__(self):
+        self.mode = getattr(settings, 'PAGINATION_MODE', 'cursor')
+        if self.mode == 'cursor':
+            self.paginator = KeysetPagination(ordering=self.ordering)
+        elif self.mode == 'limit_offset':
+            self.paginator = LimitOffsetPagination()
+        elif self.mode == 'none':
+            self.paginator = None
+        else:
+            raise ImproperlyConfigured(f'Неизвестный режим пагинации: {self.mode}')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.paginator is None:
+            return None
+        if self.mode == 'limit_offset' and not queryset.ordered:
+            queryset = queryset.order_by(*self.ordering)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset для асинхронных вьюх: строки и количество строк читаются через
+        асинхронный ORM (aiterator, acount)."""
+        if self.paginator is None:
+            return None
+        if self.mode == 'cursor':
+            return await self.paginator.apaginate_queryset(queryset, request, view)
+
+        # Повторяет LimitOffsetPagination.paginate_queryset
+        if not queryset.ordered:
+            queryset = queryset.order_by(*self.ordering)
+        paginator = self.paginator
+        paginator.request = request
+        paginator.limit = paginator.get_limit(request)
+        if paginator.limit is None:
+            return None
+        paginator.offset = paginator.get_offset(request)
+        paginator.count = await queryset.acount()
+        if paginator.count == 0 or paginator.offset > paginator.count:
+            return []
+        return [row async for row in queryset[paginator.offset:paginator.offset + paginator.limit]]
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        if self.paginator is None:
+            return schema
+        return self.paginator.get_paginated_response_schema(schema)
+
+
+class EmployeeLoadPagination(ConfigurablePagination):
+    """Пагинация для списков сотрудников, отсортированных по загруженности."""
+    ordering = ('task_count', 'pk')
+
+
+class EmployeeWorkloadPagination(ConfigurablePagination):
+    """Пагинация для списка загруженности сотрудников."""
+    ordering = ('active_count', 'pk')
+
+
+class TaskHistoryPagination(KeysetPagination):
+    """Курсорная пагинация архива задач от новых задач к старым. Не зависит от PAGINATION_MODE: архив растёт без
+    ограничений, и OFFSET по нему становился бы всё дороже."""
+
+    def __init__(self):
+        super().__init__(ordering=('-pk',))
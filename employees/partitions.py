@@ -0,0 +1,207 @@
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from employees.archive import archive_completed_tasks
+from employees.models import Task
+
+# Секционирование таблицы задач по сроку выполнения (date) помесячно, только PostgreSQL.
+#
+# В PostgreSQL первичный ключ секционированной таблицы должен включать ключ секционирования, поэтому после
+# преобразования первичный ключ - (id, date), а id остаётся уникальным благодаря последовательности. На такую таблицу
+# не могут ссылаться внешние ключи по одному id, поэтому ограничения parent_task и AssignmentQueue.task в БД
+# удаляются. Модели при этом не меняются: SET_NULL и CASCADE для них Django и так выполняет сам, а не БД.
+TASK_TABLE = Task._meta.db_table
+DEFAULT_PARTITION = f'{TASK_TABLE}_default'
+UNPARTITIONED_TABLE = f'{TASK_TABLE}_unpartitioned'
+SEQUENCE = f'{TASK_TABLE}_partitioned_id_seq'
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def add_months(date, months):
+    """Возвращает первое число месяца, отстоящего от месяца date на months."""
+    month = date.year * 12 + date.month - 1 + months
+    return datetime.date(month // 12, month % 12 + 1, 1)
+
+
+def get_partition_name(month):
+    return f'{TASK_TABLE}_{month:%Y_%m}'
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _fetch(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _execute(statements):
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(sql, params)
+
+
+def is_partitioned():
+    """Проверяет, что таблица задач уже секционирована."""
+    return _fetch(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [TASK_TABLE]
+    )[0][0]
+
+
+def get_partitions():
+    """Возвращает [(имя секции, граница в виде текста)] в порядке имён, секция по умолчанию в конце."""
+    return _fetch(
+        '''
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(%s)
+        ORDER BY child.relname = %s, child.relname
+        ''',
+        [TASK_TABLE, DEFAULT_PARTITION],
+    )
+
+
+def get_partition_sql(month):
+    """SQL создания секции задач со сроком в месяце month."""
+    return (
+        f'CREATE TABLE {quote(get_partition_name(month))} PARTITION OF {quote(TASK_TABLE)} '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [month, add_months(month, 1)],
+    )
+
+
+def get_conversion_sql(months_back, months_ahead, today=None):
+    """Возвращает список (sql, параметры) для преобразования таблицы задач в секционированную.
+
+    Секции создаются помесячно от месяца самой ранней задачи (но не раньше months_back месяцев назад) до months_ahead
+    месяцев вперёд, задачи вне этих месяцев попадают в секцию по умолчанию. Индексы и внешний ключ на сотрудника
+    переносятся с исходной таблицы по их определениям в каталоге, поэтому совпадают с созданными миграциями."""
+    current = month_start(today or timezone.localdate())
+    primary_key = _fetch(
+        "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [TASK_TABLE]
+    )[0][0]
+    indexes = _fetch(
+        'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s '
+        'ORDER BY indexname',
+        [TASK_TABLE, primary_key],
+    )
+    # Внешние ключи на другие таблицы (сотрудник). Ссылка на саму таблицу задач (parent_task) невозможна
+    foreign_keys = _fetch(
+        '''
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f' AND confrelid <> conrelid
+        ORDER BY conname
+        ''',
+        [TASK_TABLE],
+    )
+    first_date = _fetch(f'SELECT MIN(date) FROM {quote(TASK_TABLE)}')[0][0] or current
+    first = max(month_start(first_date), add_months(current, -months_back))
+
+    table, old = quote(TASK_TABLE), quote(UNPARTITIONED_TABLE)
+    statements = [
+        (f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE', None),
+        (f'ALTER TABLE {table} RENAME TO {old}', None),
+        (f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (date)', None),
+        (f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT', None),
+    ]
+    month = first
+    while month <= add_months(current, months_ahead):
+        statements.append(get_partition_sql(month))
+        month = add_months(month, 1)
+    statements += [
+        # Строки копируются до создания индексов, так быстрее
+        (f'INSERT INTO {table} SELECT * FROM {old}', None),
+        (f'CREATE SEQUENCE {quote(SEQUENCE)} OWNED BY {table}.id', None),
+        (f"SELECT setval(%s, (SELECT COALESCE(MAX(id), 0) + 1 FROM {old}), false)", [SEQUENCE]),
+        (f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [SEQUENCE]),
+        # Вместе с исходной таблицей удаляются её последовательность и ссылающиеся на неё внешние ключи
+        (f'DROP TABLE {old} CASCADE', None),
+        (f'ALTER TABLE {table} ADD CONSTRAINT {quote(primary_key)} PRIMARY KEY (id, date)', None),
+    ]
+    statements += [(indexdef, None) for indexdef, in indexes]
+    statements += [(f'ALTER TABLE {table} ADD CONSTRAINT {quote(name)} {definition}', None)
+                   for name, definition in foreign_keys]
+    return statements
+
+
+def convert_to_partitioned(months_back=12, months_ahead=3):
+    """Преобразует таблицу задач в секционированную одной транзакцией. Таблица заблокирована на время копирования
+    всех строк, поэтому запускать нужно в окно обслуживания."""
+    with transaction.atomic():
+        _execute(get_conversion_sql(months_back, months_ahead))
+
+
+def create_partition(month):
+    """Создаёт секцию месяца month. Если в секции по умолчанию уже есть задачи этого месяца, они переносятся в новую
+    секцию, иначе PostgreSQL не даст её добавить. Возвращает количество перенесённых задач."""
+    name, start, end = quote(get_partition_name(month)), month, add_months(month, 1)
+    default = quote(DEFAULT_PARTITION)
+    with transaction.atomic():
+        has_rows = _fetch(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE date >= %s AND date < %s)', [start, end])
+        if not has_rows[0][0]:
+            _execute([get_partition_sql(month)])
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {name} (LIKE {quote(TASK_TABLE)} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {default} WHERE date >= %s AND date < %s RETURNING *) '
+                f'INSERT INTO {name} SELECT * FROM moved',
+                [start, end],
+            )
+            moved = cursor.rowcount
+            cursor.execute(f'ALTER TABLE {quote(TASK_TABLE)} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+                           [start, end])
+    return moved
+
+
+def create_future_partitions(months_ahead, today=None):
+    """Создаёт недостающие секции с текущего месяца до months_ahead месяцев вперёд. Возвращает имена созданных
+    секций."""
+    current = month_start(today or timezone.localdate())
+    existing = {name for name, _ in get_partitions()}
+    created = []
+    for months in range(months_ahead + 1):
+        month = add_months(current, months)
+        if get_partition_name(month) not in existing:
+            create_partition(month)
+            created.append(get_partition_name(month))
+    return created
+
+
+def archive_old_partitions(retention_months, batch_size=1000, today=None):
+    """Освобождает секции месяцев старше retention_months: выполненные задачи переносятся в архив (TaskArchive) так же,
+    как archive_completed_tasks, а опустевшая секция отсоединяется и удаляется без DELETE и VACUUM по основной
+    таблице. Секции, в которых остались задачи в работе, не трогаются.
+
+    Возвращает (имена удалённых секций, имена секций с задачами в работе)."""
+    border = add_months(month_start(today or timezone.localdate()), -retention_months)
+    dropped, kept = [], []
+    for name, _ in get_partitions():
+        if name == DEFAULT_PARTITION:
+            continue
+        month = datetime.datetime.strptime(name.removeprefix(f'{TASK_TABLE}_'), '%Y_%m').date()
+        if month >= border:
+            continue
+        tasks = Task.objects.filter(date__gte=month, date__lt=add_months(month, 1))
+        archive_completed_tasks(batch_size=batch_size, tasks=tasks)
+        with transaction.atomic():
+            # Блокировка не даёт добавить в секцию задачу, пока она отсоединяется
+            _execute([(f'LOCK TABLE {quote(name)} IN ACCESS EXCLUSIVE MODE', None)])
+            if _fetch(f'SELECT EXISTS (SELECT 1 FROM {quote(name)})')[0][0]:
+                kept.append(name)
+                continue
+            _execute([
+                (f'ALTER TABLE {quote(TASK_TABLE)} DETACH PARTITION {quote(name)}', None),
+                (f'DROP TABLE {quote(name)}', None),
+            ])
+        dropped.append(name)
+    return dropped, kept
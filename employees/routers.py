@@ -0,0 +1,45 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Можно ли в текущем запросе читать из реплики. По умолчанию нельзя: задачи Celery, команды и запросы на запись
+# работают только с основной БД
+_replica_allowed = ContextVar('replica_allowed', default=False)
+
+
+def is_replica_allowed():
+    """Возвращает True, если текущий запрос читает из реплики."""
+    return _replica_allowed.get() and bool(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def allow_replica(allowed=True):
+    """Разрешает (или запрещает) чтение из реплики внутри блока."""
+    token = _replica_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+class ReplicaRouter:
+    """Роутер БД: чтение в запросах, где это разрешено (allow_replica), идёт на случайную реплику, всё остальное - на
+    основную БД. Миграции применяются только к основной БД, реплики получают их через репликацию."""
+
+    def db_for_read(self, model, **hints):
+        if is_replica_allowed():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
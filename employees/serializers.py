@@ -1,9 +1,20 @@
 
-from rest_framework import serializers
+import datetime
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from rest_framework import ISO_8601, serializers
 from rest_framework.fields import SerializerMethodField
 from rest_framework.serializers import ModelSerializer
+from rest_framework.settings import api_settings
 
-from employees.models import Employee, Task
+from employees.assignment import ImportantTasksAssignmentContext
+from employees.counters import change_task_count, change_task_counts
+from employees.graph import get_ancestors
+from employees.models import Employee, Task, EmployeeWorkload, TaskArchive
 
 
 class EmployeeSerializer(ModelSerializer):
@@ -15,17 +26,29 @@ class EmployeeSerializer(ModelSerializer):
 
 class TaskSerializer(ModelSerializer):
     """Сериализатор для задач, кроме создания."""
-    def validate_status(self, value):
-        """Проверка, если задачу отредактировали и поставили в статус True, удаляю задачу и вычёркиваю её из общего
-        числа задач сотрудника."""
-        if value:
-            employee = Employee.objects.get(full_name=self.instance.employee)
-            employee.task_count -= 1
-            employee.save()
-            self.instance.delete()
-            raise serializers.ValidationError("Экземпляр модели был удалён, потому что задача выполнена.")
+    def validate_parent_task(self, value):
+        """Проверка на то, что новая родительская задача не зависит от редактируемой задачи, иначе получится цикл."""
+        if value is not None and self.instance is not None:
+            if value.pk == self.instance.pk or any(
+                    task.pk == self.instance.pk for task in get_ancestors(value.pk)):
+                raise serializers.ValidationError("Задача не может зависеть от задачи, которая зависит от неё.")
         return value
 
+    def update(self, instance, validated_data):
+        """При смене исполнителя задачи переношу её из общего числа задач прежнего сотрудника новому. Выполненная
+        задача (status=True) вычёркивается из общего числа задач сотрудника и остаётся в таблице задач, пока её не
+        перенесёт в архив archive_completed_tasks, а возвращённая в работу снова добавляется."""
+        previous_employee_id, previous_status = instance.employee_id, instance.status
+        with transaction.atomic():
+            task = super().update(instance, validated_data)
+            deltas = Counter()
+            if not previous_status:
+                deltas[previous_employee_id] -= 1
+            if not task.status:
+                deltas[task.employee_id] += 1
+            change_task_counts(deltas)
+        return task
+
     class Meta:
         model = Task
         fields = '__all__'
@@ -39,14 +62,74 @@ class TaskCreateSerializer(ModelSerializer):
             raise serializers.ValidationError("Поле 'status' не может быть True при создании задачи.")
         return value
 
-    def validate_employee(self, value):
-        """Проверка на то, назначили ли задаче при создании сотрудника или нет."""
-        if value:
-            employee = Employee.objects.get(full_name=value)
-            employee.task_count += 1
-            employee.save()
+    def create(self, validated_data):
+        """При создании задачи с назначенным сотрудником добавляю её к общему числу задач сотрудника."""
+        with transaction.atomic():
+            task = super().create(validated_data)
+            change_task_count(task.employee_id, 1)
+        return task
+
+    class Meta:
+        model = Task
+        fields = '__all__'
+
+
+class TaskPatchSerializer(ModelSerializer):
+    """Сериализатор изменений, которые массово применяются к задачам."""
+    class Meta:
+        model = Task
+        fields = ('status', 'employee', 'date', 'parent_task')
+        extra_kwargs = {'date': {'required': False}}
+
+
+class TaskBulkUpdateSerializer(serializers.Serializer):
+    """Сериализатор запроса массового изменения задач: pk задач, действие (update или complete) и изменения для
+    update. Изменение status на True выполняет задачи, как и при изменении одной задачи, и передаётся без других
+    полей."""
+    UPDATE = 'update'
+    COMPLETE = 'complete'
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    action = serializers.ChoiceField([UPDATE, COMPLETE], default=UPDATE)
+    patch = TaskPatchSerializer(required=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.BULK_UPDATE_MAX_TASKS:
+            raise serializers.ValidationError(f'Можно изменить не больше {settings.BULK_UPDATE_MAX_TASKS} задач.')
         return value
 
+    def validate(self, attrs):
+        patch = attrs.get('patch', {})
+        if attrs['action'] == self.COMPLETE and patch:
+            raise serializers.ValidationError({'patch': 'Изменения не применяются при выполнении задач (complete).'})
+        if patch.pop('status', False):
+            # Выполнение задач не меняет их остальные поля, поэтому смешанные изменения отклоняются, а не теряются
+            if patch:
+                raise serializers.ValidationError(
+                    {'patch': 'status: true выполняет задачи и не сочетается с изменением других полей.'}
+                )
+            attrs['action'] = self.COMPLETE
+        elif attrs['action'] == self.UPDATE and not patch:
+            raise serializers.ValidationError({'patch': 'Нужно передать хотя бы одно изменяемое поле.'})
+        return attrs
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров запроса журнала изменений: номер изменения since и количество изменений limit, которое
+    ограничивается max_limit."""
+    max_limit = 10000
+
+    since = serializers.IntegerField(min_value=0)
+    limit = serializers.IntegerField(min_value=1, default=lambda: settings.CHANGES_PAGE_SIZE)
+
+    def validate_limit(self, value):
+        return min(value, self.max_limit)
+
+
+class TaskGraphSerializer(ModelSerializer):
+    """Сериализатор для задач из дерева зависимостей с расстоянием до запрошенной задачи."""
+    depth = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Task
         fields = '__all__'
@@ -58,7 +141,10 @@ class EmployeeWithTaskSerializer(ModelSerializer):
 
     def get_task(self, employee):
         """Метод для получения задач сотрудника."""
-        return [task.pk for task in Task.objects.filter(employee=employee.pk)]
+        # Если задачи подгружены во вьюхе одним запросом на всю страницу, беру их, иначе делаю запрос
+        if hasattr(employee, 'prefetched_tasks'):
+            return [task.pk for task in employee.prefetched_tasks]
+        return [task.pk for task in Task.objects.filter(employee=employee.pk, status=False)]
 
     class Meta:
         model = Employee
@@ -71,32 +157,104 @@ class ImportantTasksSerializer(ModelSerializer):
 
     def get_employee(self, task):
         """Метод для поиска сотрудника для задачи."""
-        # Получил сотрудника с минимальным количеством задач
-        employee_with_minimum_number_of_tasks = Employee.objects.order_by('task_count').first()
+        # Наименее загруженный сотрудник и сотрудники родительских задач одни и те же для всего списка, поэтому они
+        # собираются один раз во вьюхе и передаются через контекст сериализатора
+        assignment = self.context.get('assignment')
+        if assignment is None:
+            assignment = ImportantTasksAssignmentContext.build([task])
+        return assignment.employee_for(task)
 
-        # Проверяю есть ли у задачи ещё одна родительская задача
-        if task.parent_task is not None:
-
-            # получаю эту родительскую задачу и через неё нахожу сотрудника выполняющего её(если он есть)
-            parent_task = Task.objects.get(pk=task.parent_task.pk)
-            try:
-                employee_performing_parent_task = Employee.objects.get(pk=parent_task.employee.pk)
+    class Meta:
+        model = Task
+        fields = ('title', 'date', 'employee')
 
-                # Сравниваю у кого сколько задач и если у сотрудника выполняющего родительскую задачу задач максимум на
-                # 2 больше чем у наименее загруженного сотрудника, то отдаю сотруднику выполняющего родительскую задачу
-                if employee_performing_parent_task.task_count - employee_with_minimum_number_of_tasks.task_count <= 2:
-                    return employee_performing_parent_task.full_name
 
-                # если наоборот, то отдаю задачу наименее загруженному сотруднику
-                else:
-                    return employee_with_minimum_number_of_tasks.full_name
+class TaskArchiveSerializer(ModelSerializer):
+    """Сериализатор для выполненных задач из архива."""
+    class Meta:
+        model = TaskArchive
+        fields = '__all__'
 
-            except Exception as e:
-                return employee_with_minimum_number_of_tasks.full_name
 
-        else:
-            return employee_with_minimum_number_of_tasks.full_name
+class EmployeeWorkloadSerializer(ModelSerializer):
+    """Сериализатор для загруженности сотрудников."""
+    full_name = serializers.CharField(source='employee.full_name', read_only=True)
+    post = serializers.CharField(source='employee.post', read_only=True)
 
     class Meta:
-        model = Task
-        fields = ('title', 'date', 'employee')
+        model = EmployeeWorkload
+        fields = ('employee', 'full_name', 'post', 'active_count', 'overdue_count', 'completed_count',
+                  'next_due_date')
+
+
+class ValuesSerializer:
+    """Быстрый сериализатор списков только для чтения на основе ModelSerializer.
+
+    Вместо объектов моделей читает из БД кортежи (values_list) и собирает из них словари функцией, которая один раз
+    компилируется из соответствия полей, не создавая поля DRF и не вызывая to_representation на каждую строку.
+    Результат совпадает с результатом исходного сериализатора. Поддерживаются только поля модели без вложенных
+    сериализаторов и SerializerMethodField."""
+    # Поля, значения которых из БД уже имеют нужный для JSON вид
+    PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                    serializers.FloatField)
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.names = []
+        self.columns = []
+        converters = {}
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                column = model._meta.get_field(field.source).attname
+                converter = None
+            elif field.source == '*' or '.' in field.source or isinstance(field, serializers.BaseSerializer):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name}: поле не поддерживается {self.__class__.__name__}'
+                )
+            else:
+                column = field.source
+                converter = self.get_converter(field)
+            if converter is not None:
+                converters[len(self.columns)] = converter
+            self.names.append(name)
+            self.columns.append(column)
+        self.serialize_row = self.compile(self.names, converters)
+
+    @staticmethod
+    def compile(names, converters):
+        """Собирает функцию вида lambda row: {'id': row[0], 'date': None if row[2] is None else convert_2(row[2])}."""
+        items = []
+        for index, name in enumerate(names):
+            value = f'row[{index}]'
+            if index in converters:
+                # Как и в DRF, None выводится без преобразования
+                value = f'None if {value} is None else convert_{index}({value})'
+            items.append(f'{name!r}: {value}')
+        namespace = {f'convert_{index}': converter for index, converter in converters.items()}
+        return eval(f'lambda row: {{{", ".join(items)}}}', namespace)
+
+    def get_converter(self, field):
+        """Возвращает функцию, которая приводит значение из БД к виду, который вернул бы field, или None."""
+        if isinstance(field, self.PLAIN_FIELDS):
+            return None
+        if type(field) is serializers.DateField and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return datetime.date.isoformat
+        if isinstance(field, serializers.RelatedField):
+            raise ImproperlyConfigured(f'Поле {field.field_name} не поддерживается {self.__class__.__name__}')
+        return field.to_representation
+
+    def get_queryset(self, queryset):
+        """Возвращает queryset, строки которого - именованные кортежи с нужными столбцами."""
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, rows):
+        serialize_row = self.serialize_row
+        return [serialize_row(row) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_values_serializer(serializer_class):
+    """Возвращает ValuesSerializer для serializer_class. Соответствие полей составляется один раз на класс."""
+    return ValuesSerializer(serializer_class)
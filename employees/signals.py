@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from employees import events
+from employees.assignment import enqueue_for_assignment
+from employees.cache import invalidate_responses
+from employees.changes import record_changes
+from employees.models import ChangeLog, Employee, Task
+from employees.workload import change_workload, create_workload
+
+# Удаляются ли сейчас задачи, работу обработчиков удаления для которых вызывающий код выполняет сам
+_task_signals_skipped = ContextVar('task_signals_skipped', default=False)
+
+
+@contextmanager
+def skip_task_delete_signals():
+    """Отключает обработчики удаления задач внутри блока. Нужен при массовом удалении, когда журнал изменений,
+    события и кэш ответов обновляются сгруппированно, а не на каждую задачу."""
+    token = _task_signals_skipped.set(True)
+    try:
+        yield
+    finally:
+        _task_signals_skipped.reset(token)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_cached_responses(sender, **kwargs):
+    """После создания, изменения или удаления сотрудника или задачи сбрасываю закэшированные ответы списков."""
+    if sender is Task and _task_signals_skipped.get():
+        return
+    invalidate_responses()
+
+
+@receiver(post_save, sender=Employee)
+def create_employee_workload(sender, instance, created, **kwargs):
+    """Для нового сотрудника создаю строку загруженности."""
+    if created:
+        create_workload([instance.pk])
+
+
+def get_workload_state(values):
+    """Состояние задачи для загруженности: (исполнитель, выполнена ли, срок)."""
+    return None if values is None else (values['employee_id'], values['status'], values['date'])
+
+
+@receiver(pre_save, sender=Task)
+def remember_previous_state(sender, instance, **kwargs):
+    """Перед сохранением задачи запоминаю её прежнего исполнителя, родительскую задачу, статус и срок. Обычно они
+    запомнены при чтении задачи из БД (Task.from_db), и запрос нужен, только если задачу не читали или перечитали."""
+    previous = None
+    if not instance._state.adding:
+        previous = getattr(instance, '_loaded_values', None)
+        if previous is None:
+            row = Task.objects.filter(pk=instance.pk).values_list(*Task.TRACKED_FIELDS).first()
+            previous = None if row is None else dict(zip(Task.TRACKED_FIELDS, row))
+    instance._previous_values = previous
+    values = previous or dict.fromkeys(Task.TRACKED_FIELDS)
+    instance._previous_employee_id = values['employee_id']
+    instance._previous_parent_task_id = values['parent_task_id']
+    instance._previous_status = values['status']
+
+
+@receiver(post_save, sender=Task)
+def change_workload_after_save(sender, instance, **kwargs):
+    """После сохранения задачи меняю загруженность её прежнего и нового исполнителя на разницу состояний задачи."""
+    current = {field: getattr(instance, field) for field in Task.TRACKED_FIELDS}
+    change_workload([(get_workload_state(getattr(instance, '_previous_values', None)), get_workload_state(current))])
+
+
+@receiver(post_delete, sender=Task)
+def change_workload_after_delete(sender, instance, **kwargs):
+    """После удаления задачи вычитаю её из загруженности исполнителя."""
+    if _task_signals_skipped.get():
+        return
+    current = {field: getattr(instance, field) for field in Task.TRACKED_FIELDS}
+    change_workload([(get_workload_state(current), None)])
+
+
+@receiver(post_save, sender=Task)
+def enqueue_task_for_assignment(sender, instance, **kwargs):
+    """Ставлю в очередь распределения родительскую задачу, если у неё появилась эта дочерняя задача, и саму задачу,
+    если у неё убрали исполнителя."""
+    task_ids = []
+    if instance.parent_task_id != getattr(instance, '_previous_parent_task_id', None):
+        task_ids.append(instance.parent_task_id)
+    if instance.employee_id is None and getattr(instance, '_previous_employee_id', None) is not None:
+        task_ids.append(instance.pk)
+    enqueue_for_assignment(task_ids)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=Task)
+def record_saved_change(sender, instance, created, **kwargs):
+    """Записываю создание или изменение сотрудника или задачи в журнал изменений."""
+    record_changes(sender, [instance.pk], ChangeLog.CREATE if created else ChangeLog.UPDATE)
+
+
+@receiver(post_delete, sender=Employee)
+@receiver(post_delete, sender=Task)
+def record_deleted_change(sender, instance, **kwargs):
+    """Записываю удаление сотрудника или задачи в журнал изменений."""
+    if sender is Task and _task_signals_skipped.get():
+        return
+    record_changes(sender, [instance.pk], ChangeLog.DELETE)
+
+
+@receiver(pre_delete, sender=Employee)
+def record_unassigned_tasks(sender, instance, **kwargs):
+    """При удалении сотрудника у его задач исполнитель обнуляется запросом UPDATE без сигналов, поэтому записываю
+    эти задачи в журнал изменений, публикую их изменение и ставлю задачи в работе в очередь распределения сам."""
+    tasks = list(Task.objects.filter(employee=instance.pk).values_list('pk', 'status'))
+    task_ids = [pk for pk, _ in tasks]
+    record_changes(Task, task_ids, ChangeLog.UPDATE)
+    events.publish_task_events(events.UPDATE, task_ids, previous_employee_id=instance.pk)
+    enqueue_for_assignment([pk for pk, completed in tasks if not completed])
+
+
+@receiver(pre_delete, sender=Task)
+def record_orphaned_tasks(sender, instance, **kwargs):
+    """При удалении задачи у дочерних задач обнуляется родительская задача, записываю их в журнал изменений и
+    публикую их изменение."""
+    if _task_signals_skipped.get():
+        return
+    task_ids = list(Task.objects.filter(parent_task=instance.pk).values_list('pk', flat=True))
+    record_changes(Task, task_ids, ChangeLog.UPDATE)
+    events.publish_task_events(events.UPDATE, task_ids)
+
+
+@receiver(post_save, sender=Task)
+def publish_saved_task(sender, instance, created, **kwargs):
+    """Публикую событие создания, назначения исполнителя, выполнения или изменения задачи."""
+    previous_employee_id = getattr(instance, '_previous_employee_id', None)
+    if created:
+        event_type = events.CREATE
+    elif instance.status and not getattr(instance, '_previous_status', None):
+        event_type = events.COMPLETE
+    elif instance.employee_id is not None and instance.employee_id != previous_employee_id:
+        event_type = events.ASSIGN
+    else:
+        event_type = events.UPDATE
+    events.publish_task_events(event_type, [instance.pk], previous_employee_id)
+
+
+@receiver(post_delete, sender=Task)
+def publish_deleted_task(sender, instance, **kwargs):
+    """Публикую удаление задачи."""
+    if _task_signals_skipped.get():
+        return
+    events.publish_deleted_task(instance)
+
+
+@receiver(post_save, sender=Task)
+def remember_saved_state(sender, instance, **kwargs):
+    """Запоминаю сохранённые значения, чтобы следующее сохранение этого же объекта сравнивалось с ними без запроса.
+    Обработчик зарегистрирован последним, поэтому остальные обработчики post_save видят прежние значения."""
+    instance._loaded_values = {field: getattr(instance, field) for field in Task.TRACKED_FIELDS}
@@ -0,0 +1,259 @@
+import heapq
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from employees.models import Employee
+
+# Важная задача, которой нужно подобрать исполнителя
+Candidate = namedtuple('Candidate', ['task_id', 'parent_task_id', 'parent_employee_id', 'date'])
+
+
+class EmployeeLoad:
+    """Таблица загруженности сотрудников в памяти.
+
+    Наименее загруженный сотрудник ищется через кучу по (нагрузка, pk). При изменении нагрузки в кучу кладётся новая
+    запись, а устаревшие выбрасываются при следующем поиске минимума, поэтому обе операции стоят O(log n). Если
+    переданы группы ({pk: группа}, например должность), для каждой группы ведётся своя куча."""
+
+    def __init__(self, task_counts, groups=None):
+        self.task_counts = dict(task_counts)
+        self.groups = groups or {}
+        self._heap = [(count, pk) for pk, count in self.task_counts.items()]
+        heapq.heapify(self._heap)
+        self._group_heaps = defaultdict(list)
+        for pk, group in self.groups.items():
+            if pk in self.task_counts:
+                self._group_heaps[group].append((self.task_counts[pk], pk))
+        for heap in self._group_heaps.values():
+            heapq.heapify(heap)
+
+    def __bool__(self):
+        return bool(self.task_counts)
+
+    def least_loaded(self, group=None):
+        """Возвращает pk наименее загруженного сотрудника (при равенстве - с меньшим pk), в том числе в группе."""
+        heap = self._heap if group is None else self._group_heaps.get(group, [])
+        while heap:
+            count, pk = heap[0]
+            if self.task_counts.get(pk) == count:
+                return pk
+            heapq.heappop(heap)
+        return None
+
+    def add(self, pk, value=1):
+        """Увеличивает нагрузку сотрудника."""
+        self.task_counts[pk] += value
+        heapq.heappush(self._heap, (self.task_counts[pk], pk))
+        group = self.groups.get(pk)
+        if group is not None:
+            heapq.heappush(self._group_heaps[group], (self.task_counts[pk], pk))
+
+
+class AssignmentStrategy:
+    """Стратегия распределения важных задач между сотрудниками.
+
+    Нагрузка сотрудника - целое число (его можно атомарно увеличивать в общем снимке прогона), стратегия задаёт, как
+    она считается в БД (get_load_expression) и сколько добавляет назначенная задача (get_weight). choose выбирает
+    сотрудника для одной задачи, не меняя нагрузку, plan распределяет пачку задач. Все стратегии работают с
+    нагрузкой в памяти за O(log n) на задачу."""
+
+    def get_load_expression(self):
+        """Выражение нагрузки сотрудника для запросов к Employee."""
+        return F('task_count')
+
+    def get_weight(self, candidate):
+        """На сколько увеличивается нагрузка сотрудника, которому назначена задача."""
+        return 1
+
+    def prepare(self, load):
+        """Добавляет к нагрузке данные, которые нужны стратегии, кроме самих чисел (например, группы)."""
+        return load
+
+    def load_from_db(self):
+        """Загружает нагрузку всех сотрудников одним запросом."""
+        return self.prepare(EmployeeLoad(
+            Employee.objects.annotate(load=self.get_load_expression()).values_list('pk', 'load')
+        ))
+
+    def get_preview_filter(self, parent_employee_ids):
+        """Условие на сотрудников, которых нужно знать, чтобы подобрать исполнителей задачам с родительскими задачами
+        parent_employee_ids: сами эти сотрудники и наименее загруженный."""
+        minimum = Employee.objects.annotate(load=self.get_load_expression()).order_by('load', 'pk').values('pk')[:1]
+        return Q(pk__in=parent_employee_ids) | Q(pk=Subquery(minimum))
+
+    def load_for_preview(self, parent_employee_ids):
+        """Загружает одним запросом нагрузку сотрудников из get_preview_filter. Возвращает (нагрузка, {pk: ФИО})."""
+        rows = list(
+            Employee.objects.filter(self.get_preview_filter(parent_employee_ids))
+            .annotate(load=self.get_load_expression())
+            .values_list('pk', 'load', 'full_name', 'post')
+        )
+        load = EmployeeLoad(((pk, value) for pk, value, _, _ in rows), groups={pk: post for pk, _, _, post in rows})
+        return load, {pk: full_name for pk, _, full_name, _ in rows}
+
+    def choose(self, load, candidate, parent_employee_id):
+        """Возвращает pk сотрудника для задачи. parent_employee_id - исполнитель родительской задачи с учётом
+        назначений текущего прогона."""
+        raise NotImplementedError
+
+    def plan(self, candidates, load):
+        """Распределяет задачи по одной в порядке candidates. Возвращает словарь {pk задачи: pk сотрудника}, нагрузка
+        в load обновляется по ходу распределения."""
+        assignments = {}
+        if not load:
+            return assignments
+        for candidate in candidates:
+            # Родительская задача могла получить исполнителя раньше в этом же прогоне
+            parent_employee_id = assignments.get(candidate.parent_task_id, candidate.parent_employee_id)
+            employee_id = self.choose(load, candidate, parent_employee_id)
+            load.add(employee_id, self.get_weight(candidate))
+            assignments[candidate.task_id] = employee_id
+        return assignments
+
+    def get_deltas(self, candidates, assignments):
+        """Возвращает {pk сотрудника: прирост нагрузки} для назначений assignments."""
+        deltas = Counter()
+        for candidate in candidates:
+            employee_id = assignments.get(candidate.task_id)
+            if employee_id is not None:
+                deltas[employee_id] += self.get_weight(candidate)
+        return deltas
+
+
+class ParentAffinityStrategy(AssignmentStrategy):
+    """Задача отдаётся сотруднику, выполняющему родительскую задачу, если его нагрузка больше минимальной не более
+    чем на threshold. Иначе - наименее загруженному сотруднику."""
+
+    def __init__(self, threshold=None):
+        self.threshold = settings.ASSIGNMENT_PARENT_THRESHOLD if threshold is None else threshold
+
+    def choose(self, load, candidate, parent_employee_id):
+        minimum_id = load.least_loaded()
+        if parent_employee_id is not None and parent_employee_id in load.task_counts:
+            if load.task_counts[parent_employee_id] - load.task_counts[minimum_id] <= self.threshold:
+                return parent_employee_id
+        return minimum_id
+
+
+class DueDateWeightedStrategy(ParentAffinityStrategy):
+    """Как ParentAffinityStrategy, но просроченные задачи весят overdue_weight обычных: и в нагрузке сотрудника (по
+    таблице загруженности), и при назначении. Поэтому сотрудники с просрочками получают новые задачи реже."""
+
+    def __init__(self, threshold=None, overdue_weight=None):
+        super().__init__(threshold)
+        self.overdue_weight = settings.ASSIGNMENT_OVERDUE_WEIGHT if overdue_weight is None else overdue_weight
+        self.today = timezone.localdate()
+
+    def get_load_expression(self):
+        return F('task_count') + Coalesce(F('workload__overdue_count'), Value(0)) * (self.overdue_weight - 1)
+
+    def get_weight(self, candidate):
+        return self.overdue_weight if candidate.date is not None and candidate.date < self.today else 1
+
+
+class PostMatchingStrategy(ParentAffinityStrategy):
+    """Задача остаётся у сотрудников той же должности, что и исполнитель родительской задачи: сам исполнитель, если
+    он загружен не более чем на threshold больше наименее загруженного коллеги по должности, иначе этот коллега.
+    Задачи без исполнителя родительской задачи получает наименее загруженный сотрудник."""
+
+    def prepare(self, load):
+        return EmployeeLoad(load.task_counts, groups=dict(Employee.objects.values_list('pk', 'post')))
+
+    def get_preview_filter(self, parent_employee_ids):
+        posts = Employee.objects.filter(pk__in=parent_employee_ids).values('post')
+        return super().get_preview_filter(parent_employee_ids) | Q(post__in=Subquery(posts))
+
+    def choose(self, load, candidate, parent_employee_id):
+        post = load.groups.get(parent_employee_id)
+        if post is None:
+            return load.least_loaded()
+        minimum_id = load.least_loaded(post)
+        if load.task_counts[parent_employee_id] - load.task_counts[minimum_id] <= self.threshold:
+            return parent_employee_id
+        return minimum_id
+
+
+class BalancedBatchStrategy(AssignmentStrategy):
+    """Оптимальное распределение всей пачки задач сразу.
+
+    Для одинаковых задач и выпуклой стоимости нагрузки (например, суммы квадратов) оптимальные итоговые нагрузки
+    даёт "заполнение водой": нагрузки самых свободных сотрудников поднимаются до общего уровня. Уровень ищется по
+    отсортированным нагрузкам за O(n log n). Затем в пределах свободного места каждого сотрудника задача отдаётся
+    исполнителю родительской задачи, а остальные задачи - сотрудникам с оставшимся местом. Результат совпадает с
+    решением задачи о назначениях минимальной стоимости, но без O(n³) венгерского алгоритма."""
+
+    def choose(self, load, candidate, parent_employee_id):
+        # Для одной задачи пачка из неё одной: исполнитель родительской задачи, только если он наименее загружен
+        minimum_id = load.least_loaded()
+        if parent_employee_id is not None and load.task_counts.get(parent_employee_id) == load.task_counts[minimum_id]:
+            return parent_employee_id
+        return minimum_id
+
+    @staticmethod
+    def get_capacities(task_counts, total, demand):
+        """Возвращает {pk сотрудника: сколько задач ему дать}, чтобы после total задач нагрузки были как можно ровнее.
+
+        demand - {pk сотрудника: сколько задач пачки хотят к нему как к исполнителю родительской задачи}."""
+        loads = sorted((count, pk) for pk, count in task_counts.items())
+        # Ищу, сколько самых свободных сотрудников поднимается до общего уровня
+        prefix = 0
+        size = len(loads)
+        for index, (count, _) in enumerate(loads):
+            # Поднять первых index сотрудников до нагрузки следующего стоит count * index - prefix задач
+            if index and count * index - prefix >= total:
+                size = index
+                break
+            prefix += count
+        level, extra = divmod(total + sum(count for count, _ in loads[:size]), size)
+        capacities = {pk: level - count for count, pk in loads[:size]}
+        # Остаток распределяется по одной задаче: сначала тем, к кому хочет больше задач, чем у него места
+        for _, pk in sorted(loads[:size], key=lambda item: (demand[item[1]] <= capacities[item[1]], item))[:extra]:
+            capacities[pk] += 1
+        return capacities
+
+    def plan(self, candidates, load):
+        assignments = {}
+        if not load or not candidates:
+            return assignments
+        demand = Counter(candidate.parent_employee_id for candidate in candidates)
+        capacities = self.get_capacities(load.task_counts, len(candidates), demand)
+        deferred = []
+        for candidate in candidates:
+            parent_employee_id = assignments.get(candidate.parent_task_id, candidate.parent_employee_id)
+            if capacities.get(parent_employee_id, 0) > 0:
+                capacities[parent_employee_id] -= 1
+                assignments[candidate.task_id] = parent_employee_id
+            else:
+                deferred.append(candidate)
+        free = ((pk, capacity) for pk, capacity in capacities.items() if capacity > 0)
+        pk, capacity = next(free, (None, 0))
+        for candidate in deferred:
+            while capacity == 0:
+                pk, capacity = next(free)
+            assignments[candidate.task_id] = pk
+            capacity -= 1
+        for employee_id in assignments.values():
+            load.add(employee_id)
+        return assignments
+
+
+STRATEGIES = {
+    'parent_affinity': ParentAffinityStrategy,
+    'due_date': DueDateWeightedStrategy,
+    'post': PostMatchingStrategy,
+    'balanced_batch': BalancedBatchStrategy,
+}
+
+
+def get_assignment_strategy(name=None):
+    """Возвращает стратегию распределения по имени, по умолчанию - из настройки ASSIGNMENT_STRATEGY."""
+    name = settings.ASSIGNMENT_STRATEGY if name is None else name
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f'Неизвестная стратегия распределения задач: {name}')
@@ -0,0 +1,78 @@
+import datetime
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+
+from employees.cache import invalidate_responses
+from employees.counters import reconcile_task_counts
+from employees.models import Employee, Task
+from employees.workload import rebuild_workload
+
+
+def get_tree_size(fan_out, depth):
+    """Количество задач в полном дереве глубины depth, где у каждой задачи fan_out дочерних."""
+    if fan_out == 1:
+        return depth
+    return (fan_out ** depth - 1) // (fan_out - 1)
+
+
+def create_synthetic_tasks(count, fan_out=3, depth=None, employee_ids=(), unassigned_every=None, chunk_size=5000):
+    """Создаёт count задач, связанных в деревья зависимостей, и возвращает pk первой созданной задачи.
+
+    Задачи нумеруются как в двоичной куче: у задачи с номером j в дереве родитель - задача (j - 1) // fan_out, поэтому
+    pk родителя вычисляется без запросов и задачи пишутся через bulk_create с постоянным расходом памяти. Если depth не
+    задана, все задачи образуют одно дерево. Исполнители назначаются по кругу из employee_ids, кроме каждой
+    unassigned_every-й задачи, которая остаётся без исполнителя."""
+    tree_size = count if depth is None else get_tree_size(fan_out, depth)
+    first_pk = (Task.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0) + 1
+    today = datetime.date.today()
+
+    for chunk_start in range(0, count, chunk_size):
+        tasks = []
+        for number in range(chunk_start, min(chunk_start + chunk_size, count)):
+            tree_start = number - number % tree_size
+            local_number = number - tree_start
+            parent_pk = None if local_number == 0 else first_pk + tree_start + (local_number - 1) // fan_out
+            tasks.append(Task(
+                pk=first_pk + number,
+                title=f'synthetic {first_pk + number}',
+                parent_task_id=parent_pk,
+                employee_id=(
+                    employee_ids[number % len(employee_ids)]
+                    if employee_ids and not (unassigned_every and number % unassigned_every == 0) else None
+                ),
+                date=today + datetime.timedelta(days=number % 365),
+            ))
+        Task.objects.bulk_create(tasks)
+
+    # pk заданы явно, поэтому последовательность id нужно сдвинуть за созданные задачи
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Task]):
+            cursor.execute(sql)
+    return first_pk
+
+
+def create_synthetic_employees(count, chunk_size=5000):
+    """Создаёт count сотрудников через bulk_create и возвращает список их pk."""
+    pks = []
+    for chunk_start in range(0, count, chunk_size):
+        employees = Employee.objects.bulk_create(
+            Employee(full_name=f'synthetic {number}', post='synthetic')
+            for number in range(chunk_start, min(chunk_start + chunk_size, count))
+        )
+        pks.extend(employee.pk for employee in employees)
+    return pks
+
+
+def seed_synthetic(employees, tasks, fan_out=3, depth=None, unassigned_every=None, chunk_size=5000):
+    """Создаёт синтетических сотрудников и задачи и возвращает (pk сотрудников, pk первой задачи).
+
+    bulk_create обходит счётчики задач и таблицу загруженности, поэтому после создания они пересчитываются целиком."""
+    employee_ids = create_synthetic_employees(employees, chunk_size=chunk_size)
+    root = create_synthetic_tasks(tasks, fan_out=fan_out, depth=depth, employee_ids=employee_ids,
+                                  unassigned_every=unassigned_every, chunk_size=chunk_size)
+    reconcile_task_counts()
+    rebuild_workload()
+    invalidate_responses()
+    return employee_ids, root
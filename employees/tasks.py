@@ -1,71 +1,161 @@
+import logging
+import time
+import uuid
 
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
 
-from employees.models import Employee, Task
+from employees.archive import archive_completed_tasks
+from employees.assignment import (assign_important_tasks, get_important_tasks, acquire_assignment_lock,
+                                  release_assignment_lock, process_assignment_queue, SharedEmployeeLoad)
+from employees.cache import require_shared_cache
+from employees.changes import prune_changes
+from employees.metrics import count_queries, record_assignment_run
+from employees.models import AssignmentRun
+from employees.partitions import archive_old_partitions, create_future_partitions, is_partitioned
+from employees.strategies import get_assignment_strategy
+from employees.workload import rebuild_workload
 
-from django.db.models import OuterRef, Exists
+logger = logging.getLogger(__name__)
+
+
+def require_result_backend(feature):
+    """Проверяет, что у Celery задан бэкенд результатов: без него chord не может собрать результаты частей."""
+    if not settings.CELERY_RESULT_BACKEND:
+        raise ImproperlyConfigured(f'{feature} нужен бэкенд результатов Celery: задайте CELERY_RESULT_BACKEND')
 
 
 @shared_task
 def assignment_tasks_to_employees():
     """Автоматическое распределение задач между сотрудниками"""
-    subqueries = Task.objects.filter(parent_task=OuterRef('pk'))
-    tasks = Task.objects.annotate(has_children=Exists(subqueries)).filter(has_children=True, employee=None)
-    for task in tasks:
-        # Получил сотрудника с минимальным количеством задач
-        employee_with_minimum_number_of_tasks = Employee.objects.order_by('task_count').first()
-
-        # Проверяю есть ли у задачи ещё одна родительская задача
-        if task.parent_task is not None:
-
-            # получаю эту родительскую задачу и через неё нахожу сотрудника выполняющего её(если он есть)
-            parent_task = Task.objects.get(pk=task.parent_task.pk)
-            try:
-                employee_performing_parent_task = Employee.objects.get(pk=parent_task.employee.pk)
-
-                # Сравниваю у кого сколько задач и если у сотрудника выполняющего родительскую задачу задач максимум на 2
-                # больше чем у наименее загруженного сотрудника, то отдаю сотруднику выполняющего родительскую задачу
-                if employee_performing_parent_task.task_count - employee_with_minimum_number_of_tasks.task_count <= 2:
-
-                    # Обновляю данные по количеству задач у пользователя
-                    new_number_of_tasks = employee_performing_parent_task.task_count +1
-                    employee_performing_parent_task.task_count = new_number_of_tasks
-                    employee_performing_parent_task.save()
-
-                    # Назначаю задаче нового пользователя
-                    task.employee = employee_performing_parent_task
-                    task.save()
-
-                # если наоборот, то отдаю задачу наименее загруженному сотруднику
-                else:
-
-                    # Обновляю данные по количеству задач у пользователя
-                    new_number_of_tasks = employee_with_minimum_number_of_tasks.task_count + 1
-                    employee_with_minimum_number_of_tasks.task_count = new_number_of_tasks
-                    employee_with_minimum_number_of_tasks.save()
-
-                    # Назначаю задаче нового пользователя
-                    task.employee = employee_with_minimum_number_of_tasks
-                    task.save()
-
-            except Exception as e:
-
-                # Обновляю данные по количеству задач у пользователя
-                new_number_of_tasks = employee_with_minimum_number_of_tasks.task_count + 1
-                employee_with_minimum_number_of_tasks.task_count = new_number_of_tasks
-                employee_with_minimum_number_of_tasks.save()
-
-                # Назначаю задаче нового пользователя
-                task.employee = employee_with_minimum_number_of_tasks
-                task.save()
-
-        else:
-            # Обновляю данные по количеству задач у пользователя
-            new_number_of_tasks = employee_with_minimum_number_of_tasks.task_count + 1
-            employee_with_minimum_number_of_tasks.task_count = new_number_of_tasks
-            employee_with_minimum_number_of_tasks.save()
-            # Назначаю задаче нового пользователя
-            task.employee = employee_with_minimum_number_of_tasks
-            task.save()
-            print(employee_with_minimum_number_of_tasks.full_name)
-    print('Важных задач больше нет')
+    started_at = time.time()
+    # Блокировка не даёт следующему запуску по расписанию начать распределение, пока не закончился предыдущий
+    token = acquire_assignment_lock()
+    if token is None:
+        logger.warning('Предыдущее распределение задач ещё выполняется')
+        return
+    try:
+        with count_queries() as queries:
+            task_ids = list(get_important_tasks().order_by('pk').values_list('pk', flat=True))
+            chunk_size = settings.ASSIGNMENT_CHUNK_SIZE
+            if len(task_ids) > chunk_size:
+                # Части выполняются на разных воркерах, снимок нагрузки в кэше в памяти процесса они бы не увидели
+                require_shared_cache('Распределению важных задач частями')
+                require_result_backend('Распределению важных задач частями')
+                run_id = uuid.uuid4().hex
+                SharedEmployeeLoad(run_id).save(get_assignment_strategy().load_from_db().task_counts,
+                                                timeout=settings.ASSIGNMENT_LOCK_TIMEOUT)
+        if len(task_ids) <= chunk_size:
+            # Одну часть нет смысла отправлять на другой воркер
+            finish_assignment([assign_task_chunk(0, task_ids)], None, token, started_at, queries.count)
+            return
+
+        # Части распределяются параллельно на разных воркерах, нагрузка сотрудников для них общая
+        chunks = [task_ids[start:start + chunk_size] for start in range(0, len(task_ids), chunk_size)]
+        # Если часть упадёт, finish_assignment не запустится, поэтому блокировку и снимок снимает abort_assignment
+        chord(
+            assign_task_chunk.s(index, chunk, run_id) for index, chunk in enumerate(chunks)
+        )(finish_assignment.s(run_id, token, started_at, queries.count).on_error(abort_assignment.s(run_id, token)))
+    except Exception:
+        release_assignment_lock(token)
+        raise
+
+
+@shared_task
+def assign_task_chunk(index, task_ids, run_id=None):
+    """Распределение одной части важных задач. Возвращает статистику части"""
+    started = time.perf_counter()
+    shared_load = None if run_id is None else SharedEmployeeLoad(run_id)
+    run = AssignmentRun(scanned=0, assigned=0, lock_wait=0)
+    with count_queries() as queries:
+        assign_important_tasks(task_ids, shared_load=shared_load, run=run)
+    return {
+        'chunk': index,
+        'scanned': run.scanned,
+        'assigned': run.assigned,
+        'queries': queries.count,
+        'lock_wait': run.lock_wait,
+        'duration': time.perf_counter() - started,
+    }
+
+
+@shared_task
+def finish_assignment(results, run_id, token, started_at, queries=0):
+    """Итог прогона распределения: сохраняет статистику прогона в историю и снимает блокировку"""
+    try:
+        for result in results:
+            logger.info('Часть %s: проверено задач %s, назначено %s, %.2f с', result['chunk'], result['scanned'],
+                        result['assigned'], result['duration'])
+        run = record_assignment_run(
+            AssignmentRun.FULL,
+            started_at,
+            duration=time.time() - started_at,
+            chunks=len(results),
+            scanned=sum(result['scanned'] for result in results),
+            assigned=sum(result['assigned'] for result in results),
+            queries=queries + sum(result['queries'] for result in results),
+            lock_wait=sum(result['lock_wait'] for result in results),
+        )
+        logger.info('Назначено задач: %s за %.2f с', run.assigned, run.duration)
+    finally:
+        if run_id is not None:
+            SharedEmployeeLoad(run_id).delete()
+        release_assignment_lock(token)
+    return results
+
+
+@shared_task
+def abort_assignment(request, exc, traceback, run_id, token):
+    """Обработчик ошибки части прогона распределения: удаляет снимок нагрузки и снимает блокировку, чтобы следующий
+    запуск по расписанию не ждал её истечения"""
+    SharedEmployeeLoad(run_id).delete()
+    release_assignment_lock(token)
+
+
+@shared_task
+def assign_queued_tasks():
+    """Распределение задач из очереди, которые изменились после последнего прогона"""
+    started_at = time.time()
+    run = AssignmentRun(scanned=0, assigned=0, lock_wait=0)
+    with count_queries() as queries:
+        process_assignment_queue(batch_size=settings.ASSIGNMENT_QUEUE_BATCH_SIZE, run=run)
+    # Пустые прогоны (очередь уже разобрал предыдущий прогон) в историю не пишу
+    if run.scanned:
+        record_assignment_run(AssignmentRun.QUEUE, started_at, duration=time.time() - started_at,
+                              scanned=run.scanned, assigned=run.assigned, queries=queries.count,
+                              lock_wait=run.lock_wait)
+    logger.info('Назначено задач из очереди: %s', run.assigned)
+
+
+@shared_task
+def rebuild_employee_workload():
+    """Пересборка таблицы загруженности сотрудников, в том числе количества задач, просроченных с прошлого дня"""
+    logger.info('Пересчитана загруженность сотрудников: %s', rebuild_workload())
+
+
+@shared_task
+def prune_change_log():
+    """Удаление из журнала изменений записей старше CHANGE_LOG_RETENTION_DAYS дней"""
+    logger.info('Удалено записей журнала изменений: %s', prune_changes(settings.CHANGE_LOG_RETENTION_DAYS))
+
+
+@shared_task
+def archive_tasks():
+    """Перенос выполненных задач из таблицы задач в архив пачками по TASK_ARCHIVE_BATCH_SIZE"""
+    logger.info('Перенесено задач в архив: %s', archive_completed_tasks(settings.TASK_ARCHIVE_BATCH_SIZE))
+
+
+@shared_task
+def maintain_task_partitions():
+    """Создание секций таблицы задач на TASK_PARTITION_MONTHS_AHEAD месяцев вперёд и, если задан
+    TASK_PARTITION_RETENTION_MONTHS, архивация и удаление старых секций. Ничего не делает, пока таблица не
+    секционирована (manage.py partition_tasks convert)"""
+    if connection.vendor != 'postgresql' or not is_partitioned():
+        return
+    logger.info('Созданы секции задач: %s', create_future_partitions(settings.TASK_PARTITION_MONTHS_AHEAD))
+    if settings.TASK_PARTITION_RETENTION_MONTHS:
+        dropped, kept = archive_old_partitions(settings.TASK_PARTITION_RETENTION_MONTHS,
+                                               settings.TASK_ARCHIVE_BATCH_SIZE)
+        logger.info('Удалены секции задач: %s, остались из-за задач в работе: %s', dropped, kept)
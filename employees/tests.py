@@ -1,9 +1,49 @@
 
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import override_settings, TransactionTestCase, AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.views import APIView
 
-from employees.models import Employee, Task
+from config.celery import app
+from employees.bulk import import_tasks, read_rows
+from employees.cache import get_response_cache_stats
+from employees.changes import prune_changes
+from employees.events import RESET, Subscription
+from employees.graph import find_cycle, find_tasks_in_cycles, get_depth
+from employees.metrics import get_request_histograms, observe_request
+from employees.middleware import PRIMARY_COOKIE
+from employees.models import AssignmentQueue, AssignmentRun, ChangeLog, Employee, Task, EmployeeWorkload, TaskArchive
+from employees import urls as employees_urls
+from employees.assignment import SharedEmployeeLoad, acquire_assignment_lock
+from employees.async_views import AsyncEmployeeListView, AsyncTaskListView, AsyncTaskRetrieveView, \
+    AsyncImportantTasksListView, TaskEventsView
+from employees.partitions import add_months, archive_old_partitions, convert_to_partitioned, \
+    create_future_partitions, get_partition_name, get_partitions, is_partitioned
+from employees.routers import ReplicaRouter, allow_replica
+from employees.strategies import BalancedBatchStrategy, Candidate, DueDateWeightedStrategy, EmployeeLoad, \
+    ParentAffinityStrategy, PostMatchingStrategy, get_assignment_strategy
+from employees.serializers import TaskSerializer, EmployeeWithTaskSerializer, ValuesSerializer
+from employees.tasks import abort_assignment, assign_task_chunk, assignment_tasks_to_employees
 
 
 class EmployeeTestCase(APITestCase):
@@ -100,7 +140,7 @@ class EmployeeTestCase(APITestCase):
                 "task_count": self.employee.task_count
             }
         ]
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(
             data, result
         )
@@ -209,7 +249,7 @@ class TaskTestCase(APITestCase):
                 "employee": self.task.employee.pk
             }
         ]
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(
             data, result
         )
@@ -246,11 +286,26 @@ class EmployeeWithTaskTestCase(APITestCase):
                 "task_count": self.employee.task_count
             }
         ]
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(
             data, result
         )
 
+    def test_employee_with_task_list_query_count(self):
+        """Тест на то, что количество запросов не зависит от количества сотрудников."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee_with_task-list')
+        for number in range(5):
+            employee = Employee.objects.create(full_name=f'test_{number + 2}', post='test')
+            Task.objects.create(title=f'test_{number + 2}', employee=employee, date='2024-02-02')
+
+        # Act(совершаю действие которое тестирую) и Assert(делаю проверки)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(
+            len(response.json()['results']), 6
+        )
+
 
 class ImportantTasksTestCase(APITestCase):
     """Тесты для контроллера, который получает список задач не взятых в работу, но от которых зависят другие задачи и
@@ -293,7 +348,1762 @@ class ImportantTasksTestCase(APITestCase):
                 "employee": self.employee_2.full_name
             }
         ]
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(
             data, result
         )
+
+
+    def test_important_tasks_list_query_count(self):
+        """Тест на то, что количество запросов не зависит от количества важных задач."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:important_tasks-list')
+        for number in range(5):
+            task = Task.objects.create(title=f'test_{number + 6}', parent_task=self.task_1, date='2024-02-02')
+            Task.objects.create(title=f'test_{number + 11}', parent_task=task, date='2024-02-02')
+
+        # Act(совершаю действие которое тестирую) и Assert(делаю проверки)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(
+            len(response.json()['results']), 7
+        )
+
+# Тесты выполняются в одном процессе, поэтому кэш в памяти для них общий
+@override_settings(SHARED_CACHE=True)
+class AssignmentTasksTestCase(APITestCase):
+    """Тесты для автоматического распределения важных задач между сотрудниками."""
+    def setUp(self):
+        """Создаю 2 пользователя и задачи:
+        1. Задача без сотрудника -> задача без сотрудника -> задача с сотрудником;
+        2. Задача с сотрудником -> задача без сотрудника -> задача с сотрудником."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1', task_count=5)
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2', task_count=0)
+        self.task_1 = Task.objects.create(title='test_1', date='2024-02-02')
+        self.task_2 = Task.objects.create(title='test_2', parent_task=self.task_1, date='2024-02-02')
+        self.task_3 = Task.objects.create(title='test_3', parent_task=self.task_2, employee=self.employee_2,
+                                          date='2024-02-02')
+        self.task_4 = Task.objects.create(title='test_4', employee=self.employee_1, date='2024-02-02')
+        self.task_5 = Task.objects.create(title='test_5', parent_task=self.task_4, date='2024-02-02')
+        self.task_6 = Task.objects.create(title='test_6', parent_task=self.task_5, employee=self.employee_1,
+                                          date='2024-02-02')
+        cache.clear()
+
+    def test_assignment_tasks_to_employees(self):
+        """Тест на то, что распределение даёт те же назначения, что и последовательный перебор задач."""
+        # Act(совершаю действие которое тестирую)
+        assignment_tasks_to_employees()
+
+        # Assert(делаю проверки)
+        # task_1 - наименее загруженному, task_2 - исполнителю task_1, назначенному в этом же прогоне,
+        # task_5 - наименее загруженному, потому что у исполнителя task_4 на 3 задачи больше
+        self.assertEqual(
+            dict(Task.objects.filter(pk__in=(self.task_1.pk, self.task_2.pk, self.task_5.pk))
+                 .values_list('pk', 'employee')),
+            {self.task_1.pk: self.employee_2.pk, self.task_2.pk: self.employee_2.pk,
+             self.task_5.pk: self.employee_2.pk}
+        )
+        self.assertEqual(
+            dict(Employee.objects.values_list('pk', 'task_count')),
+            {self.employee_1.pk: 5, self.employee_2.pk: 3}
+        )
+
+    @override_settings(ASSIGNMENT_CHUNK_SIZE=1, CELERY_RESULT_BACKEND='cache+memory://')
+    def test_assignment_tasks_in_chunks(self):
+        """Тест на то, что распределение частями на воркерах даёт те же назначения и снимает блокировку."""
+        # Arrange(подготавливаю данные для теста)
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+        # Act(совершаю действие которое тестирую)
+        assignment_tasks_to_employees()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            dict(Task.objects.filter(pk__in=(self.task_1.pk, self.task_2.pk, self.task_5.pk))
+                 .values_list('pk', 'employee')),
+            {self.task_1.pk: self.employee_2.pk, self.task_2.pk: self.employee_2.pk,
+             self.task_5.pk: self.employee_2.pk}
+        )
+        self.assertEqual(
+            dict(Employee.objects.values_list('pk', 'task_count')),
+            {self.employee_1.pk: 5, self.employee_2.pk: 3}
+        )
+        self.assertIsNotNone(
+            acquire_assignment_lock()
+        )
+
+    def test_assignment_run_metrics(self):
+        """Тест на то, что прогон распределения пишется в историю и в метрики Prometheus."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:metrics')
+
+        # Act(совершаю действие которое тестирую)
+        assignment_tasks_to_employees()
+        response = self.client.get(url)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            list(AssignmentRun.objects.values_list('kind', 'chunks', 'scanned', 'assigned')),
+            [(AssignmentRun.FULL, 1, 3, 3)]
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK
+        )
+        self.assertIn(
+            'assignment_tasks_assigned_total{kind="full"} 3\n', response.content.decode()
+        )
+        self.assertIn(
+            'assignment_runs_total{kind="queue"} 0\n', response.content.decode()
+        )
+
+    def test_beat_schedule_tasks_exist(self):
+        """Тест на то, что в расписании Celery Beat указаны существующие задачи."""
+        for entry in settings.CELERY_BEAT_SCHEDULE.values():
+            self.assertIn(
+                entry['task'], app.tasks
+            )
+
+    def test_assignment_tasks_locked(self):
+        """Тест на то, что распределение не запускается, пока не закончился предыдущий прогон."""
+        # Arrange(подготавливаю данные для теста)
+        acquire_assignment_lock()
+
+        # Act(совершаю действие которое тестирую)
+        with self.assertLogs('employees.tasks', 'WARNING'):
+            assignment_tasks_to_employees()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            Task.objects.filter(employee=None).count(), 3
+        )
+
+    @override_settings(SHARED_CACHE=False, ASSIGNMENT_CHUNK_SIZE=1, CELERY_RESULT_BACKEND='cache+memory://')
+    def test_chunks_require_shared_cache(self):
+        """Тест на то, что без общего кэша распределение частями не запускается, а блокировка снимается."""
+        # Act(совершаю действие которое тестирую) / Assert(делаю проверки)
+        with self.assertRaises(ImproperlyConfigured):
+            assignment_tasks_to_employees()
+        self.assertEqual(
+            Task.objects.filter(employee=None).count(), 3
+        )
+        self.assertIsNotNone(
+            acquire_assignment_lock()
+        )
+
+    @override_settings(ASSIGNMENT_CHUNK_SIZE=1, CELERY_RESULT_BACKEND=None)
+    def test_chunks_require_result_backend(self):
+        """Тест на то, что без бэкенда результатов Celery распределение частями не отправляется на воркеры."""
+        # Act(совершаю действие которое тестирую) / Assert(делаю проверки)
+        with self.assertRaises(ImproperlyConfigured):
+            assignment_tasks_to_employees()
+        self.assertIsNotNone(
+            acquire_assignment_lock()
+        )
+
+    @override_settings(SHARED_CACHE=False)
+    def test_single_chunk_without_shared_cache(self):
+        """Тест на то, что прогон одной частью работает и без общего кэша."""
+        # Act(совершаю действие которое тестирую)
+        assignment_tasks_to_employees()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            Task.objects.filter(employee=None).count(), 0
+        )
+
+    def test_abort_assignment(self):
+        """Тест на то, что при ошибке части прогона снимок нагрузки удаляется, а блокировка снимается."""
+        # Arrange(подготавливаю данные для теста)
+        token = acquire_assignment_lock()
+        shared_load = SharedEmployeeLoad('failed')
+        shared_load.save({self.employee_1.pk: 5}, timeout=60)
+
+        # Act(совершаю действие которое тестирую)
+        abort_assignment(None, ValueError(), None, 'failed', token)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            shared_load.load().task_counts, {}
+        )
+        self.assertIsNotNone(
+            acquire_assignment_lock()
+        )
+
+    def test_chunk_without_shared_load(self):
+        """Тест на то, что часть прогона без снимка нагрузки в кэше читает нагрузку из БД, а не пропускает задачи."""
+        # Act(совершаю действие которое тестирую)
+        with self.assertLogs('employees.assignment', 'WARNING'):
+            result = assign_task_chunk(0, [self.task_1.pk, self.task_5.pk], 'missing')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            result['assigned'], 2
+        )
+        self.assertEqual(
+            Task.objects.filter(pk__in=(self.task_1.pk, self.task_5.pk), employee=self.employee_2).count(), 2
+        )
+
+
+class AssignmentStrategyTestCase(APITestCase):
+    """Тесты для стратегий распределения задач."""
+    def setUp(self):
+        """Нагрузка 3 сотрудников двух должностей и задачи с исполнителями родительских задач."""
+        self.task_counts = {1: 0, 2: 2, 3: 3}
+        self.groups = {1: 'developer', 2: 'manager', 3: 'manager'}
+        self.candidates = [Candidate(10, None, 2, None), Candidate(11, None, 3, None), Candidate(12, None, None, None)]
+
+    def get_load(self):
+        return EmployeeLoad(self.task_counts, groups=self.groups)
+
+    def test_parent_affinity(self):
+        """Тест на то, что задача остаётся у исполнителя родительской задачи в пределах порога."""
+        # Arrange(подготавливаю данные для теста)
+        load = self.get_load()
+
+        # Act(совершаю действие которое тестирую)
+        choices = [ParentAffinityStrategy(threshold=2).choose(load, candidate, candidate.parent_employee_id)
+                   for candidate in self.candidates]
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            choices, [2, 1, 1]
+        )
+
+    def test_post_matching(self):
+        """Тест на то, что задача достаётся сотруднику той же должности, что и исполнитель родительской задачи."""
+        # Arrange(подготавливаю данные для теста)
+        load = self.get_load()
+
+        # Act(совершаю действие которое тестирую)
+        choices = [PostMatchingStrategy(threshold=0).choose(load, candidate, candidate.parent_employee_id)
+                   for candidate in self.candidates]
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            choices, [2, 2, 1]
+        )
+
+    def test_due_date_weight(self):
+        """Тест на то, что просроченная задача увеличивает нагрузку сильнее обычной, поэтому следующая задача
+        достаётся другому сотруднику."""
+        # Arrange(подготавливаю данные для теста)
+        strategy = DueDateWeightedStrategy(threshold=0, overdue_weight=3)
+        overdue = Candidate(10, None, None, datetime.date(2000, 1, 1))
+        load = self.get_load()
+
+        # Act(совершаю действие которое тестирую)
+        assignments = strategy.plan([overdue, Candidate(11, None, None, None)], load)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (assignments, load.task_counts[1]), ({10: 1, 11: 2}, 3)
+        )
+
+    def test_balanced_batch(self):
+        """Тест на то, что пачка задач выравнивает нагрузку и учитывает исполнителей родительских задач."""
+        # Arrange(подготавливаю данные для теста)
+        candidates = [Candidate(task_id, None, 2, None) for task_id in range(10, 15)]
+        load = self.get_load()
+
+        # Act(совершаю действие которое тестирую)
+        assignments = BalancedBatchStrategy().plan(candidates, load)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            load.task_counts, {1: 3, 2: 4, 3: 3}
+        )
+        self.assertEqual(
+            list(assignments.values()).count(2), 2
+        )
+
+    @override_settings(ASSIGNMENT_STRATEGY='post', SHARED_CACHE=True)
+    def test_assignment_uses_strategy(self):
+        """Тест на то, что распределение и список важных задач используют стратегию из настроек."""
+        # Arrange(подготавливаю данные для теста)
+        developer = Employee.objects.create(full_name='test_1', post='developer', task_count=0)
+        manager = Employee.objects.create(full_name='test_2', post='manager', task_count=5)
+        Employee.objects.create(full_name='test_3', post='manager', task_count=1)
+        parent = Task.objects.create(title='test_1', employee=manager, date='2024-02-02')
+        task = Task.objects.create(title='test_2', parent_task=parent, date='2024-02-02')
+        Task.objects.create(title='test_3', parent_task=task, employee=developer, date='2024-02-02')
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(reverse('employees:important_tasks-list'))
+        assignment_tasks_to_employees()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.json()['results'][0]['employee'], 'test_3'
+        )
+        task.refresh_from_db()
+        self.assertEqual(
+            task.employee.full_name, 'test_3'
+        )
+        with self.assertRaises(ImproperlyConfigured):
+            get_assignment_strategy('unknown')
+
+
+class IncrementalAssignmentTestCase(APITestCase):
+    """Тесты для распределения задач через очередь сразу после их изменения."""
+    def setUp(self):
+        """Создаю 2 пользователя и задачу без сотрудника."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1', task_count=1)
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2', task_count=0)
+        self.task = Task.objects.create(title='test_1', date='2024-02-02')
+        cache.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def test_assignment_after_child_created(self):
+        """Тест на то, что задача получает исполнителя сразу после появления дочерней задачи."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-create')
+        data = {'title': 'test_2', 'parent_task': self.task.pk, 'employee': self.employee_1.pk, 'date': '2024-02-02'}
+
+        # Act(совершаю действие которое тестирую)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, data)
+
+        # Assert(делаю проверки)
+        self.task.refresh_from_db()
+        self.assertEqual(
+            self.task.employee_id, self.employee_2.pk
+        )
+        self.assertFalse(
+            AssignmentQueue.objects.exists()
+        )
+
+    def test_assignment_after_employee_cleared(self):
+        """Тест на то, что важная задача, у которой убрали исполнителя, снова ставится в очередь."""
+        # Arrange(подготавливаю данные для теста)
+        Task.objects.create(title='test_2', parent_task=self.task, date='2024-02-02')
+        AssignmentQueue.objects.all().delete()
+        Task.objects.filter(pk=self.task.pk).update(employee=self.employee_1)
+        self.task.refresh_from_db()
+
+        # Act(совершаю действие которое тестирую)
+        self.task.employee = None
+        self.task.save()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            list(AssignmentQueue.objects.values_list('task', flat=True)), [self.task.pk]
+        )
+
+    def test_assignment_after_employee_deleted(self):
+        """Тест на то, что задачи удалённого сотрудника в работе ставятся в очередь распределения."""
+        # Arrange(подготавливаю данные для теста)
+        task = Task.objects.create(title='test_2', employee=self.employee_1, date='2024-02-02')
+        Task.objects.create(title='test_3', employee=self.employee_1, date='2024-02-02', status=True)
+        AssignmentQueue.objects.all().delete()
+
+        # Act(совершаю действие которое тестирую)
+        self.client.delete(reverse('employees:employee-destroy', args=(self.employee_1.pk,)))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            list(AssignmentQueue.objects.values_list('task', flat=True)), [task.pk]
+        )
+
+    def test_import_enqueues_parent_tasks(self):
+        """Тест на то, что импорт ставит в очередь задачи, у которых появились дочерние задачи."""
+        # Arrange(подготавливаю данные для теста)
+        lines = [
+            json.dumps({'title': 'test_2', 'parent_task': self.task.pk, 'date': '2024-02-02'}),
+            json.dumps({'title': 'test_3', 'date': '2024-02-02'}),
+        ]
+
+        # Act(совершаю действие которое тестирую)
+        import_tasks(read_rows(lines, 'jsonl'))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            list(AssignmentQueue.objects.values_list('task', flat=True)), [self.task.pk]
+        )
+
+    @override_settings(INCREMENTAL_ASSIGNMENT=False)
+    def test_incremental_assignment_disabled(self):
+        """Тест на то, что без инкрементального режима задачи в очередь не ставятся."""
+        # Act(совершаю действие которое тестирую)
+        Task.objects.create(title='test_2', parent_task=self.task, date='2024-02-02')
+
+        # Assert(делаю проверки)
+        self.assertFalse(
+            AssignmentQueue.objects.exists()
+        )
+
+
+class QueryProfilingTestCase(APITestCase):
+    """Тесты для профилирования запросов к API."""
+    def setUp(self):
+        """Создаю пользователя с задачей."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1')
+        Task.objects.create(title='test_1', employee=self.employee, date='2024-02-02')
+        cache.clear()
+
+    @override_settings(QUERY_PROFILING_ENABLED=True)
+    def test_server_timing(self):
+        """Тест на заголовок Server-Timing и гистограмму времени ответа по имени урла."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-list')
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(url)
+        metrics = self.client.get(reverse('employees:metrics')).content.decode()
+
+        # Assert(делаю проверки)
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+, serialize;dur=[\d.]+, render;dur=[\d.]+, '
+            r'total;dur=[\d.]+$'
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{url_name="employees:task-list"} 1\n', metrics
+        )
+        self.assertIn(
+            'http_request_queries_total{url_name="employees:task-list"} 1\n', metrics
+        )
+
+    def test_request_histograms(self):
+        """Тест на то, что гистограммы выводятся для всех эндпоинтов с запросами и только для них."""
+        # Act(совершаю действие которое тестирую)
+        observe_request('employees:task-list', 0.02, 1)
+        observe_request('employees:employee-list', 3, 2)
+        histograms = get_request_histograms()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            {url_name: (histogram['count'], histogram['queries']) for url_name, histogram in histograms.items()},
+            {'employees:task-list': (1, 1), 'employees:employee-list': (1, 2)}
+        )
+
+    @override_settings(QUERY_PROFILING_ENABLED=True, QUERY_PROFILING_DUPLICATE_THRESHOLD=0)
+    def test_duplicate_queries_warning(self):
+        """Тест на предупреждение в логе о повторяющихся запросах к БД."""
+        # Arrange(подготавливаю данные для теста)
+        employee = Employee.objects.create(full_name='test_2', post='test_2')
+        url = reverse('employees:task-update', args=(Task.objects.get().pk,))
+
+        # Act(совершаю действие которое тестирую)
+        # При смене исполнителя счётчики задач двух сотрудников обновляются одинаковыми запросами
+        with self.assertLogs('employees.middleware', 'WARNING') as logs:
+            self.client.patch(url, {'employee': employee.pk})
+
+        # Assert(делаю проверки)
+        self.assertIn(
+            'повторяющихся запросов', logs.output[0]
+        )
+
+    def test_profiling_disabled(self):
+        """Тест на то, что без настройки QUERY_PROFILING_ENABLED заголовок не добавляется."""
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(reverse('employees:task-list'))
+
+        # Assert(делаю проверки)
+        self.assertNotIn(
+            'Server-Timing', response
+        )
+
+
+class BenchmarkTestCase(APITestCase):
+    """Тесты для генератора синтетических данных и замера эндпоинтов."""
+    def test_seed_synthetic(self):
+        """Тест на создание синтетических сотрудников и задач с верными счётчиками задач."""
+        # Act(совершаю действие которое тестирую)
+        call_command('seed_synthetic', employees=3, tasks=20, fan_out=2, unassigned_every=5, stdout=StringIO())
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (Employee.objects.count(), Task.objects.count(), Task.objects.filter(employee=None).count()), (3, 20, 4)
+        )
+        self.assertEqual(
+            sum(Employee.objects.values_list('task_count', flat=True)), 16
+        )
+        self.assertEqual(
+            EmployeeWorkload.objects.count(), 3
+        )
+
+    def test_benchmark_endpoints(self):
+        """Тест на то, что замер проходит по всем урлам, сохраняет JSON и находит ухудшения относительно базового."""
+        # Arrange(подготавливаю данные для теста)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'benchmark.json')
+        baseline = os.path.join(directory, 'baseline.json')
+
+        # Act(совершаю действие которое тестирую)
+        call_command('benchmark_endpoints', scales=[30], repeat=2, output=output, stdout=StringIO())
+
+        # Assert(делаю проверки)
+        with open(output, encoding='utf-8') as file:
+            results = json.load(file)
+        cases = results['scales']['30']
+        self.assertEqual(
+            set(cases) - {'assignment:assign_important_tasks'},
+            {f'employees:{pattern.name}' for pattern in employees_urls.urlpatterns} - {'employees:task-events'}
+        )
+        self.assertEqual(
+            cases['employees:task-list']['queries'], 1
+        )
+        self.assertFalse(
+            Task.objects.exists()
+        )
+
+        # Базовый результат с меньшим количеством запросов - текущий результат считается ухудшением
+        cases['employees:task-list']['queries'] = 0
+        with open(baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file)
+        with self.assertRaisesMessage(CommandError, 'employees:task-list: запросов 0 -> 1'):
+            call_command('benchmark_endpoints', scales=[30], repeat=2, baseline=baseline, stdout=StringIO())
+
+
+class ReplicaRoutingTestCase(APITestCase):
+    """Тесты для чтения из реплик."""
+    def setUp(self):
+        """Создаю пользователя для тестов."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1')
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_router(self):
+        """Тест на то, что роутер отправляет на реплику только разрешённое чтение."""
+        # Arrange(подготавливаю данные для теста)
+        router = ReplicaRouter()
+
+        # Act(совершаю действие которое тестирую)
+        with allow_replica():
+            replica_read, replica_write = router.db_for_read(Task), router.db_for_write(Task)
+        read = router.db_for_read(Task)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (replica_read, replica_write, read), ('replica_1', 'default', 'default')
+        )
+
+    # Реплику заменяет основная БД, поэтому запросы выполняются, а выбор реплики виден по вызовам random.choice
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_read_your_writes(self):
+        """Тест на то, что после записи клиент читает из основной БД."""
+        # Arrange(подготавливаю данные для теста)
+        list_url = reverse('employees:employee-list')
+        update_url = reverse('employees:employee-update', args=(self.employee.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        with patch('employees.routers.random.choice', return_value='default') as choice:
+            self.client.get(list_url)
+            replica_reads = choice.call_count
+            response = self.client.patch(update_url, {'post': 'test_2'})
+            choice.reset_mock()
+            list_response = self.client.get(list_url)
+
+        # Assert(делаю проверки)
+        self.assertGreater(
+            replica_reads, 0
+        )
+        self.assertIn(
+            PRIMARY_COOKIE, response.cookies
+        )
+        self.assertEqual(
+            choice.call_count, 0
+        )
+        self.assertEqual(
+            list_response.json()['results'][0]['post'], 'test_2'
+        )
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_changes_read_from_primary(self):
+        """Тест на то, что лента изменений не читает из реплики, а список читает."""
+        # Act(совершаю действие которое тестирую)
+        with patch('employees.routers.random.choice', return_value='default') as choice:
+            self.client.get(reverse('employees:changes'), {'since': 0})
+            changes_reads = choice.call_count
+            self.client.get(reverse('employees:employee-list'))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            changes_reads, 0
+        )
+        self.assertGreater(
+            choice.call_count, 0
+        )
+
+
+class AsyncViewsTestCase(APITestCase):
+    """Тесты для асинхронных вьюх чтения."""
+    def setUp(self):
+        """Создаю 2 пользователя, важную задачу и её дочерние задачи."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1', task_count=2)
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2', task_count=0)
+        self.task = Task.objects.create(title='test_1', date='2024-02-02')
+        for number in range(2):
+            Task.objects.create(title=f'test_{number + 2}', parent_task=self.task, employee=self.employee_1,
+                                date='2024-02-02')
+
+    def get_async(self, view_class, path, **kwargs):
+        """Вызывает асинхронную вьюху и возвращает (код ответа, тело ответа)."""
+        async def call():
+            response = await view_class.as_view()(AsyncRequestFactory().get(path), **kwargs)
+            if not response.streaming:
+                return response.status_code, response.content
+            return response.status_code, b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(call)()
+
+    def test_same_response(self):
+        """Тест на то, что асинхронные вьюхи отвечают так же, как обычные, при любом режиме пагинации."""
+        # Arrange(подготавливаю данные для теста)
+        cases = [
+            (AsyncEmployeeListView, reverse('employees:employee-list'), {}),
+            (AsyncTaskListView, reverse('employees:task-list') + '?page_size=2', {}),
+            (AsyncTaskListView, reverse('employees:task-list') + '?limit=2&offset=1', {}),
+            (AsyncImportantTasksListView, reverse('employees:important_tasks-list'), {}),
+            (AsyncTaskRetrieveView, reverse('employees:task-retrieve', args=(self.task.pk,)), {'pk': self.task.pk}),
+            (AsyncTaskRetrieveView, reverse('employees:task-retrieve', args=(0,)), {'pk': 0}),
+        ]
+
+        for mode in ('cursor', 'limit_offset', 'none'):
+            with self.subTest(mode=mode), override_settings(PAGINATION_MODE=mode, RESPONSE_CACHE_ENABLED=False):
+                for view_class, path, kwargs in cases:
+                    # Act(совершаю действие которое тестирую)
+                    response = self.client.get(path)
+                    result = self.get_async(view_class, path, **kwargs)
+
+                    # Assert(делаю проверки)
+                    self.assertEqual(
+                        result, (response.status_code, response.content)
+                    )
+
+    def test_invalid_cursor(self):
+        """Тест на то, что неверный курсор даёт ошибку 404, как и в обычной вьюхе."""
+        # Arrange(подготавливаю данные для теста)
+        path = reverse('employees:task-list') + '?cursor=invalid'
+
+        # Act(совершаю действие которое тестирую)
+        status_code, content = self.get_async(AsyncTaskListView, path)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (status_code, json.loads(content)), (status.HTTP_404_NOT_FOUND, {'detail': 'Неверный курсор.'})
+        )
+
+    def test_permissions(self):
+        """Тест на то, что асинхронные вьюхи проверяют аутентификацию и права так же, как обычные."""
+        # Arrange(подготавливаю данные для теста)
+        path = reverse('employees:employee-list')
+
+        with patch.object(APIView, 'permission_classes', [IsAuthenticated]):
+            # Act(совершаю действие которое тестирую)
+            response = self.client.get(path)
+            result = self.get_async(AsyncEmployeeListView, path)
+            events_status, _ = self.get_async(TaskEventsView, reverse('employees:task-events') + '?task=1')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            result, (status.HTTP_403_FORBIDDEN, response.content)
+        )
+        self.assertEqual(
+            events_status, status.HTTP_403_FORBIDDEN
+        )
+
+    # Тесты выполняются в одном процессе, поэтому кэш в памяти для них общий
+    @override_settings(SHARED_CACHE=True, RESPONSE_CACHE_ENABLED=True)
+    def test_response_cache(self):
+        """Тест на то, что асинхронный список сохраняет ответ в общий с обычной вьюхой кэш и отдаёт его оттуда."""
+        # Arrange(подготавливаю данные для теста)
+        cache.clear()
+        path = reverse('employees:employee-list')
+
+        # Act(совершаю действие которое тестирую)
+        first = self.get_async(AsyncEmployeeListView, path)
+        second = self.get_async(AsyncEmployeeListView, path)
+        response = self.client.get(path)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            get_response_cache_stats(), {'hits': 2, 'misses': 1}
+        )
+        self.assertEqual(
+            [first, second], [(status.HTTP_200_OK, response.content)] * 2
+        )
+
+
+class ValuesSerializerTestCase(APITestCase):
+    """Тесты для быстрого сериализатора списков."""
+    def setUp(self):
+        """Создаю пользователя, задачу с исполнителем и её дочернюю задачу без исполнителя."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1')
+        self.task = Task.objects.create(title='test_1', employee=self.employee, date='2024-02-02')
+        Task.objects.create(title='test_2', parent_task=self.task, date='2024-02-03', status=True)
+
+    def test_same_data(self):
+        """Тест на то, что результат совпадает с результатом ModelSerializer."""
+        # Arrange(подготавливаю данные для теста)
+        serializer = ValuesSerializer(TaskSerializer)
+        queryset = Task.objects.order_by('pk')
+
+        # Act(совершаю действие которое тестирую)
+        data = serializer.to_representation(serializer.get_queryset(queryset))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            json.dumps(data), json.dumps(TaskSerializer(queryset, many=True).data)
+        )
+
+    def test_unsupported_field(self):
+        """Тест на то, что сериализатор с SerializerMethodField не поддерживается."""
+        # Act(совершаю действие которое тестирую) и Assert(делаю проверки)
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(EmployeeWithTaskSerializer)
+
+
+class ListFilterTestCase(APITestCase):
+    """Тесты для фильтров и поиска в списках задач и сотрудников."""
+    def setUp(self):
+        """Создаю 2 пользователя и задачи: выполненную, просроченную с дочерней задачей и задачу на будущее."""
+        self.employee_1 = Employee.objects.create(full_name='Ivanov Ivan', post='developer', task_count=2)
+        self.employee_2 = Employee.objects.create(full_name='Petrov Petr', post='manager', task_count=1)
+        self.task_1 = Task.objects.create(title='Annual report', employee=self.employee_1, date='2024-02-02')
+        self.task_2 = Task.objects.create(title='Report review', parent_task=self.task_1, employee=self.employee_1,
+                                          date='2100-01-01')
+        self.task_3 = Task.objects.create(title='Purchase', employee=self.employee_2, date='2024-03-01', status=True)
+
+    def get_ids(self, url, query):
+        response = self.client.get(url, query)
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK
+        )
+        return [item['id'] for item in response.json()['results']]
+
+    def test_task_filters(self):
+        """Тест на фильтрацию списка задач."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-list')
+        cases = [
+            ({'employee': self.employee_1.pk}, [self.task_1.pk, self.task_2.pk]),
+            ({'employee__isnull': True}, []),
+            ({'parent_task': self.task_1.pk}, [self.task_2.pk]),
+            ({'status': True}, [self.task_3.pk]),
+            ({'date__gte': '2024-02-03', 'date__lte': '2024-12-31'}, [self.task_3.pk]),
+            ({'has_children': True}, [self.task_1.pk]),
+            ({'has_children': False}, [self.task_2.pk, self.task_3.pk]),
+            ({'overdue': True}, [self.task_1.pk]),
+            ({'overdue': False}, [self.task_2.pk, self.task_3.pk]),
+            ({'search': 'REPORT'}, [self.task_1.pk, self.task_2.pk]),
+        ]
+
+        for query, expected in cases:
+            with self.subTest(query=query):
+                # Act(совершаю действие которое тестирую) и Assert(делаю проверки)
+                self.assertEqual(
+                    self.get_ids(url, query), expected
+                )
+
+    def test_employee_filters(self):
+        """Тест на фильтрацию списка сотрудников."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee-list')
+        cases = [
+            ({'post': 'manager'}, [self.employee_2.pk]),
+            ({'task_count__gte': 2}, [self.employee_1.pk]),
+            ({'task_count__lte': 1}, [self.employee_2.pk]),
+            ({'search': 'petrov'}, [self.employee_2.pk]),
+        ]
+
+        for query, expected in cases:
+            with self.subTest(query=query):
+                # Act(совершаю действие которое тестирую) и Assert(делаю проверки)
+                self.assertEqual(
+                    self.get_ids(url, query), expected
+                )
+
+
+class ChangeFeedTestCase(APITestCase):
+    """Тесты для журнала изменений задач и сотрудников."""
+    def setUp(self):
+        """Создаю пользователя с задачей и запоминаю номер последнего изменения."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1')
+        self.task = Task.objects.create(title='test_1', employee=self.employee, date='2024-02-02')
+        self.url = reverse('employees:changes')
+        self.since = self.client.get(self.url).json()['since']
+
+    def test_changes(self):
+        """Тест на то, что выводятся созданные, изменённые и удалённые объекты, каждый один раз."""
+        # Arrange(подготавливаю данные для теста)
+        response = self.client.post(reverse('employees:task-create'),
+                                    {'title': 'test_2', 'employee': self.employee.pk, 'date': '2024-02-02'})
+        task_id = response.json()['id']
+        self.client.patch(reverse('employees:task-update', args=(task_id,)), {'title': 'test_3'})
+        self.client.delete(reverse('employees:employee-destroy', args=(self.employee.pk,)))
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(self.url, {'since': self.since})
+        next_response = self.client.get(self.url, {'since': response.json()['since']})
+
+        # Assert(делаю проверки)
+        changes = {(item['model'], item['id']): (item['action'], item['data']) for item in response.json()['results']}
+        self.assertEqual(
+            changes, {
+                ('task', task_id): ('create', {'id': task_id, 'title': 'test_3', 'date': '2024-02-02',
+                                               'status': False, 'parent_task': None, 'employee': None}),
+                ('task', self.task.pk): ('update', {'id': self.task.pk, 'title': 'test_1', 'date': '2024-02-02',
+                                                    'status': False, 'parent_task': None, 'employee': None}),
+                ('employee', self.employee.pk): ('delete', None),
+            }
+        )
+        self.assertEqual(
+            (next_response.json()['results'], next_response.json()['has_more']), ([], False)
+        )
+
+    def test_batches(self):
+        """Тест на то, что изменения выводятся пачками не больше limit."""
+        # Arrange(подготавливаю данные для теста)
+        for number in range(3):
+            Employee.objects.create(full_name=f'test_{number + 2}', post='test')
+
+        # Act(совершаю действие которое тестирую)
+        first = self.client.get(self.url, {'since': self.since, 'limit': 2}).json()
+        second = self.client.get(self.url, {'since': first['since'], 'limit': 2}).json()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (len(first['results']), first['has_more'], len(second['results']), second['has_more']), (2, True, 1, False)
+        )
+
+    def test_pruned(self):
+        """Тест на то, что после удаления старых записей журнала клиенту с устаревшим номером нужна полная загрузка."""
+        # Arrange(подготавливаю данные для теста)
+        Employee.objects.create(full_name='test_2', post='test')
+        Employee.objects.create(full_name='test_3', post='test')
+        self.client.get(self.url)
+        prune_changes(retention_days=-1)
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(self.url, {'since': self.since})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_410_GONE
+        )
+
+    def test_invalid_params(self):
+        """Тест на ответ 400 для отрицательного since и нулевого limit."""
+        # Act(совершаю действие которое тестирую)
+        negative = self.client.get(self.url, {'since': -1})
+        zero_limit = self.client.get(self.url, {'since': self.since, 'limit': 0})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (negative.status_code, zero_limit.status_code), (status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST)
+        )
+        self.assertEqual(
+            (list(negative.json()), list(zero_limit.json())), (['since'], ['limit'])
+        )
+
+
+class TaskEventsTestCase(APITestCase):
+    """Тесты для потока событий задач."""
+    def setUp(self):
+        """Создаю 2 пользователя, задачу и её дочернюю задачу без исполнителя."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1')
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2')
+        self.task = Task.objects.create(title='test_1', date='2024-02-02')
+        self.child = Task.objects.create(title='test_2', parent_task=self.task, date='2024-02-02')
+
+    def update_task(self, data):
+        """Изменяет дочернюю задачу через API и выполняет отложенную до фиксации транзакции публикацию событий."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('employees:task-update', args=(self.child.pk,)), data)
+
+    def get_events(self, queries, data):
+        """Подписывается на события с параметрами из queries, изменяет дочернюю задачу и возвращает по каждой подписке
+        первое событие после ready или None, если событий нет."""
+        async def read(stream):
+            try:
+                chunk = await asyncio.wait_for(anext(stream), 0.5)
+            except asyncio.TimeoutError:
+                return None
+            name, payload = chunk.decode().split('\n')[:2]
+            return name.removeprefix('event: '), json.loads(payload.removeprefix('data: '))
+
+        async def call():
+            streams = []
+            for query in queries:
+                response = await TaskEventsView.as_view()(AsyncRequestFactory().get('/task_events/', query))
+                streams.append(response.streaming_content)
+                await anext(streams[-1])
+            await sync_to_async(self.update_task)(data)
+            return [await read(stream) for stream in streams]
+        return async_to_sync(call)()
+
+    def test_assign(self):
+        """Тест на то, что назначение задачи получают подписчики исполнителя и родительской задачи, но не другого
+        сотрудника."""
+        # Arrange(подготавливаю данные для теста)
+        queries = [{'employee': self.employee_1.pk}, {'task': self.task.pk}, {'employee': self.employee_2.pk}]
+        task = {'id': self.child.pk, 'title': 'test_2', 'date': '2024-02-02', 'status': False,
+                'parent_task': self.task.pk, 'employee': self.employee_1.pk}
+        event = ('task', {'type': 'assign', 'task': task, 'previous_employee': None})
+
+        # Act(совершаю действие которое тестирую)
+        result = self.get_events(queries, {'employee': self.employee_1.pk})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            result, [event, event, None]
+        )
+
+    def test_complete(self):
+        """Тест на то, что выполнение задачи приходит событием complete."""
+        # Arrange(подготавливаю данные для теста)
+        self.child.employee = self.employee_1
+        self.child.save()
+
+        # Act(совершаю действие которое тестирую)
+        result = self.get_events([{'employee': f'{self.employee_2.pk},{self.employee_1.pk}'}], {'status': True})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (result[0][1]['type'], result[0][1]['task']['id']), ('complete', self.child.pk)
+        )
+
+    def test_invalid_query(self):
+        """Тест на то, что без подписок или с неверным pk поток не открывается."""
+        # Arrange(подготавливаю данные для теста)
+        queries = [{}, {'employee': 'test'}, {'task': ','.join(['1'] * 101)}]
+
+        # Act(совершаю действие которое тестирую)
+        result = [
+            async_to_sync(TaskEventsView.as_view())(AsyncRequestFactory().get('/task_events/', query)).status_code
+            for query in queries
+        ]
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            result, [status.HTTP_400_BAD_REQUEST] * 3
+        )
+
+    def test_slow_subscriber(self):
+        """Тест на то, что медленный подписчик вместо переполнения очереди получает reset."""
+        # Arrange(подготавливаю данные для теста)
+        subscription = Subscription(['employee:1'], size=2)
+
+        # Act(совершаю действие которое тестирую)
+        for number in range(3):
+            subscription.put(b'event %d' % number)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())], [RESET]
+        )
+
+
+class TaskBulkUpdateTestCase(APITestCase):
+    """Тесты для массового изменения и выполнения задач."""
+    def setUp(self):
+        """Создаю 2 пользователя, у первого 2 задачи, у одной из них есть дочерняя задача без исполнителя."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1', task_count=2)
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2', task_count=0)
+        self.task_1 = Task.objects.create(title='test_1', employee=self.employee_1, date='2024-02-02')
+        self.task_2 = Task.objects.create(title='test_2', employee=self.employee_1, date='2024-02-02')
+        self.child = Task.objects.create(title='test_3', parent_task=self.task_1, date='2024-02-02')
+        self.url = reverse('employees:task-bulk-update')
+
+    def get_results(self, response):
+        return {item['id']: item['result'] for item in response.json()['results']}
+
+    def test_update(self):
+        """Тест на то, что задачи переходят к другому сотруднику, а количество задач сотрудников пересчитывается."""
+        # Arrange(подготавливаю данные для теста)
+        missing_id = self.child.pk + 1
+        ids = [self.task_1.pk, self.task_2.pk, self.child.pk, missing_id]
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(self.url, {'ids': ids, 'patch': {'employee': self.employee_2.pk}}, format='json')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            self.get_results(response), {self.task_1.pk: 'updated', self.task_2.pk: 'updated',
+                                         self.child.pk: 'updated', missing_id: 'not_found'}
+        )
+        self.assertEqual(
+            list(Employee.objects.order_by('pk').values_list('task_count', flat=True)), [0, 3]
+        )
+        self.assertEqual(
+            set(Task.objects.values_list('employee', flat=True)), {self.employee_2.pk}
+        )
+
+    def test_same_queries(self):
+        """Тест на то, что количество запросов не зависит от количества задач."""
+        # Arrange(подготавливаю данные для теста)
+        patch = {'date': '2030-01-01', 'employee': self.employee_2.pk}
+
+        # Act(совершаю действие которое тестирую)
+        with CaptureQueriesContext(connection) as one:
+            self.client.post(self.url, {'ids': [self.task_1.pk], 'patch': patch}, format='json')
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(self.url, {'ids': [self.task_2.pk, self.child.pk], 'patch': patch}, format='json')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            len(many), len(one)
+        )
+
+    def test_invalid_parent(self):
+        """Тест на то, что задача не становится зависимой от своей дочерней задачи, а остальные задачи меняются."""
+        # Arrange(подготавливаю данные для теста)
+        data = {'ids': [self.task_1.pk, self.task_2.pk], 'patch': {'parent_task': self.child.pk}}
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(self.url, data, format='json')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            self.get_results(response), {self.task_1.pk: 'invalid', self.task_2.pk: 'updated'}
+        )
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('parent_task', flat=True)),
+            [None, self.child.pk, self.task_1.pk]
+        )
+
+    def test_complete(self):
+        """Тест на то, что задачи становятся выполненными и вычёркиваются из количества задач сотрудника."""
+        # Arrange(подготавливаю данные для теста)
+        data = {'ids': [self.task_1.pk, self.task_2.pk], 'patch': {'status': True}}
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(self.url, data, format='json')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            self.get_results(response), {self.task_1.pk: 'completed', self.task_2.pk: 'completed'}
+        )
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('status', flat=True)), [True, True, False]
+        )
+        self.assertEqual(
+            Employee.objects.get(pk=self.employee_1.pk).task_count, 0
+        )
+
+    def test_empty_patch(self):
+        """Тест на то, что изменение без полей не принимается."""
+        # Arrange(подготавливаю данные для теста)
+        data = {'ids': [self.task_1.pk], 'patch': {}}
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(self.url, data, format='json')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_mixed_patch(self):
+        """Тест на то, что выполнение задач вместе с изменением других полей отклоняется, а задачи не меняются."""
+        # Arrange(подготавливаю данные для теста)
+        payloads = [
+            {'ids': [self.child.pk], 'patch': {'status': True, 'employee': self.employee_2.pk}},
+            {'ids': [self.child.pk], 'action': 'complete', 'patch': {'employee': self.employee_2.pk}},
+        ]
+
+        for data in payloads:
+            with self.subTest(data=data):
+                # Act(совершаю действие которое тестирую)
+                response = self.client.post(self.url, data, format='json')
+
+                # Assert(делаю проверки)
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertEqual(
+                    Task.objects.filter(pk=self.child.pk).values_list('status', 'employee').get(), (False, None)
+                )
+
+
+class TaskArchiveTestCase(APITestCase):
+    """Тесты для выполнения задач без удаления и архива выполненных задач."""
+    def setUp(self):
+        """Создаю пользователя с 2 задачами, у первой есть дочерняя задача без исполнителя."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1', task_count=2)
+        self.task_1 = Task.objects.create(title='test_1', employee=self.employee, date='2024-02-02')
+        self.task_2 = Task.objects.create(title='test_2', employee=self.employee, date='2024-02-02')
+        self.child = Task.objects.create(title='test_3', parent_task=self.task_1, date='2024-02-02')
+
+    def complete(self, task):
+        return self.client.patch(reverse('employees:task-update', args=(task.pk,)), {'status': True})
+
+    def test_complete(self):
+        """Тест на то, что выполненная задача остаётся в таблице задач и вычёркивается из числа задач сотрудника."""
+        # Act(совершаю действие которое тестирую)
+        response = self.complete(self.task_2)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (response.status_code, response.json()['status']), (status.HTTP_200_OK, True)
+        )
+        self.assertEqual(
+            Employee.objects.get(pk=self.employee.pk).task_count, 1
+        )
+
+    def test_employee_with_task_list(self):
+        """Тест на то, что выполненная задача пропадает из списка задач сотрудника, как и из их количества."""
+        # Arrange(подготавливаю данные для теста)
+        self.complete(self.task_2)
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(reverse('employees:employee_with_task-list'))
+        serialized = EmployeeWithTaskSerializer(Employee.objects.get(pk=self.employee.pk)).data
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            [(item['task'], item['task_count']) for item in response.json()['results']], [([self.task_1.pk], 1)]
+        )
+        self.assertEqual(
+            serialized['task'], [self.task_1.pk]
+        )
+
+    def test_important_tasks(self):
+        """Тест на то, что задача с выполненной дочерней задачей не считается важной."""
+        # Arrange(подготавливаю данные для теста)
+        self.complete(self.child)
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(reverse('employees:important_tasks-list'))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.json()['results'], []
+        )
+
+    def test_archive(self):
+        """Тест на то, что выполненные задачи переносятся в архив пачками, а загруженность сотрудника не меняется."""
+        # Arrange(подготавливаю данные для теста)
+        self.complete(self.task_1)
+        self.complete(self.task_2)
+        AssignmentQueue.objects.get_or_create(task=self.task_2)
+
+        # Act(совершаю действие которое тестирую)
+        call_command('archive_tasks', batch_size=1, stdout=StringIO())
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            list(Task.objects.values_list('pk', 'parent_task')), [(self.child.pk, None)]
+        )
+        self.assertEqual(
+            list(TaskArchive.objects.order_by('pk').values_list('pk', 'employee')),
+            [(self.task_1.pk, self.employee.pk), (self.task_2.pk, self.employee.pk)]
+        )
+        self.assertEqual(
+            EmployeeWorkload.objects.get(employee=self.employee).completed_count, 2
+        )
+        self.assertFalse(
+            AssignmentQueue.objects.exists()
+        )
+
+    def test_history(self):
+        """Тест на то, что история выводит архив от новых задач к старым с курсорной пагинацией."""
+        # Arrange(подготавливаю данные для теста)
+        for task in (self.task_1, self.task_2, self.child):
+            self.complete(task)
+        call_command('archive_tasks', stdout=StringIO())
+        url = reverse('employees:task-history')
+
+        # Act(совершаю действие которое тестирую)
+        first_page = self.client.get(url, {'page_size': 2}).json()
+        second_page = self.client.get(first_page['next']).json()
+        by_employee = self.client.get(url, {'employee': self.employee.pk}).json()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            [item['id'] for item in first_page['results'] + second_page['results']],
+            [self.child.pk, self.task_2.pk, self.task_1.pk]
+        )
+        self.assertEqual(
+            second_page['next'], None
+        )
+        self.assertEqual(
+            [item['id'] for item in by_employee['results']], [self.task_2.pk, self.task_1.pk]
+        )
+
+
+class TaskPartitionTestCase(TransactionTestCase):
+    """Тесты для секционирования таблицы задач по сроку."""
+    @skipIf(connection.vendor == 'postgresql', 'Проверяется отказ на других СУБД')
+    def test_requires_postgresql(self):
+        """Тест на то, что команда секционирования отказывается работать не в PostgreSQL."""
+        # Act(совершаю действие которое тестирую) / Assert(делаю проверки)
+        with self.assertRaises(CommandError):
+            call_command('partition_tasks', 'convert', stdout=StringIO())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Секционирование поддерживается только в PostgreSQL')
+    def test_convert_create_and_archive(self):
+        """Тест на то, что после секционирования API работает как раньше, будущие секции создаются с переносом задач
+        из секции по умолчанию, а старые секции архивируются и удаляются."""
+        # Arrange(подготавливаю данные для теста)
+        current = datetime.date.today().replace(day=1)
+        old, older = add_months(current, -3), add_months(current, -4)
+        employee = Employee.objects.create(full_name='test_1', post='test_1')
+        completed = Task.objects.create(title='old', employee=employee, date=old, status=True)
+        in_progress = Task.objects.create(title='older', employee=employee, date=older)
+        parent = Task.objects.create(title='parent', employee=employee, date=current)
+        child = Task.objects.create(title='child', parent_task=parent, date=current)
+
+        # Act(совершаю действие которое тестирую)
+        convert_to_partitioned(months_back=12, months_ahead=1)
+        retrieved = self.client.get(reverse('employees:task-retrieve', args=(child.pk,)))
+        created = self.client.post(reverse('employees:task-create'),
+                                   {'title': 'future', 'employee': employee.pk, 'date': add_months(current, 3)})
+        created_partitions = create_future_partitions(3)
+        dropped, kept = archive_old_partitions(2)
+
+        # Assert(делаю проверки)
+        self.assertTrue(is_partitioned())
+        self.assertEqual(
+            retrieved.json()['parent_task'], parent.pk
+        )
+        self.assertEqual(
+            created.status_code, status.HTTP_201_CREATED
+        )
+        self.assertGreater(created.json()['id'], child.pk)
+        self.assertEqual(
+            created_partitions, [get_partition_name(add_months(current, 2)), get_partition_name(add_months(current, 3))]
+        )
+        self.assertEqual(
+            self.client.get(reverse('employees:task-retrieve', args=(created.json()['id'],))).status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            (dropped, kept), ([get_partition_name(old)], [get_partition_name(older)])
+        )
+        self.assertNotIn(get_partition_name(old), [name for name, _ in get_partitions()])
+        self.assertTrue(TaskArchive.objects.filter(pk=completed.pk).exists())
+        self.assertTrue(Task.objects.filter(pk=in_progress.pk).exists())
+
+
+class PaginationTestCase(APITestCase):
+    """Тесты для пагинации списков."""
+    def setUp(self):
+        """Создаю 5 пользователей с разным количеством задач."""
+        self.employees = [
+            Employee.objects.create(full_name=f'test_{number}', post='test', task_count=task_count)
+            for number, task_count in enumerate((3, 1, 1, 2, 1))
+        ]
+
+    def walk(self, url):
+        """Проходит по всем страницам списка и возвращает pk из всех страниц."""
+        pks = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(
+                response.status_code, status.HTTP_200_OK
+            )
+            data = response.json()
+            pks.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return pks
+
+    def test_cursor_pagination(self):
+        """Тест на обход всех страниц списка сотрудников по курсору."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee-list') + '?page_size=2'
+
+        # Act(совершаю действие которое тестирую)
+        pks = self.walk(url)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            pks, sorted(employee.pk for employee in self.employees)
+        )
+
+    def test_cursor_pagination_with_ordering(self):
+        """Тест на обход по курсору списка, отсортированного по количеству задач, с повторяющимися значениями."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee_with_task-list') + '?page_size=2&ordering=-task_count'
+
+        # Act(совершаю действие которое тестирую)
+        pks = self.walk(url)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            pks, [employee.pk for employee in sorted(self.employees, key=lambda e: (e.task_count, e.pk),
+                                                     reverse=True)]
+        )
+
+    @override_settings(PAGINATION_MODE='limit_offset')
+    def test_limit_offset_pagination(self):
+        """Тест на пагинацию через limit и offset."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee-list') + '?limit=2&offset=2'
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(url)
+        data = response.json()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            data['count'], 5
+        )
+        self.assertEqual(
+            [item['id'] for item in data['results']], [employee.pk for employee in self.employees[2:4]]
+        )
+
+
+class TaskCountTestCase(APITestCase):
+    """Тесты для счётчиков задач сотрудников."""
+    def setUp(self):
+        """Создаю 2 пользователя и задачу для тестов."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1', task_count=1)
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2')
+        self.task = Task.objects.create(title='test_1', employee=self.employee_1, date='2024-02-02')
+
+    def test_task_update_employee(self):
+        """Тест на перенос задачи из общего числа задач прежнего сотрудника новому при смене исполнителя."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-update', args=(self.task.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.patch(url, {'employee': self.employee_2.pk})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            dict(Employee.objects.values_list('pk', 'task_count')),
+            {self.employee_1.pk: 0, self.employee_2.pk: 1}
+        )
+
+    def test_task_complete(self):
+        """Тест на удаление выполненной задачи из общего числа задач сотрудника."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-update', args=(self.task.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        self.client.patch(url, {'status': True})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            Employee.objects.get(pk=self.employee_1.pk).task_count, 0
+        )
+
+    def test_reconcile_task_counts(self):
+        """Тест на пересчёт разошедшихся счётчиков задач."""
+        # Arrange(подготавливаю данные для теста)
+        Employee.objects.filter(pk=self.employee_1.pk).update(task_count=5)
+        Employee.objects.filter(pk=self.employee_2.pk).update(task_count=3)
+
+        # Act(совершаю действие которое тестирую)
+        call_command('reconcile_task_counts', stdout=StringIO())
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            dict(Employee.objects.values_list('pk', 'task_count')),
+            {self.employee_1.pk: 1, self.employee_2.pk: 0}
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Параллельные транзакции проверяются только на PostgreSQL')
+class TaskCountConcurrencyTestCase(TransactionTestCase):
+    """Нагрузочный тест счётчика задач при параллельном создании и удалении задач."""
+    def test_parallel_create_and_delete(self):
+        """Тест на то, что при параллельных запросах счётчик совпадает с реальным количеством задач."""
+        # Arrange(подготавливаю данные для теста)
+        employee = Employee.objects.create(full_name='test_1', post='test_1')
+        tasks = [Task.objects.create(title=f'test_{number}', employee=employee, date='2024-02-02')
+                 for number in range(20)]
+        Employee.objects.filter(pk=employee.pk).update(task_count=len(tasks))
+
+        def create_task(number):
+            try:
+                APIClient().post(reverse('employees:task-create'),
+                                 {'title': f'new_{number}', 'employee': employee.pk, 'date': '2024-02-02'})
+            finally:
+                connection.close()
+
+        def delete_task(task):
+            try:
+                APIClient().delete(reverse('employees:task-destroy', args=(task.pk,)))
+            finally:
+                connection.close()
+
+        # Act(совершаю действие которое тестирую)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(create_task, number) for number in range(40)]
+            futures += [executor.submit(delete_task, task) for task in tasks]
+            for future in futures:
+                future.result()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            Employee.objects.get(pk=employee.pk).task_count, 40
+        )
+        self.assertEqual(
+            Task.objects.filter(employee=employee).count(), 40
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Параллельные транзакции проверяются только на PostgreSQL')
+class ChangeSequenceConcurrencyTestCase(TransactionTestCase):
+    """Нагрузочный тест нумерации журнала изменений при параллельных запросах к /changes/."""
+    def test_parallel_sequencing(self):
+        """Тест на то, что параллельные запросы выдают записям журнала разные номера без пропусков."""
+        # Arrange(подготавливаю данные для теста)
+        for number in range(50):
+            Employee.objects.create(full_name=f'test_{number}', post='test')
+
+        def get_changes(number):
+            try:
+                return APIClient().get(reverse('employees:changes'), {'since': 0, 'limit': 1 + number % 3}).status_code
+            finally:
+                connection.close()
+
+        # Act(совершаю действие которое тестирую)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(get_changes, range(40)))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            set(statuses), {status.HTTP_200_OK}
+        )
+        self.assertEqual(
+            sorted(ChangeLog.objects.exclude(seq=None).values_list('seq', flat=True)),
+            list(range(1, ChangeLog.objects.exclude(seq=None).count() + 1))
+        )
+
+
+class TaskImportExportTestCase(APITestCase):
+    """Тесты для массовой загрузки и выгрузки задач."""
+    def setUp(self):
+        """Создаю пользователя и задачу для тестов."""
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1', task_count=1)
+        self.task = Task.objects.create(title='test_1', employee=self.employee, date='2024-02-02')
+
+    def test_task_import_json_lines(self):
+        """Тест на создание задач из JSON Lines со ссылками на родительские задачи из этого же файла."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-import') + '?chunk_size=2'
+        lines = [
+            {'ref': 'child', 'parent_ref': 'root', 'title': 'test_2', 'date': '2024-02-02',
+             'employee': self.employee.pk},
+            {'ref': 'root', 'title': 'test_3', 'date': '2024-02-02', 'parent_task': self.task.pk},
+            {'parent_ref': 'child', 'title': 'test_4', 'date': '2024-02-02', 'employee': self.employee.pk},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines)
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            response.json(), {'created': 3}
+        )
+        root = Task.objects.get(title='test_3')
+        child = Task.objects.get(title='test_2')
+        self.assertEqual(
+            (root.parent_task_id, child.parent_task_id, Task.objects.get(title='test_4').parent_task_id),
+            (self.task.pk, root.pk, child.pk)
+        )
+        self.assertEqual(
+            Employee.objects.get(pk=self.employee.pk).task_count, 3
+        )
+
+    def test_task_import_csv_error(self):
+        """Тест на то, что при ошибке в единственной пачке не создаётся ни одна задача."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-import')
+        body = 'title,date,employee\ntest_2,2024-02-02,\ntest_3,2024-02-02,100500\n'
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(url, body, content_type='text/csv')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            Task.objects.all().count(), 1
+        )
+
+    def test_task_import_commits_chunks(self):
+        """Тест на то, что при ошибке в пачке задачи из предыдущих пачек остаются, а ошибка сообщает их количество."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-import') + '?chunk_size=1'
+        body = f'title,date,employee\ntest_2,2024-02-02,{self.employee.pk}\ntest_3,2024-02-02,100500\n'
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.post(url, body, content_type='text/csv')
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (response.status_code, response.json()['detail']),
+            (status.HTTP_400_BAD_REQUEST,
+             'Несуществующие значения поля employee: [100500]. Задачи из предыдущих пачек созданы: 1.')
+        )
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('title', flat=True)), ['test_1', 'test_2']
+        )
+        self.assertEqual(
+            (Employee.objects.get(pk=self.employee.pk).task_count,
+             EmployeeWorkload.objects.get(employee=self.employee).active_count), (2, 2)
+        )
+
+    def test_task_export(self):
+        """Тест на выгрузку задач в CSV."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-export') + '?file_format=csv'
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(url)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            f'id,title,parent_task,employee,date,status\r\n{self.task.pk},test_1,,{self.employee.pk},2024-02-02,'
+            f'False\r\n'
+        )
+
+
+# Тесты выполняются в одном процессе, поэтому кэш в памяти для них общий
+@override_settings(SHARED_CACHE=True, RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTestCase(APITestCase):
+    """Тесты для кэширования ответов списков."""
+    def setUp(self):
+        """Очищаю кэш и создаю пользователя для тестов."""
+        cache.clear()
+        self.employee = Employee.objects.create(full_name='test_1', post='test_1')
+        self.url = reverse('employees:employee-list')
+
+    def test_cached_response(self):
+        """Тест на повторный ответ из кэша и ответ 304 для клиента, у которого уже есть актуальный ответ."""
+        # Act(совершаю действие которое тестирую)
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            (first['X-Cache'], second['X-Cache']), ('MISS', 'HIT')
+        )
+        self.assertEqual(
+            second.content, first.content
+        )
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            get_response_cache_stats(), {'hits': 2, 'misses': 1}
+        )
+
+    def test_invalidation_after_write(self):
+        """Тест на то, что после изменения данных через API ответ строится заново."""
+        # Arrange(подготавливаю данные для теста)
+        first = self.client.get(self.url)
+
+        # Act(совершаю действие которое тестирую)
+        self.client.patch(reverse('employees:employee-update', args=(self.employee.pk,)), {'full_name': 'test_new'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            response.json()['results'][0]['full_name'], 'test_new'
+        )
+
+
+class TaskGraphTestCase(APITestCase):
+    """Тесты для дерева зависимостей задач."""
+    def setUp(self):
+        """Создаю дерево задач: task_1 -> task_2 -> task_3 и task_1 -> task_4."""
+        self.task_1 = Task.objects.create(title='test_1', date='2024-02-02')
+        self.task_2 = Task.objects.create(title='test_2', parent_task=self.task_1, date='2024-02-02')
+        self.task_3 = Task.objects.create(title='test_3', parent_task=self.task_2, date='2024-02-02')
+        self.task_4 = Task.objects.create(title='test_4', parent_task=self.task_1, date='2024-02-02')
+
+    def test_task_subtree(self):
+        """Тест на вывод поддерева задачи одним запросом."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-subtree', args=(self.task_1.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        data = response.json()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            [(task['id'], task['depth']) for task in data['tasks']],
+            [(self.task_1.pk, 0), (self.task_2.pk, 1), (self.task_4.pk, 1), (self.task_3.pk, 2)]
+        )
+        self.assertEqual(
+            data['critical_path'], [self.task_1.pk, self.task_2.pk, self.task_3.pk]
+        )
+
+    def test_task_ancestors(self):
+        """Тест на вывод цепочки родительских задач одним запросом."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-ancestors', args=(self.task_3.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        data = response.json()
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            data['depth'], 2
+        )
+        self.assertEqual(
+            [task['id'] for task in data['tasks']], [self.task_2.pk, self.task_1.pk]
+        )
+
+    def test_task_graph_not_found(self):
+        """Тест на ответ 404 для несуществующей задачи."""
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(reverse('employees:task-ancestors', args=(100500,)))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_cycle_detection(self):
+        """Тест на поиск цикла в цепочке родительских задач."""
+        # Arrange(подготавливаю данные для теста)
+        Task.objects.filter(pk=self.task_1.pk).update(parent_task=self.task_3)
+
+        # Act(совершаю действие которое тестирую)
+        cycle = find_cycle(self.task_4.pk)
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            sorted(cycle), [self.task_1.pk, self.task_2.pk, self.task_3.pk]
+        )
+        self.assertEqual(
+            find_tasks_in_cycles(), [self.task_1.pk, self.task_2.pk, self.task_3.pk, self.task_4.pk]
+        )
+        self.assertEqual(
+            get_depth(self.task_2.pk), 2
+        )
+
+    def test_task_update_cycle(self):
+        """Тест на запрет сделать задачу зависимой от её же дочерней задачи."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:task-update', args=(self.task_1.pk,))
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.patch(url, {'parent_task': self.task_3.pk})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+
+class EmployeeWorkloadTestCase(APITestCase):
+    """Тесты для таблицы загруженности сотрудников."""
+    def setUp(self):
+        """Создаю 2 пользователя, просроченную задачу и задачу с будущим сроком."""
+        self.employee_1 = Employee.objects.create(full_name='test_1', post='test_1')
+        self.employee_2 = Employee.objects.create(full_name='test_2', post='test_2')
+        self.task_1 = Task.objects.create(title='test_1', employee=self.employee_1, date='2024-02-02')
+        self.task_2 = Task.objects.create(title='test_2', employee=self.employee_1, date='2999-02-02')
+
+    def get_workload(self, employee):
+        """Возвращает (в работе, просрочено, выполнено, ближайший срок) сотрудника."""
+        workload = EmployeeWorkload.objects.get(employee=employee)
+        return workload.active_count, workload.overdue_count, workload.completed_count, str(workload.next_due_date)
+
+    def test_incremental_refresh(self):
+        """Тест на пересчёт загруженности прежнего и нового исполнителя при изменении и удалении задач."""
+        # Act(совершаю действие которое тестирую)
+        self.client.patch(reverse('employees:task-update', args=(self.task_1.pk,)), {'employee': self.employee_2.pk})
+        self.client.delete(reverse('employees:task-destroy', args=(self.task_2.pk,)))
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            self.get_workload(self.employee_1), (0, 0, 0, 'None')
+        )
+        self.assertEqual(
+            self.get_workload(self.employee_2), (1, 1, 0, '2024-02-02')
+        )
+
+    def test_incremental_matches_rebuild(self):
+        """Тест на то, что изменения загруженности по дельтам совпадают с полной пересборкой."""
+        # Arrange(подготавливаю данные для теста)
+        task = Task.objects.get(pk=self.task_2.pk)
+
+        # Act(совершаю действие которое тестирую)
+        task.date = '2999-01-01'
+        task.save()
+        task.status = True
+        task.save()
+        self.task_1.employee = self.employee_2
+        self.task_1.save()
+        Task.objects.create(title='test_3', employee=self.employee_2, date='2025-01-01')
+        incremental = [self.get_workload(self.employee_1), self.get_workload(self.employee_2)]
+        call_command('rebuild_workload', stdout=StringIO())
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            incremental, [(0, 0, 1, 'None'), (2, 2, 0, '2024-02-02')]
+        )
+        self.assertEqual(
+            incremental, [self.get_workload(self.employee_1), self.get_workload(self.employee_2)]
+        )
+
+    def test_rebuild_workload(self):
+        """Тест на полную пересборку таблицы загруженности."""
+        # Arrange(подготавливаю данные для теста)
+        EmployeeWorkload.objects.all().delete()
+
+        # Act(совершаю действие которое тестирую)
+        call_command('rebuild_workload', stdout=StringIO())
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            self.get_workload(self.employee_1), (2, 1, 0, '2024-02-02')
+        )
+        self.assertEqual(
+            self.get_workload(self.employee_2), (0, 0, 0, 'None')
+        )
+
+    def test_employee_workload_list(self):
+        """Тест на фильтрацию и сортировку списка загруженности."""
+        # Arrange(подготавливаю данные для теста)
+        url = reverse('employees:employee_workload-list')
+
+        # Act(совершаю действие которое тестирую)
+        response = self.client.get(url, {'ordering': '-active_count'})
+        filtered = self.client.get(url, {'overdue_count__gte': 1})
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            [item['employee'] for item in response.json()['results']], [self.employee_1.pk, self.employee_2.pk]
+        )
+        self.assertEqual(
+            [item['full_name'] for item in filtered.json()['results']], ['test_1']
+        )
+
+    def test_cursor_pagination_with_empty_values(self):
+        """Тест на обход по курсору списка, отсортированного по полю с пустыми значениями."""
+        # Arrange(подготавливаю данные для теста)
+        employees = [Employee.objects.create(full_name=f'test_{number + 3}', post='test') for number in range(3)]
+        url = reverse('employees:employee_workload-list') + '?page_size=1&ordering=next_due_date'
+
+        # Act(совершаю действие которое тестирую)
+        pks = []
+        while url:
+            data = self.client.get(url).json()
+            pks.extend(item['employee'] for item in data['results'])
+            url = data['next']
+
+        # Assert(делаю проверки)
+        self.assertEqual(
+            pks, [self.employee_1.pk, self.employee_2.pk] + [employee.pk for employee in employees]
+        )
@@ -1,31 +1,69 @@
 
+from django.conf import settings
 from django.urls import path
 
 from employees.apps import EmployeesConfig
+from employees.async_views import AsyncEmployeeListView, AsyncEmployeeRetrieveView, AsyncTaskListView, \
+    AsyncTaskRetrieveView, AsyncImportantTasksListView, TaskEventsView
 from employees.views import EmployeeListAPIView, EmployeeCreateAPIView, EmployeeUpdateAPIView, EmployeeDestroyAPIView, \
     EmployeeRetrieveAPIView, TaskListAPIView, TaskCreateAPIView, TaskUpdateAPIView, TaskDestroyAPIView, \
-    TaskRetrieveAPIView, EmployeeWithTaskListAPIView, ImportantTasksListAPIView
+    TaskRetrieveAPIView, EmployeeWithTaskListAPIView, ImportantTasksListAPIView, TaskImportAPIView, TaskExportAPIView, \
+    TaskSubtreeAPIView, TaskAncestorsAPIView, EmployeeWorkloadListAPIView, MetricsAPIView, \
+    ChangeFeedAPIView, TaskBulkUpdateAPIView, TaskHistoryListAPIView
 
 app_name = EmployeesConfig.name
 
+# Под ASGI списки и просмотр сотрудников и задач можно обслуживать асинхронными вьюхами
+if settings.ASYNC_READ_VIEWS:
+    EmployeeListView, EmployeeRetrieveView = AsyncEmployeeListView, AsyncEmployeeRetrieveView
+    TaskListView, TaskRetrieveView = AsyncTaskListView, AsyncTaskRetrieveView
+    ImportantTasksListView = AsyncImportantTasksListView
+else:
+    EmployeeListView, EmployeeRetrieveView = EmployeeListAPIView, EmployeeRetrieveAPIView
+    TaskListView, TaskRetrieveView = TaskListAPIView, TaskRetrieveAPIView
+    ImportantTasksListView = ImportantTasksListAPIView
+
 urlpatterns = [
     # Урлы для сотрудников
-    path('employee_list/', EmployeeListAPIView.as_view(), name='employee-list'),
+    path('employee_list/', EmployeeListView.as_view(), name='employee-list'),
     path('employee_create/', EmployeeCreateAPIView.as_view(), name='employee-create'),
     path('<int:pk>/employee_update/', EmployeeUpdateAPIView.as_view(), name='employee-update'),
     path('<int:pk>/employee_destroy/', EmployeeDestroyAPIView.as_view(), name='employee-destroy'),
-    path('<int:pk>/employee_retrieve/', EmployeeRetrieveAPIView.as_view(), name='employee-retrieve'),
+    path('<int:pk>/employee_retrieve/', EmployeeRetrieveView.as_view(), name='employee-retrieve'),
 
     # Урлы для задач
-    path('task_list/', TaskListAPIView.as_view(), name='task-list'),
+    path('task_list/', TaskListView.as_view(), name='task-list'),
     path('task_create/', TaskCreateAPIView.as_view(), name='task-create'),
     path('<int:pk>/task_update/', TaskUpdateAPIView.as_view(), name='task-update'),
     path('<int:pk>/task_destroy/', TaskDestroyAPIView.as_view(), name='task-destroy'),
-    path('<int:pk>/task_retrieve/', TaskRetrieveAPIView.as_view(), name='task-retrieve'),
+    path('<int:pk>/task_retrieve/', TaskRetrieveView.as_view(), name='task-retrieve'),
+    path('task_history/', TaskHistoryListAPIView.as_view(), name='task-history'),
+
+    # Урлы для дерева зависимостей задач
+    path('tasks/<int:pk>/subtree/', TaskSubtreeAPIView.as_view(), name='task-subtree'),
+    path('tasks/<int:pk>/ancestors/', TaskAncestorsAPIView.as_view(), name='task-ancestors'),
+
+    # Урлы для массовой загрузки, изменения и выгрузки задач
+    path('task_import/', TaskImportAPIView.as_view(), name='task-import'),
+    path('task_export/', TaskExportAPIView.as_view(), name='task-export'),
+    path('task_bulk_update/', TaskBulkUpdateAPIView.as_view(), name='task-bulk-update'),
 
     # Урл для получения списка сотрудников вместе с их задачами
     path('employee_with_task_list/', EmployeeWithTaskListAPIView.as_view(), name='employee_with_task-list'),
 
+    # Урл для получения загруженности сотрудников
+    path('employee_workload/', EmployeeWorkloadListAPIView.as_view(), name='employee_workload-list'),
+
     # Урл для получения информации в виде {важная задача, срок, [фио сотрудника]}
-    path('important_tasks_list/', ImportantTasksListAPIView.as_view(), name='important_tasks-list'),
+    path('important_tasks_list/', ImportantTasksListView.as_view(), name='important_tasks-list'),
+
+    # Урл для получения изменений задач и сотрудников после номера since
+    path('changes/', ChangeFeedAPIView.as_view(), name='changes'),
+
+    # Урл для подписки на события задач (server-sent events)
+    path('task_events/', TaskEventsView.as_view(), name='task-events'),
+
+    # Урл для сбора метрик Prometheus. Единственный без слэша на конце: Prometheus по умолчанию опрашивает /metrics
+    # (metrics_path), а со слэшем получал бы редирект APPEND_SLASH
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
 ]
@@ -1,21 +1,80 @@
 
-from django.db.models import OuterRef, Exists
-from rest_framework import filters
-from rest_framework.generics import CreateAPIView, ListAPIView, UpdateAPIView, DestroyAPIView, RetrieveAPIView
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, status
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.generics import CreateAPIView, ListAPIView, UpdateAPIView, DestroyAPIView, RetrieveAPIView, \
+    GenericAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from employees.models import Employee, Task
+from employees.assignment import ImportantTasksAssignmentContext, get_important_tasks
+from employees.bulk import import_tasks, read_rows, export_tasks, update_tasks, complete_tasks
+from employees.cache import CachedListMixin
+from employees.graph import get_ancestors, get_descendants, get_critical_path_from_subtree
+from employees.changes import get_changes, get_last_seq, is_since_available
+from employees.counters import change_task_count
+from employees.filters import EmployeeFilter, TaskArchiveFilter, TaskFilter
+from employees.metrics import render_metrics
+from employees.middleware import profile_serialization
+from employees.models import ChangeLog, Employee, Task, EmployeeWorkload, TaskArchive
+from employees.paginators import ConfigurablePagination, EmployeeLoadPagination, EmployeeWorkloadPagination, \
+    TaskHistoryPagination
 from employees.serializers import EmployeeSerializer, TaskSerializer, EmployeeWithTaskSerializer, TaskCreateSerializer, \
-    ImportantTasksSerializer
+    ImportantTasksSerializer, TaskGraphSerializer, EmployeeWorkloadSerializer, TaskBulkUpdateSerializer, \
+    TaskArchiveSerializer, ChangeFeedQuerySerializer, get_values_serializer
 
 
-class EmployeeListAPIView(ListAPIView):
-    """Класс для вывода всех сотрудников."""
+class ProfiledSerializationMixin:
+    """Список и просмотр объекта, как у ListAPIView и RetrieveAPIView, но время сериализации попадает в отдельную фазу
+    serialize заголовка Server-Timing."""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with profile_serialization(request):
+            data = self.get_serializer(queryset if page is None else page, many=True).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        with profile_serialization(request):
+            data = self.get_serializer(instance).data
+        return Response(data)
+
+
+class ValuesListMixin:
+    """Список, который читает из БД кортежи вместо объектов моделей и сериализует их ValuesSerializer. Ответ тот же,
+    что у обычного ListAPIView, но на больших страницах сериализация в разы быстрее."""
+
+    def list(self, request, *args, **kwargs):
+        serializer = get_values_serializer(self.get_serializer_class())
+        queryset = serializer.get_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with profile_serialization(request):
+            data = serializer.to_representation(queryset if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class EmployeeListAPIView(CachedListMixin, ValuesListMixin, ListAPIView):
+    """Класс для вывода всех сотрудников с фильтрацией и поиском по ФИО."""
+    replica_reads = True
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
+    filterset_class = EmployeeFilter
+    pagination_class = ConfigurablePagination
 
 
-class EmployeeRetrieveAPIView(RetrieveAPIView):
+class EmployeeRetrieveAPIView(ProfiledSerializationMixin, RetrieveAPIView):
     """Класс для просмотра детальной информации о сотруднике."""
+    replica_reads = True
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
 
@@ -39,18 +98,31 @@ class EmployeeDestroyAPIView(DestroyAPIView):
     serializer_class = EmployeeSerializer
 
 
-class TaskListAPIView(ListAPIView):
-    """Класс для вывода всех задач."""
+class TaskListAPIView(CachedListMixin, ValuesListMixin, ListAPIView):
+    """Класс для вывода всех задач с фильтрацией и поиском по названию."""
+    replica_reads = True
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    filterset_class = TaskFilter
+    pagination_class = ConfigurablePagination
 
 
-class TaskRetrieveAPIView(RetrieveAPIView):
+class TaskRetrieveAPIView(ProfiledSerializationMixin, RetrieveAPIView):
     """Класс для просмотра детальной информации о задаче."""
+    replica_reads = True
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
 
 
+class TaskHistoryListAPIView(CachedListMixin, ValuesListMixin, ListAPIView):
+    """Класс для вывода выполненных задач из архива от новых к старым с фильтром по исполнителю."""
+    replica_reads = True
+    queryset = TaskArchive.objects.all()
+    serializer_class = TaskArchiveSerializer
+    filterset_class = TaskArchiveFilter
+    pagination_class = TaskHistoryPagination
+
+
 class TaskCreateAPIView(CreateAPIView):
     """Класс для создания задачи."""
     queryset = Task.objects.all()
@@ -71,37 +143,198 @@ class TaskDestroyAPIView(DestroyAPIView):
 
     def perform_destroy(self, instance):
         """При удалении объекта через DestroyAPIView, тоже убираем задачу из общего числа задач у сотрудника если он
-        есть."""
-        # Получаю пользователя если он есть
-        employee = instance.employee
-        if employee:
-            employee.task_count -= 1
-            employee.save()
-        # Выполняем удаление
-        super().perform_destroy(instance)
+        есть. Выполненная задача уже вычеркнута из него."""
+        with transaction.atomic():
+            if not instance.status:
+                change_task_count(instance.employee_id, -1)
+            # Выполняем удаление
+            super().perform_destroy(instance)
 
 
-class EmployeeWithTaskListAPIView(ListAPIView):
+class EmployeeWithTaskListAPIView(CachedListMixin, ProfiledSerializationMixin, ListAPIView):
     """Класс выводит список сотрудников с их задачами и общим количеством задач с возможностью сортировки."""
-    queryset = Employee.objects.all()
+    replica_reads = True
+    # Задачи всех сотрудников страницы подгружаются одним запросом, а не отдельным запросом на каждого сотрудника.
+    # Выполненные задачи остаются в таблице до переноса в архив, но в списке, как и в task_count, не учитываются
+    queryset = Employee.objects.prefetch_related(
+        Prefetch('employee_task', queryset=Task.objects.filter(status=False).only('pk', 'employee'),
+                 to_attr='prefetched_tasks')
+    )
     serializer_class = EmployeeWithTaskSerializer
     # Сортировка по задачам
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ('task_count',)
+    pagination_class = EmployeeLoadPagination
+
 
+class EmployeeWorkloadListAPIView(CachedListMixin, ProfiledSerializationMixin, ListAPIView):
+    """Класс выводит загруженность сотрудников (задачи в работе, просроченные, выполненные и ближайший срок) с
+    фильтрацией и сортировкой по индексированным полям таблицы загруженности."""
+    replica_reads = True
+    queryset = EmployeeWorkload.objects.select_related('employee')
+    serializer_class = EmployeeWorkloadSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {
+        'active_count': ['gte', 'lte'],
+        'overdue_count': ['gte', 'lte'],
+        'next_due_date': ['gte', 'lte'],
+    }
+    ordering_fields = ('active_count', 'overdue_count', 'next_due_date')
+    pagination_class = EmployeeWorkloadPagination
 
-class ImportantTasksListAPIView(ListAPIView):
+
+class ImportantTasksListAPIView(CachedListMixin, ProfiledSerializationMixin, ListAPIView):
     """Класс, который получает список задач не взятых в работу, но от которых зависят другие задачи и выводит
     {важная задача, срок, фио сотрудника}."""
-    # Этот подзапрос создает набор всех дочерних задач, где поле parent_task связано с текущим объектом задачи
-    # (используется OuterRef для ссылки на внешний запрос).
-    subqueries = Task.objects.filter(parent_task=OuterRef('pk'))
-
-    #  Этот шаг добавляет аннотацию has_children, которая показывает, существуют ли дочерние задачи для текущей задачи.
-    #  Если существует хотя бы одна дочерняя задача, то has_children будет True. А также фильтр выбирает только те
-    #  задачи, которые являются корневыми и у которых есть хотя бы одна дочерняя задача и нет назначенного сотрудника.
-    queryset = Task.objects.annotate(has_children=Exists(subqueries)).filter(has_children=True, employee=None)
+    replica_reads = True
     serializer_class = ImportantTasksSerializer
-from django.shortcuts import render
 
-# Create your views here.
+    pagination_class = ConfigurablePagination
+
+    def get_queryset(self):
+        """Корневые задачи без сотрудника, от которых зависят другие невыполненные задачи. Выполненные задачи, которые
+        ещё не перенесены в архив, не учитываются. Тот же queryset использует автоматическое назначение."""
+        return get_important_tasks()
+
+    def get_serializer(self, *args, **kwargs):
+        """Добавляю в контекст сериализатора данные для подбора сотрудников, чтобы они собирались один раз на
+        страницу, а не для каждой задачи."""
+        if args and kwargs.get('many'):
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['assignment'] = ImportantTasksAssignmentContext.build(args[0])
+        return super().get_serializer(*args, **kwargs)
+
+
+class TaskImportAPIView(APIView):
+    """Класс для массового создания задач из файла JSON Lines (по умолчанию) или CSV (Content-Type: text/csv).
+
+    Файл читается из тела запроса построчно, задачи создаются пачками по chunk_size (параметр запроса), каждая пачка в
+    своей транзакции."""
+    def post(self, request):
+        if request.stream is None:
+            raise ValidationError({'detail': 'Пустое тело запроса.'})
+        file_format = 'csv' if request.content_type.startswith('text/csv') else 'jsonl'
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', settings.BULK_IMPORT_CHUNK_SIZE))
+        except ValueError:
+            raise ValidationError({'chunk_size': 'Размер пачки должен быть числом.'})
+        lines = (line.decode('utf-8') for line in request.stream)
+        created = import_tasks(read_rows(lines, file_format), chunk_size=max(chunk_size, 1))
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
+class TaskBulkUpdateAPIView(APIView):
+    """Класс для массового изменения или выполнения задач одним запросом: {"ids": [...], "action": "update",
+    "patch": {...}} или {"ids": [...], "action": "complete"}. Все задачи обрабатываются в одной транзакции, в ответе
+    результат по каждой задаче: updated, completed, not_found или invalid."""
+    def post(self, request):
+        serializer = TaskBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if data['action'] == TaskBulkUpdateSerializer.COMPLETE:
+            results = complete_tasks(data['ids'])
+        else:
+            results = update_tasks(data['ids'], data['patch'])
+        return Response({'results': [{'id': pk, 'result': result} for pk, result in results.items()]})
+
+
+class TaskExportAPIView(GenericAPIView):
+    """Класс для выгрузки всех задач потоком в формате JSON Lines (по умолчанию) или CSV (?file_format=csv)."""
+    queryset = TaskListAPIView.queryset
+    pagination_class = None
+
+    def get(self, request):
+        file_format = 'csv' if request.query_params.get('file_format') == 'csv' else 'jsonl'
+        response = StreamingHttpResponse(
+            export_tasks(self.filter_queryset(self.get_queryset()), file_format),
+            content_type='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{file_format}"'
+        return response
+
+
+class TaskSubtreeAPIView(APIView):
+    """Класс выводит задачу и все зависящие от неё задачи (поддерево) с глубиной каждой задачи и самую длинную
+    цепочку зависимых задач. Глубину поддерева можно ограничить параметром max_depth. Выполняет один запрос."""
+    def get(self, request, pk):
+        max_depth = request.query_params.get('max_depth')
+        if max_depth is not None and not max_depth.isdigit():
+            raise ValidationError({'max_depth': 'Глубина должна быть неотрицательным числом.'})
+        tasks = get_descendants(pk, max_depth=None if max_depth is None else int(max_depth))
+        if not tasks:
+            raise NotFound()
+        return Response({
+            'tasks': TaskGraphSerializer(tasks, many=True).data,
+            'critical_path': get_critical_path_from_subtree(tasks),
+        })
+
+
+class TaskAncestorsAPIView(APIView):
+    """Класс выводит цепочку задач, от которых зависит задача, от ближайшей до корневой."""
+    def get(self, request, pk):
+        tasks = get_ancestors(pk, include_self=True)
+        if not tasks:
+            raise NotFound()
+        return Response({
+            'depth': len(tasks) - 1,
+            'tasks': TaskGraphSerializer(tasks[1:], many=True).data,
+        })
+
+
+class MetricsAPIView(APIView):
+    """Класс выводит метрики распределения задач и кэша ответов в текстовом формате Prometheus."""
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ChangeFeedAPIView(APIView):
+    """Класс выводит изменения задач и сотрудников после номера since: созданные и изменённые объекты с их текущими
+    данными и удалённые объекты (data = null), не больше limit изменений за запрос.
+
+    Клиент сохраняет since из ответа и передаёт его в следующем запросе, пока has_more = true. Без since выводится
+    только номер последнего изменения: с него клиент начинает получать изменения после полной загрузки списков. Если
+    изменения после since уже удалены из журнала, ответ 410 - нужна полная загрузка."""
+    # Сериализаторы данных объектов по имени модели в журнале
+    serializers = {
+        Task._meta.model_name: (Task, TaskSerializer),
+        Employee._meta.model_name: (Employee, EmployeeSerializer),
+    }
+
+    def get(self, request):
+        if 'since' not in request.query_params:
+            return Response({'since': get_last_seq(), 'has_more': False, 'results': []})
+        serializer = ChangeFeedQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since, limit = serializer.validated_data['since'], serializer.validated_data['limit']
+        if not is_since_available(since):
+            return Response({'detail': 'Изменения после этого номера удалены из журнала, нужна полная загрузка.'},
+                            status=status.HTTP_410_GONE)
+
+        changes, has_more = get_changes(since, limit)
+        data = self.get_data(changes)
+        results = []
+        for seq, model, object_id, action in changes:
+            item = data.get((model, object_id))
+            # Объект удалён уже после этих изменений, его удаление придёт следующими изменениями
+            if item is None:
+                action = ChangeLog.DELETE
+            results.append({'seq': seq, 'model': model, 'id': object_id, 'action': action, 'data': item})
+        return Response({
+            'since': results[-1]['seq'] if results else since,
+            'has_more': has_more,
+            'results': results,
+        })
+
+    def get_data(self, changes):
+        """Читает текущие данные изменённых объектов одним запросом на модель. Возвращает {(модель, pk): данные}."""
+        ids = {}
+        for _, model, object_id, action in changes:
+            if action != ChangeLog.DELETE:
+                ids.setdefault(model, []).append(object_id)
+        data = {}
+        for model_name, object_ids in ids.items():
+            model, serializer_class = self.serializers[model_name]
+            serializer = get_values_serializer(serializer_class)
+            rows = serializer.to_representation(serializer.get_queryset(model.objects.filter(pk__in=object_ids)))
+            data.update(((model_name, row['id']), row) for row in rows)
+        return data
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from django.db.models import Case, Count, DateField, F, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from employees.models import Employee, EmployeeWorkload, Task, TaskArchive
+
+WORKLOAD_FIELDS = ('active_count', 'overdue_count', 'completed_count', 'next_due_date')
+
+
+def create_workload(employee_ids):
+    """Создаёт пустые строки загруженности для новых сотрудников."""
+    EmployeeWorkload.objects.bulk_create([EmployeeWorkload(employee_id=pk) for pk in employee_ids],
+                                         ignore_conflicts=True)
+
+
+def change_workload(changes):
+    """Применяет изменения задач к загруженности сотрудников приращениями, не пересчитывая их задачи.
+
+    changes - пары (прежнее состояние, новое состояние) задач, где состояние - (pk сотрудника, выполнена ли, срок), а
+    для созданной или удалённой задачи - None. На каждого затронутого сотрудника выполняется один UPDATE со
+    счётчиками вида F() + delta, как в change_task_counts. Ближайший срок уменьшается сразу, а пересчитывается по
+    задачам сотрудника, только если из работы ушла задача с этим сроком. Сотрудники без строки загруженности
+    пересчитываются refresh_workload."""
+    today = timezone.localdate()
+    date_field = Task._meta.get_field('date')
+    # {pk сотрудника: [в работе, просрочено, выполнено, самый ранний добавленный срок, сроки ушедших из работы задач]}
+    deltas = defaultdict(lambda: [0, 0, 0, None, set()])
+
+    def apply(state, sign):
+        employee_id, completed, date = state
+        if employee_id is None:
+            return
+        delta = deltas[employee_id]
+        if completed:
+            delta[2] += sign
+            return
+        delta[0] += sign
+        delta[1] += sign if date < today else 0
+        if sign > 0:
+            delta[3] = date if delta[3] is None else min(delta[3], date)
+        else:
+            delta[4].add(date)
+
+    def normalize(state):
+        # Срок у несохранённой из формы задачи может быть строкой
+        return None if state is None else (state[0], state[1], date_field.to_python(state[2]))
+
+    for previous, current in changes:
+        previous, current = normalize(previous), normalize(current)
+        if previous == current:
+            continue
+        if previous is not None:
+            apply(previous, -1)
+        if current is not None:
+            apply(current, 1)
+
+    missing = []
+    for employee_id, (active, overdue, completed, added_date, removed_dates) in deltas.items():
+        if not (active or overdue or completed or added_date or removed_dates):
+            continue
+        next_due_date = F('next_due_date')
+        if removed_dates:
+            earliest = (Task.objects.filter(employee=OuterRef('employee'), status=False).order_by()
+                        .values('employee').annotate(date=Min('date')).values('date'))
+            next_due_date = Case(When(next_due_date__in=removed_dates, then=Subquery(earliest)),
+                                 default=next_due_date)
+        if added_date is not None:
+            added_date = Value(added_date, output_field=DateField())
+            next_due_date = Least(Coalesce(next_due_date, added_date), added_date)
+        updated = EmployeeWorkload.objects.filter(employee=employee_id).update(
+            active_count=Greatest(F('active_count') + active, Value(0)),
+            overdue_count=Greatest(F('overdue_count') + overdue, Value(0)),
+            completed_count=Greatest(F('completed_count') + completed, Value(0)),
+            next_due_date=next_due_date,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            missing.append(employee_id)
+    refresh_workload(missing)
+
+
+def refresh_workload(employee_ids):
+    """Пересчитывает загруженность указанных сотрудников.
+
+    Счётчики считаются одним агрегирующим запросом по задачам этих сотрудников и записываются одним upsert, поэтому
+    стоимость зависит от количества задач затронутых сотрудников, а не от размера таблицы задач. Выполненные задачи
+    считаются и в таблице задач, и в архиве (по индексу task_archive_employee_idx).
+
+    Количество просроченных задач зависит от текущей даты, поэтому раз в сутки таблицу нужно пересобирать целиком
+    (rebuild_workload)."""
+    employee_ids = {pk for pk in employee_ids if pk is not None}
+    if not employee_ids:
+        return
+    today = timezone.localdate()
+    counts = {
+        row['employee']: row
+        for row in Task.objects.filter(employee__in=employee_ids).order_by().values('employee').annotate(
+            active_count=Count('pk', filter=Q(status=False)),
+            overdue_count=Count('pk', filter=Q(status=False, date__lt=today)),
+            completed_count=Count('pk', filter=Q(status=True)),
+            next_due_date=Min('date', filter=Q(status=False)),
+        )
+    }
+    archived_counts = dict(
+        TaskArchive.objects.filter(employee__in=employee_ids).order_by().values('employee')
+        .annotate(count=Count('pk')).values_list('employee', 'count')
+    )
+    # Сотрудник мог быть удалён в этой же транзакции, для него строка загруженности не нужна
+    existing_ids = Employee.objects.filter(pk__in=employee_ids).values_list('pk', flat=True)
+    EmployeeWorkload.objects.bulk_create(
+        [
+            EmployeeWorkload(
+                employee_id=pk,
+                active_count=counts.get(pk, {}).get('active_count', 0),
+                overdue_count=counts.get(pk, {}).get('overdue_count', 0),
+                completed_count=counts.get(pk, {}).get('completed_count', 0) + archived_counts.get(pk, 0),
+                next_due_date=counts.get(pk, {}).get('next_due_date'),
+            )
+            for pk in existing_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['employee'],
+        update_fields=[*WORKLOAD_FIELDS, 'updated_at'],
+    )
+
+
+def rebuild_workload(chunk_size=1000):
+    """Полностью пересобирает таблицу загруженности пачками по chunk_size сотрудников. Возвращает их количество."""
+    rebuilt = 0
+    last_pk = 0
+    while True:
+        chunk = list(Employee.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        refresh_workload(chunk)
+        rebuilt += len(chunk)
+        last_pk = chunk[-1]
+    return rebuilt